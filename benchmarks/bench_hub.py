@@ -0,0 +1,93 @@
+"""
+Benchmark for SensorHub: how its CPU use grows with the number of sensors.
+
+Each simulated LD2410 is a pty pair. A separate process writes engineering
+frames into all of them at a fixed rate, and this process runs one
+SensorHub over the other ends and measures its own CPU time.
+
+    python benchmarks/bench_hub.py [rate in Hz] [seconds per step]
+
+Linux (or anything else with ptys) only.
+"""
+
+import multiprocessing
+import os
+import pty
+import resource
+import sys
+import time
+import tty
+
+from bench_reports import engineering_frame
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries"))
+
+from MMWaveHub import SensorHub
+
+SENSOR_COUNTS = (1, 5, 10, 20, 40, 80)
+
+
+def feed(fds, rate, duration):
+    """Child process: write a frame into every pty `rate` times a second."""
+    frame = engineering_frame(250)
+    interval = 1.0 / rate
+    next_time = time.monotonic()
+    end = next_time + duration
+    while next_time < end:
+        for fd in fds:
+            os.write(fd, frame)
+        next_time += interval
+        time.sleep(max(0, next_time - time.monotonic()))
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(count, rate, duration):
+    masters = []
+    slaves = []
+    for _ in range(count):
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        masters.append(master)
+        slaves.append(slave)
+
+    received = [0]
+
+    def callback(sensor_id, report):
+        received[0] += 1
+
+    hub = SensorHub(callback=callback)
+    for i, fd in enumerate(slaves):
+        hub.add_mmwave(i, fd)
+
+    writer = multiprocessing.get_context("fork").Process(target=feed, args=(masters, rate, duration))
+    writer.start()
+    start_cpu = cpu_seconds()
+    start = time.monotonic()
+    hub.run(duration)
+    cpu = cpu_seconds() - start_cpu
+    wall = time.monotonic() - start
+    writer.join()
+
+    hub.close()
+    for fd in masters + slaves:
+        os.close(fd)
+    return received[0] / wall, 100 * cpu / wall
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    print(f"{rate:g} frames/s per sensor, {duration:g}s per step")
+    print("sensors   frames/s   CPU %   CPU % per sensor")
+    for count in SENSOR_COUNTS:
+        frames_per_second, cpu_percent = run(count, rate, duration)
+        print(f"{count:7d} {frames_per_second:10.0f} {cpu_percent:7.2f} {cpu_percent / count:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
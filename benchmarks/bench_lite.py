@@ -0,0 +1,133 @@
+"""
+Compare the lite drivers (see tools/build_lite.py) with the full ones:
+
+    source       bytes of .py the board has to compile
+    bytecode     bytes of the marshalled CPython code object
+    mpy          bytes of .mpy, if mpy-cross is on the PATH
+    import_ms    time to import the module in a fresh interpreter (median)
+    import_kb    memory allocated by that import (tracemalloc)
+    instance_b   memory allocated by making one sensor object
+
+All on CPython, so the numbers are only a guide to what a board sees,
+but the differences point the same way. Run from anywhere:
+
+    python benchmarks/bench_lite.py [--runs N] [--json results.json]
+
+It builds the lite versions into a temporary directory first, so it
+always measures what the current sources turn into. The full ones are
+copied into another one, without any __pycache__, so both get imported
+(and compiled) from source the same way.
+"""
+
+import argparse
+import json
+import marshal
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIBRARIES = os.path.join(HERE, "..", "libraries")
+sys.path.insert(0, os.path.join(HERE, "..", "tools"))
+
+from build_lite import MODULES, build
+
+# What to make one of, for the per-instance memory. The port is never
+# used, since neither reads anything when made like this.
+INSTANCES = {
+    "MMWave": "MMWave.MMWave(None, engineering_always=False, doNotRead=True)",
+    "mmWaveStatic_MR24HPC1": "mmWaveStatic_MR24HPC1.MR24(None, verbose=False)",
+}
+
+PROBE = """
+import sys, time, tracemalloc, json
+sys.path.insert(0, {path!r})
+tracemalloc.start()
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+imported = tracemalloc.get_traced_memory()[0]
+instance = None
+if {has_instance}:
+    before = tracemalloc.get_traced_memory()[0]
+    sensor = {make}
+    instance = tracemalloc.get_traced_memory()[0] - before
+print(json.dumps({{"seconds": seconds, "imported": imported, "instance": instance}}))
+"""
+
+
+def probe(path, module):
+    """Import `module` from `path` in a fresh interpreter, return what PROBE measured."""
+    make = INSTANCES.get(module)
+    code = PROBE.format(path=path, module=module, make=make or "None", has_instance=make is not None)
+    out = subprocess.run([sys.executable, "-B", "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+
+def copy_sources(into):
+    """Copy the .py files of libraries/ (and nothing else) into `into`."""
+    for name in os.listdir(LIBRARIES):
+        if name.endswith(".py"):
+            shutil.copy(os.path.join(LIBRARIES, name), into)
+
+
+def mpy_size(source_path):
+    mpy_cross = shutil.which("mpy-cross")
+    if mpy_cross is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.mpy")
+        subprocess.run([mpy_cross, "-o", out, source_path], check=True, capture_output=True)
+        return os.path.getsize(out)
+
+
+def measure(path, module, runs):
+    source_path = os.path.join(path, module + ".py")
+    with open(source_path, encoding="utf-8") as f:
+        source = f.read()
+    code = compile(source, source_path, "exec")
+    probes = [probe(path, module) for _ in range(runs)]
+    return {"source": len(source.encode()),
+            "bytecode": len(marshal.dumps(code)),
+            "mpy": mpy_size(source_path),
+            "import_ms": statistics.median(p["seconds"] for p in probes) * 1000,
+            "import_kb": statistics.median(p["imported"] for p in probes) / 1024,
+            "instance_b": probes[0]["instance"],
+            }
+
+
+def fmt(value, spec):
+    return "-".rjust(len(format(0, spec))) if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the lite drivers with the full ones.")
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters per import timing")
+    parser.add_argument("--json", help="write the results here")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as full, tempfile.TemporaryDirectory() as lite:
+        copy_sources(full)
+        build(lite)
+        for module in MODULES:
+            for variant, path in (("full", full), ("lite", lite)):
+                result = measure(path, module, args.runs)
+                result.update(module=module, variant=variant)
+                results.append(result)
+
+    print("module                 variant  source  bytecode     mpy  import_ms  import_kb  instance_b")
+    for r in results:
+        print(f"{r['module']:22} {r['variant']:7} {r['source']:7d} {r['bytecode']:9d} {fmt(r['mpy'], '7d')} "
+              f"{r['import_ms']:10.2f} {r['import_kb']:10.1f} {fmt(r['instance_b'], '11d')}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version, "runs": args.runs, "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
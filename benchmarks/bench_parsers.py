@@ -0,0 +1,341 @@
+"""
+Benchmark for the frame decoders: throughput, what corruption costs, and
+how much they allocate per frame.
+
+Every decoder gets the same made-up streams (see MMWaveSynth): clean
+ones, and ones with noise, truncated frames, bad footers or command ACKs
+mixed in. For each it measures
+
+    fps              good frames decoded per second
+    recovered        fraction of the good frames in the stream it decoded
+    lost_per_fault   good frames lost per fault, on top of the fault itself
+                     and of what it loses on a clean stream anyway
+                     (how long it takes to find its feet again)
+    alloc_per_frame  bytes allocated per decoded frame, as seen by
+                     tracemalloc between two reads from the port. That's
+                     the transient peak: on CPython it includes ints and
+                     floats which are gone again right away.
+                     tests/test_alloc.py keeps MMWave.read() at that.
+
+Run from anywhere with CPython:
+
+    python benchmarks/bench_parsers.py [--frames N] [--json results.json]
+    python benchmarks/bench_parsers.py --compare results.json
+
+Keep the JSON of a release around and --compare against it later: it
+exits with status 1 if any decoder got more than --tolerance slower or
+started losing more frames.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries"))
+
+import MMWave
+from MMWaveHub import LD2410Decoder, MR24Decoder
+from MMWaveSynth import FrameSource
+from mmWaveStatic_MR24HPC1 import MR24
+
+CHUNK = 64
+"""Bytes per read, about what a UART FIFO hands over at a time."""
+
+SCENARIOS = {
+    "clean": {},
+    "basic": {"report_mode": MMWave.REPORT_MODE_BASIC},
+    "noise": {"noise": 0.02},
+    "truncated": {"truncated": 0.02},
+    "bad_footer": {"bad_footer": 0.02},
+    "acks": {"ack": 0.1},
+    "mixed": {"noise": 0.01, "truncated": 0.01, "bad_footer": 0.01, "ack": 0.05},
+}
+
+
+class EndOfData(Exception):
+    pass
+
+
+class AllocMeter():
+
+    """Adds up tracemalloc's peak between ticks. Freed and reused memory
+    is only counted once per tick, so this is a lower bound."""
+
+    def __init__(self):
+        self.allocated = 0
+        self.enabled = False
+
+    def start(self):
+        tracemalloc.start()
+        self.enabled = True
+        self._base = tracemalloc.get_traced_memory()[0]
+
+    def tick(self):
+        if self.enabled:
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocated += peak - self._base
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        self.tick()
+        self.enabled = False
+        tracemalloc.stop()
+
+
+class StreamPort():
+
+    """Serial-port-like object which hands out `data` in `chunk` sized
+    pieces and raises EndOfData once it's all gone."""
+
+    def __init__(self, data, meter, chunk=CHUNK):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.chunk = chunk
+        self.meter = meter
+
+    @property
+    def in_waiting(self):
+        left = len(self.data) - self.pos
+        if not left:
+            raise EndOfData
+        return min(left, self.chunk)
+
+    def read(self, nbytes=1):
+        self.meter.tick()
+        if self.pos >= len(self.data):
+            raise EndOfData
+        data = bytes(self.data[self.pos:self.pos + nbytes])
+        self.pos += len(data)
+        return data
+
+    def readinto(self, buffer):
+        self.meter.tick()
+        if self.pos >= len(self.data):
+            raise EndOfData
+        n = min(len(buffer), len(self.data) - self.pos)
+        buffer[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def write(self, buffer):
+        return len(buffer)
+
+
+# The decoders. Each takes the stream and an AllocMeter and returns how
+# many good frames it decoded, plus how many times it blew up.
+
+def run_mmwave_read(data, meter):
+    sensor = MMWave.MMWave(StreamPort(data, meter), engineering_always=False, doNotRead=True)
+    decoded = 0
+    try:
+        while True:
+            if sensor.read():
+                decoded += 1
+    except EndOfData:
+        pass
+    return decoded, 0
+
+
+def run_mmwave_frames(data, meter):
+    sensor = MMWave.MMWave(StreamPort(data, meter), engineering_always=False, doNotRead=True)
+    decoded = 0
+    try:
+        for _report in sensor.frames():
+            decoded += 1
+    except EndOfData:
+        pass
+    return decoded, 0
+
+
+def run_ld2410_decoder(data, meter):
+    decoder = LD2410Decoder()
+    view = memoryview(data)
+    decoded = 0
+    for pos in range(0, len(data), CHUNK):
+        meter.tick()
+        decoded += len(decoder.feed(view[pos:pos + CHUNK]))
+    return decoded, 0
+
+
+def run_batch(data, meter):
+    import MMWaveBatch
+    meter.tick()
+    return len(MMWaveBatch.decode(data)), 0
+
+
+def run_mr24_read(data, meter):
+    sensor = MR24(StreamPort(data, meter), verbose=False)
+    decoded = 0
+    errors = 0
+    while True:
+        try:
+            for frame in sensor.readFrames(maxFrames=None):
+                if sensor.handleFrame(*frame) is not None:
+                    decoded += 1
+        except EndOfData:
+            break
+        except (IndexError, KeyError, TypeError):
+            errors += 1
+    return decoded, errors
+
+
+def run_mr24_decoder(data, meter):
+    decoder = MR24Decoder()
+    view = memoryview(data)
+    decoded = 0
+    for pos in range(0, len(data), CHUNK):
+        meter.tick()
+        decoded += len(decoder.feed(view[pos:pos + CHUNK]))
+    return decoded, 0
+
+
+def have_numpy():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+DECODERS = {
+    "ld2410": {
+        "MMWave.read": run_mmwave_read,
+        "MMWave.frames": run_mmwave_frames,
+        "LD2410Decoder.feed": run_ld2410_decoder,
+        "MMWaveBatch.decode": run_batch,
+    },
+    "mr24": {
+        "MR24.readFrames": run_mr24_read,
+        "MR24Decoder.feed": run_mr24_decoder,
+    },
+}
+
+
+def make_stream(sensor, scenario, frames, seed):
+    source = FrameSource(sensor, seed=seed, **SCENARIOS[scenario])
+    data, good = source.stream(frames)
+    faults = source.counts["noise"] + source.counts["truncated"] + source.counts["bad_footer"]
+    return data, good, faults
+
+
+def measure(run, data, good, faults, alloc_sample, clean_recovered=1.0, repeat=3):
+    meter = AllocMeter()
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoded, errors = run(data, meter)
+        elapsed = time.perf_counter() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+
+    # again, slowly, to count allocations
+    sample = data[:alloc_sample]
+    meter.start()
+    sample_decoded, _ = run(sample, meter)
+    meter.stop()
+
+    lost = max(good * clean_recovered - decoded, 0)
+    return {"frames_in": good,
+            "decoded": decoded,
+            "errors": errors,
+            "seconds": seconds,
+            "fps": decoded / seconds if seconds else None,
+            "recovered": decoded / good if good else None,
+            "lost_per_fault": lost / faults if faults else None,
+            "alloc_per_frame": meter.allocated / sample_decoded if sample_decoded else None,
+            }
+
+
+def run_all(frames, seed, only=None, repeat=3):
+    results = []
+    clean_recovered = {}
+    numpy = have_numpy()
+    for sensor, decoders in DECODERS.items():
+        for scenario in SCENARIOS:
+            if sensor == "mr24" and scenario == "basic":
+                continue
+            data, good, faults = make_stream(sensor, scenario, frames, seed)
+            for name, run in decoders.items():
+                if only and not any(o in name for o in only):
+                    continue
+                if run is run_batch and not numpy:
+                    continue
+                result = measure(run, data, good, faults, len(data) * 1000 // frames,
+                                 clean_recovered.get(name, 1.0), repeat)
+                if scenario == "clean":
+                    clean_recovered[name] = result["recovered"]
+                result.update(decoder=name, sensor=sensor, scenario=scenario)
+                results.append(result)
+    return results
+
+
+def key(result):
+    return (result["decoder"], result["scenario"])
+
+
+def compare(results, old_path, tolerance):
+    """Print what got worse since `old_path`. Returns True if nothing did."""
+    with open(old_path) as f:
+        old = {key(r): r for r in json.load(f)["results"]}
+    ok = True
+    for result in results:
+        before = old.get(key(result))
+        if before is None:
+            continue
+        if before["fps"] and result["fps"] < before["fps"] * (1 - tolerance):
+            print(f"SLOWER   {result['decoder']:24} {result['scenario']:10} "
+                  f"{before['fps']:10.0f} -> {result['fps']:10.0f} frames/s")
+            ok = False
+        if before["recovered"] is not None and result["recovered"] < before["recovered"] - 0.001:
+            print(f"LOSSIER  {result['decoder']:24} {result['scenario']:10} "
+                  f"{before['recovered']:10.3f} -> {result['recovered']:10.3f} recovered")
+            ok = False
+    return ok
+
+
+def fmt(value, spec):
+    return "-".rjust(len(format(0, spec))) if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LD2410 and MR24HPC1 decoders.")
+    parser.add_argument("--frames", type=int, default=20000, help="frames per stream")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="time each decoder this often, keep the best")
+    parser.add_argument("--only", nargs="*", help="only decoders with one of these in their name")
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--compare", help="results JSON of an earlier run to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="how much slower counts as a regression (default 0.2, i.e. 20%%)")
+    args = parser.parse_args()
+
+    results = run_all(args.frames, args.seed, args.only, args.repeat)
+
+    print("decoder                  scenario          fps  recovered  lost/fault  alloc/frame  errors")
+    for r in results:
+        print(f"{r['decoder']:24} {r['scenario']:10} {fmt(r['fps'], '10.0f')} {fmt(r['recovered'], '10.3f')} "
+              f"{fmt(r['lost_per_fault'], '11.2f')} {fmt(r['alloc_per_frame'], '12.1f')} {r['errors']:7d}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": platform.python_implementation() + " " + platform.python_version(),
+                       "machine": platform.machine(),
+                       "frames": args.frames,
+                       "seed": args.seed,
+                       "repeat": args.repeat,
+                       "chunk": CHUNK,
+                       "time": time.time(),
+                       "results": results,
+                       }, f, indent=1)
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
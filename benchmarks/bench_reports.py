@@ -0,0 +1,119 @@
+"""
+Benchmark for LD2410Report: how much a report costs to make, and how
+much memory it takes to keep a lot of them around.
+
+Run from anywhere with CPython:
+
+    python benchmarks/bench_reports.py [number of frames]
+
+For comparison, it also times plain MMWave.read() and the old way of
+keeping a history, which is copying the attributes into a dict by hand.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "libraries"))
+
+import MMWave
+from MMWaveSynth import ld2410_frame
+
+
+def engineering_frame(distance):
+    """A valid engineering-mode frame with a moving target at `distance` cm."""
+    return ld2410_frame(motion_cm=distance, static_cm=distance, detection_cm=distance)
+
+
+class LoopingPort():
+    """Serial-port-like object which plays the same bytes over and over."""
+
+    def __init__(self, data, chunk=256):
+        self.data = data
+        self.pos = 0
+        self.in_waiting = chunk
+
+    def readinto(self, buffer):
+        n = len(buffer)
+        done = 0
+        while done < n:
+            take = min(n - done, len(self.data) - self.pos)
+            buffer[done:done + take] = self.data[self.pos:self.pos + take]
+            self.pos = (self.pos + take) % len(self.data)
+            done += take
+        return n
+
+    def write(self, buffer):
+        return len(buffer)
+
+
+def make_sensor():
+    stream = b"".join(engineering_frame(d) for d in (120, 340, 560))
+    port = LoopingPort(stream)
+    return MMWave.MMWave(port, engineering_always=False, doNotRead=True)
+
+
+def attribute_copy(sensor):
+    return {"detected": sensor.detected,
+            "motion_detected": sensor.motion_detected,
+            "static_detected": sensor.static_detected,
+            "motion_target_cm": sensor.motion_target_cm,
+            "static_target_cm": sensor.static_target_cm,
+            "detection_cm": sensor.detection_cm,
+            "motion_energy": sensor.motion_energy,
+            "static_energy": sensor.static_energy,
+            "gate_motion_energy": list(sensor.gate_motion_energy),
+            "gate_static_energy": list(sensor.gate_static_energy),
+            "light_level": sensor.light_level,
+            "last_updated": sensor.last_updated,
+            }
+
+
+def time_frames(n):
+    sensor = make_sensor()
+    frames = sensor.frames()
+    start = time.perf_counter()
+    for _ in range(n):
+        next(frames)
+    return (time.perf_counter() - start) / n
+
+
+def time_read(n):
+    sensor = make_sensor()
+    start = time.perf_counter()
+    for _ in range(n):
+        sensor.read()
+    return (time.perf_counter() - start) / n
+
+
+def memory_per_item(n, make_item):
+    items = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(n):
+        items.append(make_item())
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # don't count the list itself
+    return (after - before - sys.getsizeof(items)) / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"frames():            {time_frames(n) * 1e6:8.2f} us per report")
+    print(f"read():              {time_read(n) * 1e6:8.2f} us per frame")
+
+    sensor = make_sensor()
+    frames = sensor.frames()
+    print(f"LD2410Report:        {memory_per_item(n, lambda: next(frames)):8.1f} bytes each")
+
+    def read_and_copy():
+        sensor.read()
+        return attribute_copy(sensor)
+    print(f"dict of attributes:  {memory_per_item(n, read_and_copy):8.1f} bytes each")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ See README.md for more!
 
 import time
 
+from MMWaveFraming import FrameScanner, FrameSpec
+
 DEFAULT_BAUD = 9600
 """This is the LD2410's default"""
 
@@ -56,6 +58,19 @@ MAX_LEGIT_PRESENCE_TIMEOUT = 65535 # docs 2.2.3
 # right now, that's all the LD2410 has. maybe future devices will have more?
 LAST_GATE = 8
 
+# What save_state() keeps, so that the next MMWave can start with it.
+STATE_FIELDS = ("engineering_mode", "last_motion_gate", "last_static_gate",
+                "gate_motion_sensitivity", "gate_static_sensitivity",
+                "presence_timeout", "resolution", "bluetooth_enabled", "firmware_version")
+STATE_VERSION = 1
+REVALIDATE_TIME = 3.0 # seconds read() may spend revalidating after a mismatch
+
+# What on_change() can watch. (Not the gate lists, those change in place.)
+WATCHABLE_FIELDS = ("detected", "motion_detected", "static_detected",
+                    "motion_target_cm", "static_target_cm", "detection_cm",
+                    "motion_energy", "static_energy", "light_level",
+                    "last_motion_gate", "last_static_gate", "engineering_mode")
+
 # From the docs section 2.2. Question: is it more clear to have these all
 # in one place, or defined in each command method?
 COMMAND_HEADER = bytes.fromhex("fdfcfbfa")
@@ -81,6 +96,440 @@ COMMAND_BLUETOOTH_PASS   = (0x00A9).to_bytes(2,"little")
 COMMAND_SET_RESOLUTION   = (0x00AA).to_bytes(2,"little")
 COMMAND_GET_RESOLUTION   = (0x00AB).to_bytes(2,"little")
 
+# header + 2 length bytes, and the footer, around each payload
+FRAME_OVERHEAD = len(FRAME_HEADER) + 2 + len(FRAME_FOOTER)
+
+# the shortest answer to a command: the overhead plus 4 bytes of status
+COMMAND_ACK_MIN_LENGTH = len(COMMAND_HEADER) + 2 + 4 + len(COMMAND_FOOTER)
+
+# How much the parser keeps around. Needs to hold at least one whole
+# engineering frame; the rest is slack for whatever the port has buffered.
+PARSER_BUFFER_SIZE = 256
+
+
+class FrameParser(FrameScanner):
+
+    """Incremental ("sans-IO") splitter for LD2410-style frames.
+
+    A frame is `header`, a two-byte little-endian payload length,
+    the payload, and `footer`. This doesn't know anything about ports
+    -- you feed it bytes, in whatever chunks they arrive, and it gives
+    back every complete frame it can find. Partial frames are kept
+    around until the rest shows up.
+
+    The scanning is done by MMWaveFraming.FrameScanner (so that file
+    needs to be on the board too); this just knows what LD2410 frames
+    look like. next_frame() returns payload offsets.
+    """
+
+    def __init__(self, header=FRAME_HEADER, footer=FRAME_FOOTER, max_length=PACKET_LEN_ENGINEERING, size=PARSER_BUFFER_SIZE):
+        """Arguments:
+
+        header -- bytes marking the start of a frame
+        footer -- bytes marking the end of a frame
+        max_length -- longest payload we accept. Anything longer is a misread.
+        size -- capacity of the internal buffer
+        """
+        super().__init__(FrameSpec(header, footer, len(header), max_length), size)
+        self.header = header
+        self.footer = footer
+        self.max_length = max_length
+
+    def payload(self, offset):
+        """A bytes copy of the payload at `offset` (from next_frame())."""
+        return self.data(offset)
+
+    def feed(self, data):
+        """Add `data` (bytes, bytearray or memoryview) and return a list with
+        the payload of every frame completed by it, oldest first."""
+        return [self.data(payload) for _start, payload, _length in self.feed_offsets(data)]
+
+
+BAUD_CODES = {  9600: 0x01,
+                19200: 0x02,
+                38400: 0x03,
+                57600: 0x04,
+               115200: 0x05,
+               230400: 0x06,
+               256000: 0x07,
+               460800: 0x08,
+}
+"""Baud rates the LD2410 supports, and how to ask for them."""
+
+# for negotiate_baud() and probe_baud()
+BAUD_PROBE_FRAMES = 2 # good frames which show we've found the right speed
+BAUD_PROBE_TIME = 1.0 # seconds to listen at each speed
+BAUD_VERIFY_FRAMES = 30 # frames to check a new speed with
+BAUD_VERIFY_TIME = 5.0 # seconds those (or a command) may take; at 10 frames/s, 30 take 3
+BAUD_MAX_ERROR_RATE = 0.02 # so with 30 frames, not a single bad one
+BAUD_SWITCH_TIME = 5.0 # seconds for the commands which change the speed
+
+RESOLUTION_CODES = {75: 0x00,
+                    20: 0x01,
+}
+"""Gate depths (in cm) the LD2410 supports, and their codes."""
+
+
+def command_packet(command_data_bytes):
+    """Wrap a command (and its data) up for sending."""
+    return COMMAND_HEADER + len(command_data_bytes).to_bytes(2,"little") + command_data_bytes + COMMAND_FOOTER
+
+
+def check_response(packet, command_data_bytes):
+    """Check the inner packet of a response (between the length and
+    the footer) to the command starting with `command_data_bytes`.
+
+    Returns False if it isn't a proper response to that command (keep
+    listening), None on nak, and otherwise the response data as bytes,
+    or True if there isn't any.
+    """
+    if len(packet) < 4:
+        return False
+    status = packet[:4]
+    result = packet[4:]
+
+    # the response should include echoing back the command, which
+    # will be the first byte of the command + data
+    if int(status[0]) == 0:
+        #print("Uh, that shouldn't be zero")
+        return False
+    if int(status[0]) != command_data_bytes[0]:
+        #print(f"Response {int(packet[0])} doesn't match {command_data_bytes[0]}")
+        return False
+
+    if status[1] == 0:
+        #print("Got failure response to command.")
+        return None
+
+    if status[1] != 1:
+        #print("Response code something other than 0 or 1")
+        return False
+
+    if len(result) == 0:
+        # success, but no data for this command
+        return True
+    
+    # success with data (without the status code)
+    return bytes(result)
+
+
+def basic_config_data(last_motion_gate,last_static_gate,presence_timeout):
+    """Data for COMMAND_BASIC_CONFIG. See MMWave.set_basic_config()."""
+    if last_motion_gate<2 or last_motion_gate>LAST_GATE:
+        raise ValueError(f"Motion gate number {last_motion_gate} out of range 2-{LAST_GATE}")
+    if last_static_gate<2 or last_static_gate>LAST_GATE:
+        raise ValueError(f"Static gate number {last_static_gate} out of range 2-{LAST_GATE}")
+    if presence_timeout < 0 or presence_timeout > MAX_LEGIT_PRESENCE_TIMEOUT:
+        raise ValueError(f"Presence timeout {presence_timeout} out of range 0-{MAX_LEGIT_PRESENCE_TIMEOUT}")
+
+    return int(0).to_bytes(2,"little") + int(last_motion_gate).to_bytes(4,"little") + int(1).to_bytes(2,"little") + int(last_static_gate).to_bytes(4,"little") + int(2).to_bytes(2,"little") + int(presence_timeout).to_bytes(4,"little")
+
+
+def gate_sensitivity_data(gate,motion_sensitivity,static_sensitivity):
+    """Data for COMMAND_GATE_SENSITIVITY. See MMWave.set_gate_sensitivity()."""
+    if motion_sensitivity < 0 or motion_sensitivity > 100:
+        raise ValueError(f"Motion sensitivity {motion_sensitivity} out of range 0-100")
+    if static_sensitivity < 0 or static_sensitivity > 100:
+        raise ValueError(f"Statiction sensitivity {static_sensitivity} out of range 0-100")        
+    if gate<-1 or gate>LAST_GATE:
+        raise ValueError(f"Gate number {gate} out of range -1-{LAST_GATE}")
+    
+    if gate == -1:
+        gate = 0xFFFF
+
+    return int(0).to_bytes(2,"little") + int(gate).to_bytes(4,"little") + int(1).to_bytes(2,"little") + int(motion_sensitivity).to_bytes(4,"little") + int(2).to_bytes(2,"little") + int(static_sensitivity).to_bytes(4,"little")
+
+
+# What check_packet() returns for mangled packets. REJECT_REASONS[-code]
+# gives a name for each, for the stats.
+REJECT_LENGTH = -1
+REJECT_REPORT_MODE = -2
+REJECT_HEAD = -3
+REJECT_TARGET_STATE = -4
+REJECT_TAIL = -5
+REJECT_CALIBRATION = -6
+REJECT_DISTANCE = -7
+REJECT_ENERGY = -8
+REJECT_REASONS = (None, "length", "report_mode", "head", "target_state", "tail", "calibration", "distance", "energy")
+
+
+def check_packet(buffer, offset, packet_len):
+    """Check the LD2410 data payload at `offset` in `buffer`.
+
+    `packet_len` is the length from the frame, and the payload is
+    everything between that and the footer.
+
+    Returns the report mode (REPORT_MODE_BASIC or REPORT_MODE_ENGINEERING)
+    if it looks legit. If it's mangled, returns one of the (negative)
+    REJECT_ codes saying what's wrong with it, so check for `> 0`.
+    This doesn't allocate anything.
+    """
+    report_mode = buffer[offset]
+
+    # various mangled-read checks
+    if packet_len == PACKET_LEN_BASIC:
+        #print("Basic mode length detected")
+        if report_mode != REPORT_MODE_BASIC:
+            #print("But not in basic mode!")
+            return REJECT_REPORT_MODE
+    elif packet_len == PACKET_LEN_ENGINEERING:
+        #print("Engineering mode length detected")
+        if report_mode != REPORT_MODE_ENGINEERING:
+            #print("But not in engineering mode!")
+            return REJECT_REPORT_MODE
+    else:
+        #print(f"Bad packet length {packet_len}.")
+        return REJECT_LENGTH
+
+    # the report mode byte was already checked, so skip over
+    # it. Byte numbers below are counted from here.
+    p = offset + 1
+    end = offset + packet_len
+
+    if buffer[p] != PACKET_HEAD[0]:
+        #print(f"Packet head {buffer[p]} isn't right.")
+        return REJECT_HEAD
+
+    target_state = buffer[p+1]
+    if target_state > 3:
+        #print(f"Detection status invalid.")
+        return REJECT_TARGET_STATE
+
+    # The basic part of the packet is:
+    # byte 1: 0 nothing, 1 motion, 2 static, 3 both (based on gate sensitivity config)
+    # byte 2: movement target distance in cm
+    # byte 3: (con't)
+    # byte 4: motion target energy
+    # byte 5: static target distance in cm
+    # byte 6: (con't)
+    # byte 7: static target energy
+    # byte 8: overall detection distance in cm
+    # byte 9: (con't)
+    # TODO: I'm not getting sensible values out of the
+    # overall detection distance. check why not.
+    # 
+    # byte -2: "tail" value of 55 
+    # byte -1: "calibration" value of 00
+    #
+    # In "engineering mode", there's more before the tail:
+    # byte 10: highest configured motion gate
+    # byte 11: highest configured static gate
+    # bytes 12-20: motion energy
+    # bytes 21-29: static energy
+    # byte 30: light level
+    # byte 31: is the output pin on?
+
+    if buffer[end-2] != PACKET_TAIL[0]:
+        #print(f"Invalid packet tail value.")
+        return REJECT_TAIL
+
+    if buffer[end-1] != PACKET_CALIBRATION[0]:
+        #print(f"Invalid packet calibration value.")
+        return REJECT_CALIBRATION
+
+    # todo: use lower of MAX_LEGIT_DISTANCE and distance resolution * gate limit
+
+    if target_state & MOTION_STATE_MASK:
+        if buffer[p+2] | (buffer[p+3] << 8) > MAX_LEGIT_DISTANCE:
+            return REJECT_DISTANCE
+        if buffer[p+4] > MAX_LEGIT_ENERGY:
+            return REJECT_ENERGY
+
+    if target_state & STATIC_STATE_MASK:
+        if buffer[p+5] | (buffer[p+6] << 8) > MAX_LEGIT_DISTANCE:
+            return REJECT_DISTANCE
+        if buffer[p+7] > MAX_LEGIT_ENERGY:
+            return REJECT_ENERGY
+
+    if target_state:
+        if buffer[p+8] | (buffer[p+9] << 8) > MAX_LEGIT_DISTANCE:
+            return REJECT_DISTANCE
+
+    return report_mode
+
+
+class LD2410Report():
+
+    """One data frame from an LD2410, frozen.
+
+    This just keeps the raw payload bytes and a timestamp, and works out
+    the fields when you ask for them. That keeps each report small and
+    quick to make, which matters if you keep thousands of them around.
+    The fields have the same names and meanings as the attributes on
+    MMWave (and are None in the same situations).
+    """
+
+    __slots__ = ("_packet", "_timestamp")
+
+    def __init__(self, packet, timestamp=None):
+        """Arguments:
+
+        packet -- the frame payload as bytes, already validated with check_packet()
+        timestamp -- when it was read. This is **NOT** from the sensor itself.
+        """
+        self._packet = packet
+        self._timestamp = timestamp
+
+    def __repr__(self):
+        return f"LD2410Report({self._packet!r}, {self._timestamp!r})"
+
+    @property
+    def raw(self):
+        """The frame payload, starting with the report mode byte."""
+        return self._packet
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def engineering_mode(self):
+        return self._packet[0] == REPORT_MODE_ENGINEERING
+
+    @property
+    def detected(self):
+        return bool(self._packet[2])
+
+    @property
+    def motion_detected(self):
+        return bool(self._packet[2] & MOTION_STATE_MASK)
+
+    @property
+    def static_detected(self):
+        return bool(self._packet[2] & STATIC_STATE_MASK)
+
+    @property
+    def motion_target_cm(self):
+        if self._packet[2] & MOTION_STATE_MASK:
+            return self._packet[3] | (self._packet[4] << 8)
+        return None
+
+    @property
+    def motion_energy(self):
+        if self._packet[2] & MOTION_STATE_MASK:
+            return self._packet[5]
+        return None
+
+    @property
+    def static_target_cm(self):
+        if self._packet[2] & STATIC_STATE_MASK:
+            return self._packet[6] | (self._packet[7] << 8)
+        return None
+
+    @property
+    def static_energy(self):
+        if self._packet[2] & STATIC_STATE_MASK:
+            return self._packet[8]
+        return None
+
+    @property
+    def detection_cm(self):
+        if self._packet[2]:
+            return self._packet[9] | (self._packet[10] << 8)
+        return None
+
+    @property
+    def last_motion_gate(self):
+        if self.engineering_mode:
+            return self._packet[11]
+        return None
+
+    @property
+    def last_static_gate(self):
+        if self.engineering_mode:
+            return self._packet[12]
+        return None
+
+    @property
+    def gate_motion_energy(self):
+        """Per-gate motion energy as a bytes object (index it like a list),
+        or None in basic mode."""
+        if self.engineering_mode:
+            return self._packet[13:13 + min(self._packet[11], LAST_GATE) + 1]
+        return None
+
+    @property
+    def gate_static_energy(self):
+        """Per-gate static energy as a bytes object, or None in basic mode."""
+        if self.engineering_mode:
+            return self._packet[22:22 + min(self._packet[12], LAST_GATE) + 1]
+        return None
+
+    @property
+    def light_level(self):
+        if self.engineering_mode:
+            return self._packet[31]
+        return None
+
+
+class LD2410Profile():
+
+    """How you'd like an LD2410 to be set up, for MMWave.apply().
+
+    Anything left as None is left alone. The gate sensitivities are lists
+    of 9 values (one per gate, 0-100), or a single number for all gates.
+    """
+
+    def __init__(self,
+                 gate_motion_sensitivity=None,
+                 gate_static_sensitivity=None,
+                 last_motion_gate=None,
+                 last_static_gate=None,
+                 presence_timeout=None,
+                 resolution=None,
+                 engineering_mode=None,
+                 bluetooth=None):
+        self.gate_motion_sensitivity = self._gates(gate_motion_sensitivity)
+        self.gate_static_sensitivity = self._gates(gate_static_sensitivity)
+        self.last_motion_gate = last_motion_gate
+        self.last_static_gate = last_static_gate
+        self.presence_timeout = presence_timeout
+        if resolution is not None and resolution not in RESOLUTION_CODES:
+            raise ValueError(f"Resolution {resolution} isn't one of {list(RESOLUTION_CODES)}")
+        self.resolution = resolution
+        self.engineering_mode = engineering_mode
+        self.bluetooth = bluetooth
+
+    @staticmethod
+    def _gates(values):
+        if values is None:
+            return None
+        if isinstance(values, int):
+            return [values] * (LAST_GATE+1)
+        values = list(values)
+        if len(values) != LAST_GATE+1:
+            raise ValueError(f"Need {LAST_GATE+1} gate values, not {len(values)}")
+        return values
+
+    @classmethod
+    def from_sensor(cls, sensor):
+        """A profile matching what we know about `sensor` right now."""
+        return cls(gate_motion_sensitivity=None if None in sensor.gate_motion_sensitivity else sensor.gate_motion_sensitivity,
+                   gate_static_sensitivity=None if None in sensor.gate_static_sensitivity else sensor.gate_static_sensitivity,
+                   last_motion_gate=sensor.last_motion_gate,
+                   last_static_gate=sensor.last_static_gate,
+                   presence_timeout=sensor.presence_timeout,
+                   resolution=sensor.resolution,
+                   engineering_mode=sensor.engineering_mode,
+                   bluetooth=sensor.bluetooth_enabled)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.__dict__.items() if value is not None)
+        return f"LD2410Profile({fields})"
+
+
+class _ConfigSession():
+    """What MMWave.config_session() returns."""
+
+    def __init__(self, sensor):
+        self.sensor = sensor
+
+    def __enter__(self):
+        self.sensor._enter_config_mode()
+        return self.sensor
+
+    def __exit__(self, *args):
+        self.sensor._exit_config_mode()
 
 
 class MMWave():
@@ -88,7 +537,7 @@ class MMWave():
     """TODO: write something helpful here!
     """
 
-    def __init__(self,port,initialize=True,engineering_always=True, doNotRead=False):
+    def __init__(self,port,initialize=True,engineering_always=True, doNotRead=False, stats=False, state_file=None):
         """Create a MMWave object which communicates over `port`.
 
         This will also do an initial read of the configuration of the sensor,
@@ -98,6 +547,10 @@ class MMWave():
 
         port -- should be a serial port-like object implementing .read(bytes) and .write(buffer)
         engineering_always -- switch to engineering mode if we end up not in it. Defaults to True.
+        stats -- keep counters and timings (see stats()). Off by default.
+        state_file -- where to keep what we know about the sensor's setup between
+                      runs (see save_state()). If it's there, we start with it, and
+                      don't ask the sensor for anything before the first read.
         
         """        
 
@@ -200,8 +653,43 @@ class MMWave():
         fine control over detection areas (within about 1.8m)
         """
 
+        self.bluetooth_enabled = None
+        """Whether we last turned bluetooth on or off. There's no command to
+        ask the sensor, so this is None until bluetooth() is called."""
+
+        self.firmware_version = None
+        """Set by get_firmware_version()."""
+
         self.last_updated = None
         """Timestamp of last successful read. This is **NOT** from the sensor itself."""
+
+        self._parser = FrameParser()
+        self._ack_parser = FrameParser(COMMAND_HEADER, COMMAND_FOOTER, MAX_LEGIT_RESPONSE_LENGTH)
+        self._newest = bytearray(PACKET_LEN_ENGINEERING)  # for read(latest=True)
+
+        self._config_session = 0  # how many config_session()s we're inside of
+        self._config_dirty = False  # config changed in a session, read it back at the end
+
+        self._stats = None
+        if stats:
+            self.enable_stats()
+
+        self._events = None  # see on_change()
+        self._windows = None  # see aggregate()
+        self._reader = None  # see start()
+
+        self.command_deadline = None
+        """Seconds each round of sending a command (with its own retries) may
+        take, or None for no limit. See _command()."""
+
+        self._deadline = None  # time.monotonic() to give up at, see _budget_start()
+        self._saved_timeout = None  # port timeout from before the deadline started
+
+        self.state_file = state_file
+        self._saved_state = None  # what's in state_file, as far as we know
+        self._state_unverified = False  # loaded from the file, not checked against the sensor yet
+        if state_file is not None:
+            self.load_state(state_file)
         
         if doNotRead:
             return
@@ -232,172 +720,294 @@ class MMWave():
     # TODO: timestamp!
     def readRawData(self, lenBytes):
         return self.port.read(lenBytes)
-    def read(self):
+    def read(self, latest=False, deadline=None):
         """Update object attributes with latest data from the sensor.
         Returns True on success, False otherwise. Also, if it fails,
         data attributes will be set to None.
-        """
-        for failure_count in range(100):
 
+        Normally this decodes the oldest frame waiting, so after a pause
+        you get old news, one frame at a time. With `latest=True`, it reads
+        everything the port has buffered and decodes only the newest good
+        frame in there; the older ones are only checked, not decoded. If
+        there's nothing buffered, it waits for the next frame as usual.
+
+        Without a `deadline`, how long this can take depends on the port's
+        timeout times a lot of retries. With `deadline` (seconds), it gives
+        up and returns False once that's used up, and cuts the port's
+        timeout down so that no single read goes past it either. That
+        includes switching to engineering mode, if it has to.
+        """
+        if deadline is None:
+            return self._read(latest)
+        outer = self._budget_start(deadline)
+        try:
+            return self._read(latest)
+        finally:
+            self._budget_end(outer)
+
+    def _read(self, latest):
+        if latest:
             if not self.engineering_mode and self.engineering_always:
                 self.enable_engineering_mode()
-            
-            if not self._scan_for_header(FRAME_HEADER):
-                continue
-
-            # determine report mode
-
-            packet_len = int.from_bytes(self.port.read(2), "little")
-            report_mode = int.from_bytes(self.port.read(1), "little")
-
-            # various mangled-read checks
-            if packet_len == PACKET_LEN_BASIC:
-                #print("Basic mode length detected")
-                if report_mode != REPORT_MODE_BASIC:
-                    #print("But not in basic mode!")
-                    continue
-                self.engineering_mode = False
-            elif packet_len == PACKET_LEN_ENGINEERING:
-                #print("Engineering mode length detected")
-                if report_mode != REPORT_MODE_ENGINEERING:
-                    #print("But not in engineering mode!")
-                    continue
-                self.engineering_mode = True
-            else:
-                #print(f"Bad packet length {packet_len}.")
-                continue
+            if self._read_latest():
+                self.last_updated = time.time()
+                if self.state_file is not None:
+                    self._check_state()
+                return True
 
-            # since we already read a byte to check the mode,
-            # our packet is one shorter than nominal. But, we
-            # also want to check the last for the EOF
-            # marker
-            packet = self.port.read(packet_len-1)
-            footer = self.port.read(4)
+        for failure_count in range(100):
 
+            if self._deadline is not None and self._budget_left() <= 0:
+                if self._stats is not None:
+                    self._stats.count("deadlines_missed")
+                break
 
-            if footer != FRAME_FOOTER:
-                #print("End-of_Frame marker doesn't match.")
-                continue
+            if not self.engineering_mode and self.engineering_always:
+                self.enable_engineering_mode()
 
-            if packet[0].to_bytes(1,"little") != PACKET_HEAD:
-                #print(f"Packet head {packet[0]} isn't right.")
-                continue
+            payload = self._parser.next_frame()
+            if payload < 0:
+                self._read_chunk()
+                payload = self._parser.next_frame()
+                if payload < 0:
+                    self.serial_failures += 1
+                    continue
 
-            target_state = packet[1]
-            if target_state > 3:
-                #print(f"Detection status invalid.")
-                continue
+            if self._decode(self._parser.buffer, payload, self._parser.length):
+                # success!
+                self.last_updated = time.time()
+                if self._stats is not None:
+                    self._stats.observe_count("read_retries", failure_count)
+                if self.state_file is not None:
+                    self._check_state()
+                return True
 
-            #print(packet.hex())
-
-            # fill out our values from the basic part of the 
-            # packet. This is:
-            # byte 1: 0 nothing, 1 motion, 2 static, 3 both (based on gate sensitivity config)
-            # byte 2: movement target distance in cm
-            # byte 3: (con't)
-            # byte 4: motion target energy
-            # byte 5: static target distance in cm
-            # byte 6: (con't)
-            # byte 7: static target energy
-            # byte 8: overall detection distance in cm
-            # byte 9: (con't)
-            # TODO: I'm not getting sensible values out of the
-            # overall detection distance. check why not.
-            # 
-            # byte -2: "tail" value of 55 
-            # byte -1: "calibration" value of 00
-
-            if packet[-2].to_bytes(1,"little") != PACKET_TAIL:
-            #print(f"Invalid packet tail value.")
-                continue
+        if self._stats is not None:
+            self._stats.observe_count("read_retries", failure_count)
+            self._stats.count("read_failures")
+            # TODO: raise a timeout error or something.
+            self._stats.debug(f"That took {failure_count} attempts.")
+        return False
 
-            if packet[-1].to_bytes(1,"little") != PACKET_CALIBRATION:
-                #print(f"Invalid packet calibration value.")
-                continue
+    def _read_latest(self):
+        """Drain the port, then decode the newest good frame from it.
+        Returns True if there was one."""
+        parser = self._parser
+        newest = self._newest
+        newest_length = 0
+        skipped = 0
+        while True:
+            # check the frames buffered so far, remember the last good one
+            last = -1
+            while True:
+                payload = parser.next_frame()
+                if payload < 0:
+                    break
+                report_mode = check_packet(parser.buffer, payload, parser.length)
+                if report_mode <= 0:
+                    if self._stats is not None:
+                        self._count_frame(report_mode)
+                    self.serial_failures += 1
+                    continue
+                # good frames get counted once we know which is the newest,
+                # since _decode() counts that one
+                if last >= 0 or newest_length:
+                    skipped += 1
+                last = payload
+                last_length = parser.length
+            if last >= 0:
+                # reading more moves the buffer around, so keep a copy
+                newest_length = parser.copy_data(last, newest, last_length)
 
-            self.detected = bool(target_state)
-            self.motion_detected = bool(target_state & MOTION_STATE_MASK)
-            self.static_detected = bool(target_state & STATIC_STATE_MASK)
+            try:
+                waiting = self.port.in_waiting
+            except AttributeError:
+                waiting = 0
+            if not waiting:
+                break
+            n = parser.readfrom(self.port, waiting)
+            if self._stats is not None:
+                self._stats.count("bytes_read", n)
+            if not n:
+                break
 
-            self.motion_target_cm = None
-            self.static_target_cm = None  
-            self.motion_energy = None
-            self.static_energy = None
-            self.detection_cm = None
+        if self._stats is not None and skipped:
+            self._stats.count("frames_skipped", skipped)
+            self._stats.count("frames_accepted", skipped)
+        return newest_length > 0 and self._decode(newest, 0, newest_length)
+
+    def _read_chunk(self):
+        """Grab whatever the port has buffered in one go, straight into
+        the parser. If that's nothing yet, wait (up to the port's timeout)
+        for about one frame's worth."""
+        try:
+            waiting = self.port.in_waiting
+        except AttributeError:
+            # not all serial-port-likes have this
+            waiting = 0
+        if not waiting:
+            waiting = PACKET_LEN_ENGINEERING + FRAME_OVERHEAD
+            if self._deadline is not None and self._budget_left() <= 0:
+                return 0
+        n = self._parser.readfrom(self.port, waiting)
+        if self._stats is not None:
+            self._stats.count("bytes_read", n)
+        return n
+
+    def _decode(self, buffer, offset, packet_len):
+        """Validate one frame payload (everything between the length
+        and the footer), found at `offset` in `buffer`, and update our
+        attributes from it.
+
+        This reads straight out of the parser's buffer and updates the
+        gate lists in place, so a good frame doesn't allocate anything
+        (well, except for CPython's big ints, which come and go).
+
+        Returns True if it was a good data packet, False otherwise.
+        """
+        report_mode = check_packet(buffer, offset, packet_len)
+        if self._stats is not None:
+            self._count_frame(report_mode)
+        if report_mode <= 0:
+            return False
+        self.engineering_mode = report_mode == REPORT_MODE_ENGINEERING
 
-            # todo: use lower of MAX_LEGIT_DISTANCE and distance resolution * gate limit
+        # Byte numbers are counted after the report mode byte; see
+        # check_packet() for the layout.
+        p = offset + 1
+        target_state = buffer[p+1]
 
-            if self.motion_detected:
-                self.motion_target_cm = int.from_bytes(packet[2:4], "little")
-                self.motion_energy = int(packet[4])
-                if self.motion_target_cm > MAX_LEGIT_DISTANCE:
-                    continue
-                if self.motion_energy > MAX_LEGIT_ENERGY:
-                    continue
+        self.detected = bool(target_state)
+        self.motion_detected = bool(target_state & MOTION_STATE_MASK)
+        self.static_detected = bool(target_state & STATIC_STATE_MASK)
 
-            if self.static_detected:
-                self.static_target_cm = int.from_bytes(packet[5:7], "little")
-                self.static_energy = int(packet[7])
+        self.motion_target_cm = None
+        self.static_target_cm = None  
+        self.motion_energy = None
+        self.static_energy = None
+        self.detection_cm = None
 
-                if self.static_target_cm > MAX_LEGIT_DISTANCE:
-                    continue
-                if self.static_energy > MAX_LEGIT_ENERGY:
-                    continue
+        if self.motion_detected:
+            self.motion_target_cm = buffer[p+2] | (buffer[p+3] << 8)
+            self.motion_energy = buffer[p+4]
 
-            if target_state:
-                self.detection_cm = int.from_bytes(packet[8:10], "little")
-                if self.detection_cm > MAX_LEGIT_DISTANCE:
-                    continue
+        if self.static_detected:
+            self.static_target_cm = buffer[p+5] | (buffer[p+6] << 8)
+            self.static_energy = buffer[p+7]
 
-            # clear these, since they're no longer valid
-            self.gate_motion_energy = [None] * 9
-            self.gate_static_energy = [None] * 9 
-        
-            # we're done.
-            if report_mode == REPORT_MODE_BASIC:
-                # sucess (basic mode)
-                self.last_updated = time.time()
-                return True
+        if target_state:
+            self.detection_cm = buffer[p+8] | (buffer[p+9] << 8)
 
-            # In "engineering mode":
-            # byte 10: highest configured motion gate
-            # byte 11: highest configured static gate
-            # bytes 12-20: motion energy
-            # bytes 21-29: static energy
-            # byte 30: light level
-            # byte 31: is the output pin on?
-            # byte -2: "tail" value of 55 
-            # byte -1: "calibration" value of 00
-            
+        # clear these, since they're no longer valid. (In place, so
+        # that we're not making new lists on every frame.)
+        gate_motion_energy = self.gate_motion_energy
+        gate_static_energy = self.gate_static_energy
+        for i in range(LAST_GATE+1):
+            gate_motion_energy[i] = None
+            gate_static_energy[i] = None
+    
+        if report_mode == REPORT_MODE_ENGINEERING:
             # TODO: this is redundant with info from read_config()
             # Should it be used to fill things out, or as a correctness check?
-            self.last_motion_gate = int(packet[10])
-            self.last_static_gate = int(packet[11])
+            self.last_motion_gate = buffer[p+10]
+            self.last_static_gate = buffer[p+11]
 
-            for i in range(self.last_motion_gate+1):
-                self.gate_motion_energy[i] = int(packet[12+i])
-                if self.gate_motion_energy[i] > MAX_LEGIT_ENERGY:
-                    continue
-            for i in range(self.last_static_gate+1):
-                self.gate_static_energy[i] = int(packet[21+i])
-                if self.gate_motion_energy[i] > MAX_LEGIT_ENERGY:
-                    continue
+            for i in range(min(self.last_motion_gate, LAST_GATE)+1):
+                gate_motion_energy[i] = buffer[p+12+i]
+            for i in range(min(self.last_static_gate, LAST_GATE)+1):
+                gate_static_energy[i] = buffer[p+21+i]
 
-            self.light_level = int(packet[30])
+            self.light_level = buffer[p+30]
 
 
             # this is whether the precence line is raised, which
             # should be the same as self.detected
-            assert(bool(packet[31]) == self.detected)
-            
-            # success! (engineering mode)
-            self.last_updated = time.time()
-            return True
+            assert(bool(buffer[p+31]) == self.detected)
+
+        # we're done; tell whoever asked.
+        if self._events is not None:
+            self._events.update(self)
+        if self._windows is not None:
+            for window in self._windows:
+                window.add(self)
+        
+        # success!
+        return True
 
-        if failure_count:
-            # TODO: raise a timeout error or something.
-            print(f"That took {failure_count} attempts.")
-        return False
+    def frames(self):
+        """Generator which yields an LD2410Report for every good frame,
+        for as long as you keep asking.
+
+        Unlike read(), this doesn't touch the data attributes at all, so
+        it's the cheap way to collect a history. Bad frames are skipped
+        (and counted in `serial_failures`); if the port times out, it just
+        keeps waiting.
+        """
+        if not self.engineering_mode and self.engineering_always:
+            self.enable_engineering_mode()
+
+        while True:
+            for report in self._poll_reports():
+                yield report
+
+    def _poll_reports(self):
+        """LD2410Reports for the good frames already buffered, or if there
+        aren't any, for what one read from the port brings. Often empty."""
+        parser = self._parser
+        reports = []
+        for attempt in range(2):
+            while True:
+                payload = parser.next_frame()
+                if payload < 0:
+                    break
+                report_mode = check_packet(parser.buffer, payload, parser.length)
+                if self._stats is not None:
+                    self._count_frame(report_mode)
+                if report_mode <= 0:
+                    self.serial_failures += 1
+                    continue
+                reports.append(LD2410Report(parser.payload(payload), time.time()))
+            if reports or attempt:
+                return reports
+            self._read_chunk()
+        return reports
+
+    def start(self, callback=None):
+        """Start reading in a background thread, which keeps the port
+        drained and the newest report in latest(). `callback(report)`, if
+        given, is called (in that thread) for every LD2410Report.
+
+        While it runs, the thread owns the port: the data attributes
+        aren't updated (use latest()), don't read() or frames(), and
+        commands raise RuntimeError. stop() it first.
+        This needs threads and the MMWaveReader module.
+        """
+        if self._reader is not None and self._reader.running:
+            raise RuntimeError("Already started")
+        from MMWaveReader import BackgroundReader
+        if not self.engineering_mode and self.engineering_always:
+            self.enable_engineering_mode()
+        self._reader = BackgroundReader(self._poll_reports, callback).start()
+        return self._reader
+
+    def latest(self):
+        """The newest LD2410Report from the background reader (see
+        start()), or None if there's none (yet). Never blocks."""
+        if self._reader is None:
+            return None
+        return self._reader.latest()
+
+    @property
+    def dropped(self):
+        """Reports the background reader replaced before latest() got them."""
+        return 0 if self._reader is None else self._reader.dropped
+
+    def stop(self):
+        """Stop the background reader. Returns False if it didn't finish in
+        time. latest() and `dropped` keep what it had."""
+        if self._reader is None:
+            return True
+        return self._reader.stop()
         
     def _send(self,command_data_bytes):
         """Write to sensor. 
@@ -414,75 +1024,87 @@ class MMWave():
         Should raise an exception for serial port problems.
         """
 
+        if self._reader is not None and self._reader.running:
+            raise RuntimeError("The background reader is running, stop() it before sending commands")
+
+        stats = self._stats
+
         # wrap the packet up and send
-        packet = COMMAND_HEADER + len(command_data_bytes).to_bytes(2,"little") + command_data_bytes + COMMAND_FOOTER
-        print("Writing packet: ", packet)
+        packet = command_packet(command_data_bytes)
+        if stats is not None:
+            stats.debug("Writing packet: ", packet)
+            start = time.monotonic()
         self.port.write(packet)
-        print("response:", self.port.in_waiting)
-        #  time.sleep(0.2)
-        print("response package: ", self.port.read(128))
-        # now listen for the (correct) response
+        # now listen for the (correct) response. It uses the same header
+        # as the command packet, and the parser skips everything else
+        # (like data frames still on their way). It would be more robust to
+        # check for the exact expected length for each particular command,
+        # but gets clunky. So, the parser at least makes sure it isn't
+        # longer than MAX_LEGIT_RESPONSE_LENGTH.
+        parser = self._ack_parser
+        parser.reset()
         for _ in range(10):
-            # the response uses the same header as the command packet
-            if not self._scan_for_header(COMMAND_HEADER):
-                #print("Didn't find response header.")
-                continue
-
-            packet_len = int.from_bytes(self.port.read(2), "little")
-        
-            # It would be more robust to check for the exact expected length
-            # for each particular command, but gets clunky. So, at least make
-            # sure it isn't unreasonable
-            if packet_len > MAX_LEGIT_RESPONSE_LENGTH:
-                #print("Response unreasonably long")
-                continue
-
-            packet = self.port.read(packet_len)
-            status = packet[:4]
-            result = packet[4:]
-            footer = self.port.read(4)
-
-            if footer != COMMAND_FOOTER:
-                #print("End-of_Frame marker doesn't match.")
-                continue
-
-            # the response should include echoing back the command, which
-            # will be the first byte of the command + data
-            if int(status[0]) == 0:
-                #print("Uh, that shouldn't be zero")
-                continue
-            if int(status[0]) != command_data_bytes[0]:
-                #print(f"Response {int(packet[0])} doesn't match {command_data_bytes[0]}")
-                continue
-            if int(status[0]) != command_data_bytes[0]:
-                #print(f"Response {int(packet[0])} doesn't match {command_data_bytes[0]}")
-                continue
-
-
-            if status[1] == 0:
-                #print("Got failure response to command.")
-                return None
-
-            if status[1] != 1:
-                #print("Response code something other than 0 or 1")
+            if self._deadline is not None and self._budget_left() <= 0:
+                break
+            waiting = self.port.in_waiting
+            if not parser.readfrom(self.port, waiting or COMMAND_ACK_MIN_LENGTH):
+                # timeout
+                self.serial_failures += 1
                 continue
-
-            if len(result) == 0:
-                # success, but no data for this command
-                return True
-            
-            # success with data (without the status code)
-            return(result)
-                    
+            while True:
+                response = parser.next_frame()
+                if response < 0:
+                    break
+                rc = check_response(parser.payload(response), command_data_bytes)
+                if rc is False:
+                    continue
+                if stats is not None:
+                    stats.observe("command_rtt", time.monotonic() - start)
+                    stats.debug("response: ", rc)
+                return rc
+
+        if stats is not None:
+            stats.count("ack_timeouts")
+            stats.debug("No response to ", packet)
         raise TimeoutError
     
-    def _command(self,command,data=None):
+    def _command(self,command,data=None,deadline=None):
         """Enter config mode, send a command and optional data,
         and then exit config mode.
         
+        Inside a config_session(), config mode is already on, so this
+        just sends the command.
+
+        `deadline` is how many seconds all of that (retries included) may
+        take, defaulting to `command_deadline`. Once it's used up, this
+        stops and returns False.
+
         Returns True or a bytestring on success, or None on failure."""
+
+        if deadline is None:
+            deadline = self.command_deadline
+        if deadline is None:
+            return self._command_retries(command, data)
+        outer = self._budget_start(deadline)
+        try:
+            return self._command_retries(command, data)
+        finally:
+            self._budget_end(outer)
+
+    def _command_retries(self, command, data):
+        if self._config_session:
+            for _retries in range(10):
+                if self._deadline is not None and self._budget_left() <= 0:
+                    return False
+                try:
+                    return self._send(command + data if data else command)
+                except TimeoutError:
+                    continue
+            return False
         
         for _retries in range(10):
+            if self._deadline is not None and self._budget_left() <= 0:
+                return False
             try:
                 if self._send(COMMAND_CONFIG_ENABLE + CONFIG_PROTOCOL_VERSION) == None:
                     continue          
@@ -508,21 +1130,381 @@ class MMWave():
         
         # success!
         return rc
-                
 
-    def _scan_for_header(self,header):
-        # scan for data packet header
-        buffer = [0] * 4
-        for _ in range(33):
-            buffer.pop(0)
-            buffer.append(self.port.read(1))
-            if not buffer[-1]: # timeout
-                break
-            if buffer == [x.to_bytes(1,"little") for x in header]:                                
-                return True
-        self.serial_failures += 1
+    def _budget_start(self, seconds):
+        """Start a time budget of `seconds` for _read()/_command_retries()
+        and everything they call. A budget inside another one can only be
+        shorter. Returns what to hand to _budget_end()."""
+        outer = self._deadline
+        end = time.monotonic() + seconds
+        if outer is None:
+            self._saved_timeout = getattr(self.port, "timeout", None)
+        elif outer < end:
+            end = outer
+        self._deadline = end
+        return outer
+
+    def _budget_end(self, outer):
+        self._deadline = outer
+        if outer is None and hasattr(self.port, "timeout"):
+            self.port.timeout = self._saved_timeout
+
+    def _budget_left(self):
+        """Seconds left until the deadline, and cut the port's timeout
+        down to that, so the next read doesn't wait past it."""
+        left = self._deadline - time.monotonic()
+        if left > 0 and hasattr(self.port, "timeout"):
+            saved = self._saved_timeout
+            self.port.timeout = left if saved is None else min(saved, left)
+        return left
+
+    def enable_stats(self, log=None):
+        """Start keeping counters and timings (see stats()). Debug
+        messages go to `log` (print works) if given.
+
+        This needs the MMWaveStats module. Returns the Stats object.
+        """
+        from MMWaveStats import Stats
+        self._stats = Stats(log)
+        return self._stats
+
+    def disable_stats(self):
+        self._stats = None
+
+    def stats(self):
+        """A dict snapshot of the counters and timings, or None if they
+        aren't enabled. Counters include:
+
+        bytes_read, bytes_discarded (while looking for frames),
+        frames_accepted, frames_rejected_<reason> (see REJECT_REASONS),
+        frames_skipped (by read(latest=True)), ack_timeouts, read_failures,
+        deadlines_missed (by read(deadline=...)), baud_fallbacks (speeds
+        negotiate_baud() tried and gave up on) and serial_failures.
+
+        Histograms (count, mean, max and buckets) are read_retries (failed
+        attempts per read()) and command_rtt (seconds per command round trip).
+        """
+        if self._stats is None:
+            return None
+        result = self._stats.snapshot()
+        result["bytes_discarded"] = self._parser.discarded
+        result["serial_failures"] = self.serial_failures
+        return result
+
+    def on_change(self, fields, callback, hysteresis=0, debounce=0):
+        """Call `callback(field, old, new)` whenever one of `fields` (a name
+        from WATCHABLE_FIELDS, or a tuple of them) really changes, as
+        read() decodes frames. See MMWaveEvents for the details.
+
+        Arguments:
+
+        hysteresis -- for distances and energies, how far the value has to
+                      move from the last reported one before it counts.
+                      One number, or a dict of field -> threshold.
+                      Fields which aren't numbers (like `detected`)
+                      ignore it.
+        debounce -- seconds a change has to last before it's reported
+
+        Returns a list of Subscriptions (one per field); cancel() them to stop.
+        This needs the MMWaveEvents module.
+        """
+        if self._events is None:
+            from MMWaveEvents import ChangeWatcher
+            self._events = ChangeWatcher(WATCHABLE_FIELDS)
+        return self._events.subscribe(self, fields, callback, hysteresis, debounce)
+
+    def aggregate(self, window=300, every=1, callback=None):
+        """Keep rolling min, max, mean and variance of every gate energy,
+        the target distances and energies over the last `window` frames
+        read(), calling `callback(the RollingWindow)` on every `every`th
+        frame. Can be called more than once, for different windows.
+
+        Returns the RollingWindow. This needs the MMWaveWindow module.
+        """
+        from MMWaveWindow import RollingWindow
+        rolling = RollingWindow(window, every, callback)
+        self._windows = (self._windows or []) + [rolling]
+        return rolling
+
+    def remove_aggregate(self, rolling):
+        """Stop updating a RollingWindow from aggregate()."""
+        windows = [w for w in self._windows or () if w is not rolling]
+        self._windows = windows or None
+
+    def _count_frame(self, report_mode):
+        if report_mode > 0:
+            self._stats.count("frames_accepted")
+        else:
+            self._stats.count("frames_rejected_" + REJECT_REASONS[-report_mode])
+
+    def save_state(self, path=None):
+        """Write what we know about the sensor's setup (see STATE_FIELDS) to
+        `path`, by default `state_file`, as a small JSON file. A new MMWave
+        given that as its state_file starts with it, instead of asking the
+        sensor for everything again.
+
+        Nothing is written if nothing changed since the last time, which
+        is kinder to flash. On CircuitPython, the filesystem has to be
+        writable from code (see storage.remount() in boot.py); if it isn't,
+        this just returns False. Returns True if it wrote the file.
+        """
+        import json
+        path = path or self.state_file
+        if path is None:
+            raise ValueError("No path and no state_file to save to")
+        state = {"version": STATE_VERSION}
+        for name in STATE_FIELDS:
+            value = getattr(self, name)
+            state[name] = list(value) if isinstance(value, list) else value
+        if state == self._saved_state:
+            return False
+        try:
+            with open(path, "w") as f:
+                json.dump(state, f)
+        except OSError as e:
+            if self._stats is not None:
+                self._stats.debug("Can't save state: ", e)
+            return False
+        self._saved_state = state
+        return True
+
+    def load_state(self, path):
+        """Take the sensor's setup from a file written by save_state().
+        It's taken on trust until revalidate() (see there). Returns False,
+        and leaves everything alone, if there's no (usable) file."""
+        import json
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return False
+        for name in ("gate_motion_sensitivity", "gate_static_sensitivity"):
+            gates = state.get(name)
+            if not isinstance(gates, list) or len(gates) != LAST_GATE+1:
+                return False
+
+        for name in STATE_FIELDS:
+            value = state.get(name)
+            if isinstance(value, list):
+                # in place, like everywhere else
+                getattr(self, name)[:] = value
+            else:
+                setattr(self, name, value)
+        self._saved_state = state
+        self._state_unverified = True
+        return True
+
+    def revalidate(self, deadline=None):
+        """Ask the sensor for its config, resolution and firmware version,
+        and save them to `state_file`. After starting from a state file,
+        call this whenever there's time (it takes a few config mode round
+        trips). It also happens by itself from read() as soon as a frame
+        doesn't match what the file said, limited to REVALIDATE_TIME.
+
+        `deadline` is how many seconds all of it may take. Returns True if
+        it all worked, and False if anything didn't, including the sensor
+        not answering or answering nonsense.
+        """
+        if deadline is None:
+            return self._revalidate()
+        outer = self._budget_start(deadline)
+        try:
+            return self._revalidate()
+        finally:
+            self._budget_end(outer)
+
+    def _revalidate(self):
+        try:
+            ok = self.read_config()
+            ok = self.get_resolution() is not None and ok
+            ok = self.get_firmware_version() is not None and ok
+        except (OSError, SystemError) as e:
+            # timeouts, or a firmware type we don't know
+            if self._stats is not None:
+                self._stats.debug("Revalidating failed: ", e)
+            return False
+        if ok:
+            self._state_unverified = False
+        return ok
+
+    def _state_read(self):
+        # something just came from the sensor, so the state file might need updating
+        if self.state_file is not None:
+            self.save_state()
+
+    def _check_state(self):
+        """After a good frame: keep the state file up to date, and
+        revalidate if the frame says it's wrong."""
+        if self._state_mismatch():
+            self.revalidate(REVALIDATE_TIME)
+
+    def _state_mismatch(self):
+        """The part of _check_state() which doesn't talk to the sensor.
+        Returns True if it's time to revalidate."""
+        saved = self._saved_state
+        if (saved is not None and self._state_unverified and self.engineering_mode
+                and (self.last_motion_gate != saved.get("last_motion_gate")
+                     or self.last_static_gate != saved.get("last_static_gate"))):
+            # the sensor isn't set up like the file said, so what else is off?
+            # (only try this once by ourselves, in case the sensor won't answer)
+            self._state_unverified = False
+            if self._stats is not None:
+                self._stats.count("state_mismatches")
+            return True
+        if saved is None or saved.get("engineering_mode") != self.engineering_mode:
+            self.save_state()
         return False
 
+    def config_session(self):
+        """Use as `with sensor.config_session():` to run a bunch of commands
+        while entering and leaving config mode only once, instead of
+        around every single command. Settings which normally read the config
+        back afterwards (set_gate_sensitivity() and set_basic_config()) only
+        do it once, when the session ends.
+
+        While in config mode, the sensor doesn't send any data, so don't
+        read() in here.
+
+        Sessions can be nested; only the outermost one does anything.
+        Raises TimeoutError if the sensor won't go into config mode.
+        """
+        return _ConfigSession(self)
+
+    def _enter_config_mode(self):
+        self._config_session += 1
+        if self._config_session > 1:
+            return
+        for _retries in range(10):
+            try:
+                if self._send(COMMAND_CONFIG_ENABLE + CONFIG_PROTOCOL_VERSION) == None:
+                    continue
+                return
+            except TimeoutError:
+                continue
+        self._config_session -= 1
+        raise TimeoutError("Sensor won't enter config mode")
+
+    def _exit_config_mode(self):
+        if self._config_session > 1:
+            self._config_session -= 1
+            return
+        try:
+            if self._config_dirty:
+                self._config_dirty = False
+                self.read_config()
+        finally:
+            self._config_session = 0
+            for _retries in range(10):
+                try:
+                    if self._send(COMMAND_CONFIG_DISABLE) != None:
+                        break
+                except TimeoutError:
+                    continue
+
+    def apply(self, profile):
+        """Make the sensor's configuration match an LD2410Profile, sending
+        only the commands needed for the settings that differ.
+
+        What the sensor currently has is taken from our attributes (as
+        filled in by read_config(), get_resolution() and so on). If those
+        aren't known yet, they're read first. The commands all happen in
+        one config_session(), so the config is read back at most once. If
+        everything already matches, nothing is sent at all.
+
+        Returns a list of the names of the settings that were changed,
+        which is empty if the sensor already matched. Raises TimeoutError
+        if the sensor won't talk to us.
+        """
+        if profile.engineering_mode is not None:
+            self.engineering_always = profile.engineering_mode
+
+        steps = None if self._profile_needs_reading(profile) else self._profile_steps(profile)
+        if steps == []:
+            return []
+
+        changed = []
+        with self.config_session():
+            if steps is None:
+                if not self._config_known() and not self.read_config():
+                    raise TimeoutError("Couldn't read the current config")
+                if profile.resolution is not None and self.resolution is None:
+                    self.get_resolution()
+                steps = self._profile_steps(profile)
+            for name, method, args in steps:
+                method(*args)
+                if name not in changed:
+                    changed.append(name)
+        return changed
+
+    def _profile_needs_reading(self, profile):
+        """Do we need to ask the sensor what it has before we can compare?"""
+        needs_config = (profile.gate_motion_sensitivity is not None
+                        or profile.gate_static_sensitivity is not None
+                        or profile.last_motion_gate is not None
+                        or profile.last_static_gate is not None
+                        or profile.presence_timeout is not None)
+        return ((needs_config and not self._config_known())
+                or (profile.resolution is not None and self.resolution is None))
+
+    def _profile_steps(self, profile):
+        """The commands needed to get from what we know the sensor has to
+        `profile`, as a list of (setting name, method, arguments)."""
+        steps = []
+
+        # Gate sensitivities. The command sets motion and static together.
+        want_motion = profile.gate_motion_sensitivity or self.gate_motion_sensitivity
+        want_static = profile.gate_static_sensitivity or self.gate_static_sensitivity
+        gates = [gate for gate in range(LAST_GATE+1)
+                 if want_motion[gate] != self.gate_motion_sensitivity[gate]
+                 or want_static[gate] != self.gate_static_sensitivity[gate]]
+        if len(gates) == LAST_GATE+1 and len(set(want_motion)) == 1 and len(set(want_static)) == 1:
+            # all the same, so one command does it
+            steps.append(("gate_sensitivity", self.set_gate_sensitivity, (-1, want_motion[0], want_static[0])))
+        else:
+            for gate in gates:
+                steps.append(("gate_sensitivity", self.set_gate_sensitivity, (gate, want_motion[gate], want_static[gate])))
+
+        # These three also go together.
+        basic = (self.last_motion_gate, self.last_static_gate, self.presence_timeout)
+        want = (basic[0] if profile.last_motion_gate is None else profile.last_motion_gate,
+                basic[1] if profile.last_static_gate is None else profile.last_static_gate,
+                basic[2] if profile.presence_timeout is None else profile.presence_timeout)
+        if want != basic:
+            steps.append(("basic_config", self.set_basic_config, want))
+
+        if profile.resolution is not None and profile.resolution != self.resolution:
+            steps.append(("resolution", self.set_resolution, (profile.resolution,)))
+
+        if profile.engineering_mode is not None and profile.engineering_mode != self.engineering_mode:
+            steps.append(("engineering_mode", self._set_engineering_mode, (profile.engineering_mode,)))
+
+        if profile.bluetooth is not None and profile.bluetooth != self.bluetooth_enabled:
+            steps.append(("bluetooth", self.bluetooth, (profile.bluetooth,)))
+
+        return steps
+
+    def _set_engineering_mode(self, on):
+        rc = self.enable_engineering_mode() if on else self.disable_engineering_mode()
+        if rc:
+            self.engineering_mode = on
+        return rc
+
+    def _config_known(self):
+        return (self.presence_timeout is not None
+                and None not in self.gate_motion_sensitivity
+                and None not in self.gate_static_sensitivity)
+
+    def _config_changed(self):
+        """Read the config back after changing it -- right away, or at the
+        end of the config session if we're in one."""
+        if self._config_session:
+            self._config_dirty = True
+        else:
+            self.read_config()
+                
+
     def set_basic_config(self,last_motion_gate,last_static_gate,presence_timeout):
         """Configures the maximum distance gates and the presence_timeout. See §2.2.3 in the docs.
 
@@ -536,17 +1518,10 @@ class MMWave():
         I'm tempted to fix this by just making this `set_presence_timeout` and locking the
         others to 8,8.
         """
-        if last_motion_gate<2 or last_motion_gate>LAST_GATE:
-            raise ValueError(f"Motion gate number {last_motion_gate} out of range 2-{LAST_GATE}")
-        if last_static_gate<2 or last_static_gate>LAST_GATE:
-            raise ValueError(f"Static gate number {last_static_gate} out of range 2-{LAST_GATE}")
-        if presence_timeout < 0 or presence_timeout > MAX_LEGIT_PRESENCE_TIMEOUT:
-            raise ValueError(f"Presence timeout {presence_timeout} out of range 0-{MAX_LEGIT_PRESENCE_TIMEOUT}")
-
-        data = int(0).to_bytes(2,"little") + int(last_motion_gate).to_bytes(4,"little") + int(1).to_bytes(2,"little") + int(last_static_gate).to_bytes(4,"little") + int(2).to_bytes(2,"little") + int(presence_timeout).to_bytes(4,"little")
+        data = basic_config_data(last_motion_gate,last_static_gate,presence_timeout)
         
         rc = self._command(COMMAND_BASIC_CONFIG,data)
-        self.read_config()
+        self._config_changed()
         # TODO: verify that the read-back values are what we just alledgedly set. 
         return rc
 
@@ -557,48 +1532,53 @@ class MMWave():
             if result == None:
                 continue
 
-            if result[0] != 0xaa: # internal packet start magic code
-                continue
+            if self._parse_config(result):
+                self._state_read()
+                return True
 
-            # next three bytes are configured largest gate.
-            
-            
-            # TODO: this is not documented. How does it relate to the
-            # motion and static last gate parameters? Weird.
-            _last_gate = result[1]
-        
-            last_motion_gate = result[2]
-            if last_motion_gate > LAST_GATE:
-                continue
-            last_static_gate = result[3]
-            if last_static_gate > LAST_GATE:
-                continue
-            
-            self.last_motion_gate = last_motion_gate
-            self.last_static_gate = last_static_gate
-
-            #  the next 9 are motion gate sensitivity
-            #  then next 9 are static gate sensitivity
-            for i in range(self.last_motion_gate+1):
-                self.gate_motion_sensitivity[i] = int(result[4+i])
-                if self.gate_motion_sensitivity[i] > MAX_LEGIT_ENERGY:
-                    continue
-            for i in range(self.last_static_gate+1):
-                self.gate_static_sensitivity[i] = int(result[13+i])
-                if self.gate_static_sensitivity[i] > MAX_LEGIT_ENERGY:
-                    continue
+        # if we didn't succeed, well, then, must be...
+        return False
+
+    def _parse_config(self, result):
+        """Fill in the config attributes from a read-config response.
+        Returns False (and leaves things alone) if it looks mangled."""
+        if not isinstance(result, (bytes, bytearray)) or len(result) < 24:
+            return False
 
+        if result[0] != 0xaa: # internal packet start magic code
+            return False
 
-            # then last 2 are little-endian presence timeout
-            presence_timeout = int.from_bytes(result[22:], "little")
-            if presence_timeout > MAX_LEGIT_PRESENCE_TIMEOUT:
-                continue
-            self.presence_timeout = presence_timeout
+        # next three bytes are configured largest gate.
+        
+        
+        # TODO: this is not documented. How does it relate to the
+        # motion and static last gate parameters? Weird.
+        _last_gate = result[1]
+    
+        last_motion_gate = result[2]
+        if last_motion_gate > LAST_GATE:
+            return False
+        last_static_gate = result[3]
+        if last_static_gate > LAST_GATE:
+            return False
 
-            return True
+        # then last 2 are little-endian presence timeout
+        presence_timeout = int.from_bytes(result[22:], "little")
+        if presence_timeout > MAX_LEGIT_PRESENCE_TIMEOUT:
+            return False
+        
+        self.last_motion_gate = last_motion_gate
+        self.last_static_gate = last_static_gate
 
-        # if we didn't succeed, well, then, must be...
-        return False
+        #  the next 9 are motion gate sensitivity
+        #  then next 9 are static gate sensitivity
+        for i in range(self.last_motion_gate+1):
+            self.gate_motion_sensitivity[i] = int(result[4+i])
+        for i in range(self.last_static_gate+1):
+            self.gate_static_sensitivity[i] = int(result[13+i])
+
+        self.presence_timeout = presence_timeout
+        return True
 
     def enable_engineering_mode(self):
         """With this on, the LD2410 returns individual gate status 
@@ -633,33 +1613,32 @@ class MMWave():
         motion sensitivity -- motion energy threshold for this gate (0-100)
         static sensitivity -- static energy threshold for this gate (0-100)
         """
-        if motion_sensitivity < 0 or motion_sensitivity > 100:
-            raise ValueError(f"Motion sensitivity {motion_sensitivity} out of range 0-100")
-        if static_sensitivity < 0 or static_sensitivity > 100:
-            raise ValueError(f"Statiction sensitivity {static_sensitivity} out of range 0-100")        
-        if gate<-1 or gate>LAST_GATE:
-            raise ValueError(f"Gate number {gate} out of range -1-{LAST_GATE}")
-        
-        if gate == -1:
-            gate = 0xFFFF
-
-        data = int(0).to_bytes(2,"little") + int(gate).to_bytes(4,"little") + int(1).to_bytes(2,"little") + int(motion_sensitivity).to_bytes(4,"little") + int(2).to_bytes(2,"little") + int(static_sensitivity).to_bytes(4,"little")
+        data = gate_sensitivity_data(gate,motion_sensitivity,static_sensitivity)
         
         rc = self._command(COMMAND_GATE_SENSITIVITY,data)
-        self.read_config()
+        self._config_changed()
         # TODO: verify that the read-back values are what we just alledgedly set. 
         return rc
 
     def get_firmware_version(self):
-        """Read firmware version -- call this and then check the `firmware` attribute"""
+        """Read firmware version -- call this and then check the `firmware_version`
+        attribute. Also returns it, or None if the sensor didn't tell us."""
 
         for _failure_count in range(10):
             result = self._command(COMMAND_FIRMWARE_VERSION)
-            if result == None:
-                continue
+            # None is a nak, False is no answer at all (or out of time)
+            if isinstance(result, (bytes, bytearray)) and len(result) >= 8:
+                break
+            if result is False and self._deadline is not None and self._budget_left() <= 0:
+                return None
+        else:
+            return None
 
-        # FIXME: proper error handling here
-            
+        self._parse_firmware_version(result)
+        self._state_read()
+        return self.firmware_version
+
+    def _parse_firmware_version(self, result):
         # This is all really weird. The version is actually expressed as
         # hex values in reverse -- with the first two being some kind of
         # undocumented "type"
@@ -668,23 +1647,178 @@ class MMWave():
         major = f"V{result[3]:x}.{result[2]:02x}"
         minor = f"{result[7]:2x}{result[6]:02x}{result[5]:02x}{result[4]:02x}"
         self.firmware_version = major + "." + minor
+        return self.firmware_version
 
 
     def set_baudrate(self,baud=DEFAULT_BAUD):
         """Changes the port speed. If the default 256000 doesn't work cleanly, 
         it's probably best to use Bluetooth and the app to lower it to 57600 (or
         whatever does work for you). But here's the command in case you want it!
+
+        This takes effect on the next restart, and then our end of the port
+        has to follow. negotiate_baud() does all of that for you.
         """
-        code = {  9600: 0x01,
-                    19200: 0x02,
-                    38400: 0x03,
-                    57600: 0x04,
-                115200: 0x05,
-                230400: 0x06,
-                256000: 0x07,
-                460800: 0x08,
-        }            
-        return self._command(COMMAND_BAUD,code[baud].to_bytes(2,"little"))
+        return self._command(COMMAND_BAUD,BAUD_CODES[baud].to_bytes(2,"little"))
+
+    def negotiate_baud(self, max_baudrate=460800, frames=BAUD_VERIFY_FRAMES,
+                       max_error_rate=BAUD_MAX_ERROR_RATE, timeout=BAUD_VERIFY_TIME,
+                       probe_timeout=BAUD_PROBE_TIME):
+        """Move the sensor (and the port) to the fastest baud rate the wiring
+        handles cleanly. Faster means each frame spends less time on the wire,
+        so read(latest=True) gets fresher data and commands answer sooner.
+
+        First it finds the speed the sensor is at now (see probe_baud(),
+        which listens `probe_timeout` seconds at each speed it tries).
+        Then, from `max_baudrate` down, it switches both ends to each faster
+        speed and checks it: `frames` frames in a row (within `timeout`
+        seconds) with at most `max_error_rate` of them bad, and a command
+        round trip. When a speed fails that, it goes back to the one it
+        started at before trying the next, so it always knows where the
+        sensor is.
+
+        Switching restarts the sensor, so it leaves engineering mode (read()
+        turns that back on) and pending resolution or bluetooth changes take
+        effect. The port needs a settable `baudrate` (pyserial and busio.UART
+        have that). Not inside a config_session(), and not while the
+        background reader runs.
+
+        Returns the baud rate it ends up at. Raises TimeoutError if the
+        sensor can't be found at any speed.
+        """
+        if not hasattr(self.port, "baudrate"):
+            raise ValueError("Can't change the speed of this port")
+        if self._config_session:
+            raise RuntimeError("Can't change the speed inside a config_session()")
+        start = self.probe_baud(timeout=probe_timeout)
+        if start is None:
+            raise TimeoutError("No frames from the sensor at any baud rate")
+
+        for baud in sorted(BAUD_CODES, reverse=True):
+            if baud > max_baudrate:
+                continue
+            if baud <= start:
+                break
+            if (self._switch_baud(baud) and self._link_ok(frames, max_error_rate, timeout)
+                    and self._command(COMMAND_FIRMWARE_VERSION, deadline=timeout)):
+                return baud
+            if self._stats is not None:
+                self._stats.count("baud_fallbacks")
+                self._stats.debug(f"{baud} baud didn't work out, going back to {start}")
+            self._fall_back(start, probe_timeout)
+        return start
+
+    def probe_baud(self, baudrates=None, timeout=BAUD_PROBE_TIME):
+        """Find the baud rate the sensor is sending at, by listening for
+        good frames at the port's current speed first, then at each of
+        `baudrates` (default: all of BAUD_CODES, fastest first). Leaves the
+        port at that speed and returns it, or None if nothing worked.
+
+        A sensor in config mode sends no frames, so it can't be found.
+        """
+        current = self.port.baudrate
+        others = [baud for baud in sorted(baudrates or BAUD_CODES, reverse=True) if baud != current]
+        for baud in [current] + others:
+            self.port.baudrate = baud
+            self._flush_input()
+            if self._link_ok(BAUD_PROBE_FRAMES, 1.0, timeout):
+                return baud
+        return None
+
+    def _switch_baud(self, baud):
+        """Tell the sensor to use `baud` and restart, then follow it with
+        the port. Returns False if the commands didn't get through, in
+        which case it's hard to say where the sensor is."""
+        data = BAUD_CODES[baud].to_bytes(2,"little")
+        switched = False
+        outer = self._budget_start(BAUD_SWITCH_TIME)
+        try:
+            # Not _command(): after the restart, the sensor is at the new
+            # speed and out of config mode, so there's nobody to tell to
+            # leave config mode at the old speed.
+            for _retries in range(10):
+                if self._budget_left() <= 0:
+                    break
+                try:
+                    if self._send(COMMAND_CONFIG_ENABLE + CONFIG_PROTOCOL_VERSION) == None:
+                        continue
+                    if not self._send(COMMAND_BAUD + data):
+                        continue
+                    # the answer to this still comes at the old speed
+                    if self._send(COMMAND_RESTART) == None:
+                        continue
+                    switched = True
+                    break
+                except TimeoutError:
+                    continue
+        finally:
+            self._budget_end(outer)
+
+        if not switched:
+            # it may well be stuck in config mode, where it sends nothing
+            # and probe_baud() can't find it
+            for _retries in range(3):
+                try:
+                    if self._send(COMMAND_CONFIG_DISABLE) != None:
+                        break
+                except TimeoutError:
+                    continue
+            return False
+
+        self.engineering_mode = False
+        self.port.baudrate = baud
+        self._flush_input()
+        return True
+
+    def _fall_back(self, baud, probe_timeout=BAUD_PROBE_TIME):
+        """Get the sensor (and the port) back to `baud`, from wherever a
+        failed switch left it."""
+        for _attempt in range(3):
+            found = self.probe_baud(timeout=probe_timeout)
+            if found is None:
+                break
+            if found == baud:
+                return
+            self._switch_baud(baud)
+        raise TimeoutError(f"Lost the sensor, and couldn't get it back to {baud} baud")
+
+    def _flush_input(self):
+        # whatever came in at the old speed is garbage now
+        if hasattr(self.port, "reset_input_buffer"):
+            self.port.reset_input_buffer()
+        self._parser.reset()
+
+    def _link_errors(self):
+        # bad frames, as far as we can tell: ones that failed their checks,
+        # and bytes skipped while looking for a header, in frames (a bad
+        # header byte loses about a basic frame's worth)
+        parser = self._parser
+        return self.serial_failures + parser.bad_footers + parser.discarded // (FRAME_OVERHEAD + PACKET_LEN_BASIC)
+
+    def _link_ok(self, frames, max_error_rate, timeout):
+        """Whether `frames` good frames come in within `timeout` seconds,
+        with at most `max_error_rate` of everything bad. Counting starts
+        after the first good frame, since right after a speed change we're
+        likely to come in halfway through one."""
+        outer = self._budget_start(timeout)
+        try:
+            good = 0
+            before = None
+            while good < frames:
+                if self._budget_left() <= 0:
+                    return False
+                reports = len(self._poll_reports())
+                if before is None:
+                    if reports:
+                        before = self._link_errors()
+                    continue
+                good += reports
+                if self._link_errors() - before > max_error_rate * frames:
+                    # that's more than it's allowed to get, however it goes on
+                    return False
+            errors = self._link_errors() - before
+            return errors <= max_error_rate * (good + errors)
+        finally:
+            self._budget_end(outer)
 
     def reset_config(self):
         """Resets everything to factory defaults, including the values that
@@ -703,7 +1837,10 @@ class MMWave():
         """
 
         code = 0x01 if on else 0x00
-        return self._command(COMMAND_BLUETOOTH,(0x00).to_bytes(2,"little"))
+        rc = self._command(COMMAND_BLUETOOTH,code.to_bytes(2,"little"))
+        if rc:
+            self.bluetooth_enabled = on
+        return rc
     
     # TODO (and I guess call this in __init__, why not)
     def mac_addr(self):    
@@ -728,36 +1865,36 @@ class MMWave():
 
         resolution: One of 20 or 75
 
-        
+        Like bluetooth(), this sets the `resolution` attribute when it works,
+        so apply() doesn't send it again while the restart is still to come.
         """
-        code = {75: 0x00,
-                20: 0x01,
-        }
-            
-        return self._command(COMMAND_SET_RESOLUTION,code[resolution].to_bytes(2,"little"))
+        rc = self._command(COMMAND_SET_RESOLUTION,RESOLUTION_CODES[resolution].to_bytes(2,"little"))
         # Note: _not_ calling self.get_resolution() because the value gets written but
-        # doesn't take effect until restart.     
+        # doesn't take effect until restart, so it'd read back the old one.
+        if rc:
+            self.resolution = resolution
+        return rc
         
     
     def get_resolution(self):
         """Get current distance resolution -- the depth of each gate.
            With the LD2410, this is either 20 or 75.
         """
-        code = {(0x00).to_bytes(2,"little"): 75,
-                (0x01).to_bytes(2,"little"): 20,
-        }
-
-
         for _failure_count in range(10):
             result = self._command(COMMAND_GET_RESOLUTION)
             if result == None:
                 continue
-            try:
-                resolution = code[result]
-            except KeyError:
-                continue
             
             # TODO: proper error handling.
-
-            self.resolution = resolution
-            return self.resolution
+            resolution = self._parse_resolution(result)
+            if resolution is None:
+                continue
+            self._state_read()
+            return resolution
+
+    def _parse_resolution(self, result):
+        for resolution, code in RESOLUTION_CODES.items():
+            if result == code.to_bytes(2,"little"):
+                self.resolution = resolution
+                return resolution
+        return None
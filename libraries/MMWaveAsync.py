@@ -0,0 +1,520 @@
+"""
+asyncio versions of the MMWave (LD2410) and MR24 (MR24HPC1) drivers.
+
+The regular drivers block while they wait for the sensor, which is fine
+on a microcontroller doing one thing, but not when one process is looking
+after dozens of sensors. These do the same thing on asyncio streams, so a
+slow or unplugged sensor only holds up its own task.
+
+The decoding is shared with the regular drivers (AsyncMMWave and AsyncMR24
+are subclasses), so the attributes and return values are the same. Only
+the parts that talk to the port are different, and those are coroutines.
+
+    reader, writer = await open_serial_connection("/dev/ttyUSB0", 256000)
+    sensor = AsyncMMWave(reader, writer)
+    await sensor.read_config()
+    async for report in sensor:
+        print(report.detection_cm)
+
+open_serial_connection() works with anything that looks like a tty,
+including one end of a pty pair, which is handy for testing. If you have
+pyserial-asyncio, its streams work just as well.
+"""
+
+import asyncio
+import os
+import time
+
+from MMWave import (MMWave, LD2410Report, DEFAULT_BAUD,
+                    COMMAND_CONFIG_ENABLE, CONFIG_PROTOCOL_VERSION, COMMAND_CONFIG_DISABLE,
+                    COMMAND_BASIC_CONFIG, COMMAND_READ_CONFIG, COMMAND_ENG_MODE_ENABLE,
+                    COMMAND_ENG_MODE_DISABLE, COMMAND_GATE_SENSITIVITY, COMMAND_FIRMWARE_VERSION,
+                    COMMAND_BAUD, COMMAND_RESET_CONFIG, COMMAND_RESTART, COMMAND_BLUETOOTH,
+                    COMMAND_SET_RESOLUTION, COMMAND_GET_RESOLUTION,
+                    BAUD_CODES, RESOLUTION_CODES, PARSER_BUFFER_SIZE, REVALIDATE_TIME,
+                    check_packet, check_response, command_packet,
+                    basic_config_data, gate_sensitivity_data)
+from mmWaveStatic_MR24HPC1 import MR24, QUERY_FRAMES, buildFrame
+
+DEFAULT_TIMEOUT = 1.0
+"""Seconds to wait for the sensor before counting it as a failed attempt,
+like the timeout on a serial port."""
+
+
+async def open_serial_connection(path, baudrate=DEFAULT_BAUD):
+    """Open a serial device (or pty) in raw mode and return asyncio
+    (reader, writer) streams for it. Linux/Unix only."""
+    import termios
+    import tty
+
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        tty.setraw(fd)
+        speed = getattr(termios, f"B{baudrate}", None)
+        if speed is not None:
+            attrs = termios.tcgetattr(fd)
+            attrs[4] = attrs[5] = speed
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    except termios.error:
+        # not a real tty (a pipe, say); nothing to set up
+        pass
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                 os.fdopen(fd, "rb", buffering=0))
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin,
+                                                        os.fdopen(os.dup(fd), "wb", buffering=0))
+    writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    return reader, writer
+
+
+class AsyncMMWave(MMWave):
+
+    """MMWave, but on asyncio streams. See MMWave for the attributes.
+
+    Everything that talks to the sensor is a coroutine: read(), the
+    configuration commands, revalidate(), and iterating with `async for`,
+    which yields an LD2410Report per good frame. What only works on a
+    blocking port (frames(), start(), negotiate_baud(), probe_baud())
+    raises TypeError.
+    """
+
+    def __init__(self, reader, writer, engineering_always=True, timeout=DEFAULT_TIMEOUT, stats=False,
+                 state_file=None):
+        """Create an AsyncMMWave which communicates over `reader` and `writer`.
+
+        Unlike MMWave, this doesn't read anything yet; await read() or
+        read_config() for that.
+
+        Arguments:
+
+        reader, writer -- asyncio streams connected to the sensor
+        engineering_always -- switch to engineering mode if we end up not in it. Defaults to True.
+        timeout -- seconds to wait for data on each attempt
+        stats -- keep counters and timings (see MMWave.stats()). Off by default.
+        state_file -- see MMWave
+        """
+        super().__init__(None, engineering_always=engineering_always, doNotRead=True, stats=stats,
+                         state_file=state_file)
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self._pending = []  # frames received but not decoded yet
+
+    @classmethod
+    async def open(cls, path, baudrate=DEFAULT_BAUD, **kwargs):
+        """Open the serial device at `path` and make a sensor for it."""
+        reader, writer = await open_serial_connection(path, baudrate)
+        return cls(reader, writer, **kwargs)
+
+    def close(self):
+        self.writer.close()
+
+    async def _receive(self, parser):
+        """Wait for some bytes and return whatever frames they complete.
+        An empty list means nothing came in time. Raises EOFError if the
+        stream is closed."""
+        try:
+            data = await asyncio.wait_for(self.reader.read(parser.free()), self.timeout)
+        except asyncio.TimeoutError:
+            return []
+        if not data:
+            raise EOFError("sensor stream closed")
+        if self._stats is not None:
+            self._stats.count("bytes_read", len(data))
+        return parser.feed(data)
+
+    async def read(self):
+        """Update object attributes with latest data from the sensor.
+        Returns True on success, False otherwise."""
+        for _failure_count in range(100):
+
+            if not self.engineering_mode and self.engineering_always:
+                await self.enable_engineering_mode()
+
+            if not self._pending:
+                self._pending = await self._receive(self._parser)
+                if not self._pending:
+                    self.serial_failures += 1
+                    continue
+
+            payload = self._pending.pop(0)
+            if self._decode(payload, 0, len(payload)):
+                self.last_updated = time.time()
+                if self._stats is not None:
+                    self._stats.observe_count("read_retries", _failure_count)
+                if self.state_file is not None and self._state_mismatch():
+                    await self.revalidate(REVALIDATE_TIME)
+                return True
+
+        if self._stats is not None:
+            self._stats.observe_count("read_retries", _failure_count)
+            self._stats.count("read_failures")
+        return False
+
+    def __aiter__(self):
+        return self
+
+    def frames(self):
+        raise TypeError("AsyncMMWave has no frames(), use `async for report in sensor`")
+
+    def start(self, callback=None):
+        raise TypeError("AsyncMMWave can't start() a reader thread, use the async API (a task with `async for`)")
+
+    def negotiate_baud(self, *args, **kwargs):
+        raise TypeError("negotiate_baud() needs a blocking port, it has no async version")
+
+    def probe_baud(self, *args, **kwargs):
+        raise TypeError("probe_baud() needs a blocking port, it has no async version")
+
+    def readRawData(self, lenBytes):
+        raise TypeError("AsyncMMWave has no port to read from, use the async API")
+
+    async def __anext__(self):
+        if not self.engineering_mode and self.engineering_always:
+            # reports don't go through _decode(), so go by the command's result
+            self.engineering_mode = bool(await self.enable_engineering_mode())
+        while True:
+            if not self._pending:
+                try:
+                    self._pending = await self._receive(self._parser)
+                except EOFError:
+                    raise StopAsyncIteration
+                continue
+            payload = self._pending.pop(0)
+            report_mode = check_packet(payload, 0, len(payload))
+            if self._stats is not None:
+                self._count_frame(report_mode)
+            if report_mode > 0:
+                return LD2410Report(payload, time.time())
+            self.serial_failures += 1
+
+    async def _send(self, command_data_bytes):
+        """Write to sensor and wait for the response. Same return values
+        as MMWave._send()."""
+        stats = self._stats
+        packet = command_packet(command_data_bytes)
+        if stats is not None:
+            stats.debug("Writing packet: ", packet)
+            start = time.monotonic()
+        self.writer.write(packet)
+        await self.writer.drain()
+        self._ack_parser.reset()
+        for _ in range(10):
+            for response in await self._receive(self._ack_parser):
+                rc = check_response(response, command_data_bytes)
+                if rc is not False:
+                    if stats is not None:
+                        stats.observe("command_rtt", time.monotonic() - start)
+                        stats.debug("response: ", rc)
+                    return rc
+        if stats is not None:
+            stats.count("ack_timeouts")
+            stats.debug("No response to ", packet)
+        raise TimeoutError
+
+    async def _command(self, command, data=None):
+        """Enter config mode, send a command and optional data,
+        and then exit config mode. Same return values as MMWave._command()."""
+        if self._config_session:
+            for _retries in range(10):
+                try:
+                    return await self._send(command + data if data else command)
+                except TimeoutError:
+                    continue
+            return False
+
+        for _retries in range(10):
+            try:
+                if await self._send(COMMAND_CONFIG_ENABLE + CONFIG_PROTOCOL_VERSION) == None:
+                    continue
+
+                rc = await self._send(command + data if data else command)
+
+                if await self._send(COMMAND_CONFIG_DISABLE) == None:
+                    continue
+
+                return rc
+
+            except TimeoutError:
+                continue
+
+        # too many timeouts
+        return False
+
+    def config_session(self):
+        """Use as `async with sensor.config_session():`. See MMWave.config_session()."""
+        return _AsyncConfigSession(self)
+
+    async def _enter_config_mode(self):
+        self._config_session += 1
+        if self._config_session > 1:
+            return
+        for _retries in range(10):
+            try:
+                if await self._send(COMMAND_CONFIG_ENABLE + CONFIG_PROTOCOL_VERSION) == None:
+                    continue
+                return
+            except TimeoutError:
+                continue
+        self._config_session -= 1
+        raise TimeoutError("Sensor won't enter config mode")
+
+    async def _exit_config_mode(self):
+        if self._config_session > 1:
+            self._config_session -= 1
+            return
+        try:
+            if self._config_dirty:
+                self._config_dirty = False
+                await self.read_config()
+        finally:
+            self._config_session = 0
+            for _retries in range(10):
+                try:
+                    if await self._send(COMMAND_CONFIG_DISABLE) != None:
+                        break
+                except TimeoutError:
+                    continue
+
+    async def apply(self, profile):
+        """See MMWave.apply()."""
+        if profile.engineering_mode is not None:
+            self.engineering_always = profile.engineering_mode
+
+        steps = None if self._profile_needs_reading(profile) else self._profile_steps(profile)
+        if steps == []:
+            return []
+
+        changed = []
+        async with self.config_session():
+            if steps is None:
+                if not self._config_known() and not await self.read_config():
+                    raise TimeoutError("Couldn't read the current config")
+                if profile.resolution is not None and self.resolution is None:
+                    await self.get_resolution()
+                steps = self._profile_steps(profile)
+            for name, method, args in steps:
+                await method(*args)
+                if name not in changed:
+                    changed.append(name)
+        return changed
+
+    async def _set_engineering_mode(self, on):
+        rc = await (self.enable_engineering_mode() if on else self.disable_engineering_mode())
+        if rc:
+            self.engineering_mode = on
+        return rc
+
+    async def _config_changed(self):
+        if self._config_session:
+            self._config_dirty = True
+        else:
+            await self.read_config()
+
+    async def read_config(self):
+        """Reads various configuration parameters and populates the corresponding attributes."""
+        for _failure_count in range(10):
+            if self._parse_config(await self._command(COMMAND_READ_CONFIG)):
+                self._state_read()
+                return True
+        return False
+
+    async def revalidate(self, deadline=None):
+        """See MMWave.revalidate()."""
+        try:
+            return await asyncio.wait_for(self._revalidate(), deadline)
+        except asyncio.TimeoutError:
+            # cut off, maybe in config mode, where the sensor stays quiet
+            try:
+                await self._send(COMMAND_CONFIG_DISABLE)
+            except TimeoutError:
+                pass
+            return False
+
+    async def _revalidate(self):
+        try:
+            ok = await self.read_config()
+            ok = await self.get_resolution() is not None and ok
+            ok = await self.get_firmware_version() is not None and ok
+        except (OSError, SystemError) as e:
+            # timeouts, or a firmware type we don't know
+            if self._stats is not None:
+                self._stats.debug("Revalidating failed: ", e)
+            return False
+        if ok:
+            self._state_unverified = False
+        return ok
+
+    async def set_basic_config(self, last_motion_gate, last_static_gate, presence_timeout):
+        """See MMWave.set_basic_config()."""
+        data = basic_config_data(last_motion_gate, last_static_gate, presence_timeout)
+        rc = await self._command(COMMAND_BASIC_CONFIG, data)
+        await self._config_changed()
+        return rc
+
+    async def set_gate_sensitivity(self, gate, motion_sensitivity, static_sensitivity):
+        """See MMWave.set_gate_sensitivity()."""
+        data = gate_sensitivity_data(gate, motion_sensitivity, static_sensitivity)
+        rc = await self._command(COMMAND_GATE_SENSITIVITY, data)
+        await self._config_changed()
+        return rc
+
+    async def enable_engineering_mode(self):
+        return await self._command(COMMAND_ENG_MODE_ENABLE)
+
+    async def disable_engineering_mode(self):
+        return await self._command(COMMAND_ENG_MODE_DISABLE)
+
+    async def get_firmware_version(self):
+        """Read firmware version, returns it and sets the `firmware_version` attribute."""
+        for _failure_count in range(10):
+            result = await self._command(COMMAND_FIRMWARE_VERSION)
+            if isinstance(result, (bytes, bytearray)) and len(result) >= 8:
+                self._parse_firmware_version(result)
+                self._state_read()
+                return self.firmware_version
+        return None
+
+    async def set_baudrate(self, baud=DEFAULT_BAUD):
+        return await self._command(COMMAND_BAUD, BAUD_CODES[baud].to_bytes(2, "little"))
+
+    async def reset_config(self):
+        return await self._command(COMMAND_RESET_CONFIG)
+
+    async def restart(self):
+        return await self._command(COMMAND_RESTART)
+
+    async def bluetooth(self, on=True):
+        rc = await self._command(COMMAND_BLUETOOTH, (0x01 if on else 0x00).to_bytes(2, "little"))
+        if rc:
+            self.bluetooth_enabled = on
+        return rc
+
+    async def set_resolution(self, resolution):
+        rc = await self._command(COMMAND_SET_RESOLUTION, RESOLUTION_CODES[resolution].to_bytes(2, "little"))
+        if rc:
+            self.resolution = resolution
+        return rc
+
+    async def get_resolution(self):
+        for _failure_count in range(10):
+            result = await self._command(COMMAND_GET_RESOLUTION)
+            if result is None or result is False:
+                continue
+            resolution = self._parse_resolution(result)
+            if resolution is not None:
+                self._state_read()
+                return resolution
+        return None
+
+
+class _AsyncConfigSession():
+    """What AsyncMMWave.config_session() returns."""
+
+    def __init__(self, sensor):
+        self.sensor = sensor
+
+    async def __aenter__(self):
+        await self.sensor._enter_config_mode()
+        return self.sensor
+
+    async def __aexit__(self, *args):
+        await self.sensor._exit_config_mode()
+
+
+class AsyncMR24(MR24):
+
+    """MR24, but on asyncio streams.
+
+    await readDataFromBuffer() waits (up to `timeout`) for data and returns
+    the same thing as MR24.readDataFromBuffer(). `async for` yields the
+    result of every human presence frame, one by one. What only works on
+    a blocking port (start(), readFrames(), readRawData(), printRawData())
+    raises TypeError.
+    """
+
+    def __init__(self, reader, writer, verbose=False, timeout=DEFAULT_TIMEOUT):
+        super().__init__(None, verbose=verbose)
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+
+    @classmethod
+    async def open(cls, path, baudrate=115200, **kwargs):
+        """Open the serial device at `path` and make a sensor for it."""
+        reader, writer = await open_serial_connection(path, baudrate)
+        return cls(reader, writer, **kwargs)
+
+    def close(self):
+        self.writer.close()
+
+    async def _receive(self):
+        """Wait for some bytes, or None if nothing came in time. Raises
+        EOFError if the stream is closed."""
+        try:
+            data = await asyncio.wait_for(self.reader.read(PARSER_BUFFER_SIZE), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        if not data:
+            raise EOFError("sensor stream closed")
+        return data
+
+    def start(self, callback=None):
+        raise TypeError("AsyncMR24 can't start() a reader thread, use the async API (a task with `async for`)")
+
+    def readFrames(self, maxFrames=100):
+        raise TypeError("AsyncMR24 has no readFrames(), use `async for` or readDataFromBuffer()")
+
+    def readRawData(self):
+        raise TypeError("AsyncMR24 has no port to read from, use the async API")
+
+    def printRawData(self):
+        raise TypeError("AsyncMR24 has no port to read from, use the async API")
+
+    async def readDataFromBuffer(self, maxFrames=1):
+        result = None
+        for frame in self._pendingFrames:
+            frameResult = self.handleFrame(*frame)
+            if frameResult is not None:
+                result = frameResult
+        self._pendingFrames = []
+        data = await self._receive()
+        if data is None:
+            return result
+        frameResult = self.parseData(data)
+        return result if frameResult is None else frameResult
+
+    async def sendFrame(self, frame):
+        """Write a ready-made frame (like the ones in QUERY_FRAMES)."""
+        self.writer.write(frame)
+        await self.writer.drain()
+
+    async def query(self, what):
+        """Ask the sensor for something (a key of QUERY_FRAMES). The
+        answer ends up in `state` once it's been read."""
+        await self.sendFrame(QUERY_FRAMES[what])
+
+    async def sendCommand(self, controlWord, commandWord, data):
+        await self.sendFrame(buildFrame(controlWord, commandWord, data))
+
+    async def reset(self):
+        """Send the reset frame."""
+        await self.sendFrame(self.reset_frame)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            while self._pendingFrames:
+                result = self.handleFrame(*self._pendingFrames.pop(0))
+                if result is not None:
+                    return result
+            try:
+                data = await self._receive()
+            except EOFError:
+                raise StopAsyncIteration
+            if data is not None:
+                self._pendingFrames = self._parser.feed(data)
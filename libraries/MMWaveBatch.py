@@ -0,0 +1,205 @@
+"""
+Offline batch decoding of raw LD2410 UART captures, using NumPy.
+
+MMWave.read() is meant for a microcontroller reading one frame at a time.
+If you've recorded hours of raw serial output and want it all as a table,
+looping read() over a fake port is painfully slow. This finds and checks
+all frames at once with array operations, and gives back a NumPy structured
+array with one row per good frame.
+
+The rules are the same as MMWave.check_packet() (and therefore read() and
+frames()): header, length and footer have to line up, the report mode has
+to match the length, head/tail/calibration bytes have to be right, and
+distances and energies can't be over MAX_LEGIT_DISTANCE and MAX_LEGIT_ENERGY.
+
+This needs NumPy, so it's for a computer, not for CircuitPython.
+
+    import MMWaveBatch
+    with open("capture.bin", "rb") as f:
+        frames = MMWaveBatch.decode(f.read())
+    print(frames["detection_cm"].mean())
+"""
+
+import numpy as np
+
+from MMWave import (FRAME_HEADER, FRAME_FOOTER, FRAME_OVERHEAD, LAST_GATE,
+                    PACKET_LEN_BASIC, PACKET_LEN_ENGINEERING,
+                    REPORT_MODE_BASIC, REPORT_MODE_ENGINEERING,
+                    PACKET_HEAD, PACKET_TAIL, PACKET_CALIBRATION,
+                    MOTION_STATE_MASK, STATIC_STATE_MASK,
+                    MAX_LEGIT_DISTANCE, MAX_LEGIT_ENERGY)
+
+GATES = LAST_GATE + 1
+
+FRAME_DTYPE = np.dtype([
+    ("offset", np.int64),            # where the frame header starts in the input
+    ("report_mode", np.uint8),       # REPORT_MODE_BASIC or REPORT_MODE_ENGINEERING
+    ("target_state", np.uint8),      # 0 nothing, 1 motion, 2 static, 3 both
+    ("motion_target_cm", np.uint16),
+    ("motion_energy", np.uint8),
+    ("static_target_cm", np.uint16),
+    ("static_energy", np.uint8),
+    ("detection_cm", np.uint16),
+    ("last_motion_gate", np.uint8),
+    ("last_static_gate", np.uint8),
+    ("gate_energy", np.uint8, (GATES, 2)),  # [gate, 0] is motion, [gate, 1] is static
+    ("light_level", np.uint8),
+])
+"""One row per frame. Where MMWave would give None (a distance with no
+target, or anything engineering-only in a basic frame), this has 0; check
+`target_state` and `report_mode` to tell them apart."""
+
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+"""Work through the input this many bytes at a time, to keep the
+temporary arrays to a sane size for multi-gigabyte captures."""
+
+# longest frame the parser (and therefore read()) accepts
+_MAX_FRAME = PACKET_LEN_ENGINEERING + FRAME_OVERHEAD
+
+
+def _find_frames(data, base):
+    """Offsets (relative to `data`) and payload lengths of everything
+    that looks like a frame: header, a length no longer than an
+    engineering packet, and a footer where the length says it is."""
+    n = len(data)
+    header_len = len(FRAME_HEADER)
+    if n < FRAME_OVERHEAD:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # header candidates
+    hit = data[:n - header_len + 1] == FRAME_HEADER[0]
+    for i in range(1, header_len):
+        hit &= data[i:n - header_len + 1 + i] == FRAME_HEADER[i]
+    starts = np.flatnonzero(hit)
+
+    # enough room left for the length bytes?
+    starts = starts[starts + header_len + 2 <= n]
+    lengths = data[starts + header_len].astype(np.int64) | (data[starts + header_len + 1].astype(np.int64) << 8)
+    keep = lengths <= PACKET_LEN_ENGINEERING
+    starts = starts[keep]
+    lengths = lengths[keep]
+
+    # footer where it ought to be
+    ends = starts + header_len + 2 + lengths
+    keep = ends + len(FRAME_FOOTER) <= n
+    starts = starts[keep]
+    lengths = lengths[keep]
+    ends = ends[keep]
+    ok = np.ones(len(starts), dtype=bool)
+    for i in range(len(FRAME_FOOTER)):
+        ok &= data[ends + i] == FRAME_FOOTER[i]
+
+    return starts[ok] + base, lengths[ok]
+
+
+def _drop_overlaps(starts, lengths):
+    """The parser consumes a whole frame once it finds one, so anything
+    that looks like a frame inside it doesn't count. That basically never
+    happens, so only bother with the slow loop if it does."""
+    ends = starts + lengths + FRAME_OVERHEAD
+    if len(starts) < 2 or np.all(starts[1:] >= ends[:-1]):
+        return starts, lengths
+    keep = np.zeros(len(starts), dtype=bool)
+    consumed = -1
+    for i in range(len(starts)):
+        if starts[i] >= consumed:
+            keep[i] = True
+            consumed = ends[i]
+    return starts[keep], lengths[keep]
+
+
+def _distance(lo, hi):
+    return lo.astype(np.uint16) | (hi.astype(np.uint16) << 8)
+
+
+def decode(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Find and decode every good LD2410 data frame in `data`.
+
+    Arguments:
+
+    data -- bytes, bytearray, memoryview, mmap or uint8 array of raw UART output
+    chunk_size -- how many bytes to search at a time
+
+    Returns a NumPy structured array with FRAME_DTYPE, in stream order.
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    n = len(data)
+
+    # find frame candidates, a chunk at a time. Each chunk looks far enough
+    # past its end to see a whole frame starting just before the boundary.
+    found_starts = []
+    found_lengths = []
+    for base in range(0, n, chunk_size):
+        window = data[base:base + chunk_size + _MAX_FRAME - 1]
+        starts, lengths = _find_frames(window, base)
+        keep = starts < base + chunk_size
+        found_starts.append(starts[keep])
+        found_lengths.append(lengths[keep])
+    if found_starts:
+        starts = np.concatenate(found_starts)
+        lengths = np.concatenate(found_lengths)
+    else:
+        starts = np.zeros(0, dtype=np.int64)
+        lengths = np.zeros(0, dtype=np.int64)
+    starts, lengths = _drop_overlaps(starts, lengths)
+
+    # Pull each payload into a row of a 2-D array. Basic packets are
+    # shorter; whatever comes after them is ignored.
+    payload_offsets = starts + len(FRAME_HEADER) + 2
+    index = payload_offsets[:, None] + np.arange(PACKET_LEN_ENGINEERING)
+    np.minimum(index, n - 1, out=index)
+    payload = data[index]
+    ends = payload_offsets + lengths
+
+    # Same checks as check_packet(). Byte numbers here count the report
+    # mode byte as 0, so they're one more than in there.
+    report_mode = payload[:, 0]
+    target_state = payload[:, 2]
+    good = (((lengths == PACKET_LEN_BASIC) & (report_mode == REPORT_MODE_BASIC))
+            | ((lengths == PACKET_LEN_ENGINEERING) & (report_mode == REPORT_MODE_ENGINEERING)))
+    good &= payload[:, 1] == PACKET_HEAD[0]
+    good &= target_state <= 3
+    good &= data[np.maximum(ends - 2, 0)] == PACKET_TAIL[0]
+    good &= data[np.maximum(ends - 1, 0)] == PACKET_CALIBRATION[0]
+
+    motion = (target_state & MOTION_STATE_MASK) != 0
+    static = (target_state & STATIC_STATE_MASK) != 0
+    detected = target_state != 0
+    motion_cm = _distance(payload[:, 3], payload[:, 4])
+    static_cm = _distance(payload[:, 6], payload[:, 7])
+    detection_cm = _distance(payload[:, 9], payload[:, 10])
+
+    good &= ~motion | ((motion_cm <= MAX_LEGIT_DISTANCE) & (payload[:, 5] <= MAX_LEGIT_ENERGY))
+    good &= ~static | ((static_cm <= MAX_LEGIT_DISTANCE) & (payload[:, 8] <= MAX_LEGIT_ENERGY))
+    good &= ~detected | (detection_cm <= MAX_LEGIT_DISTANCE)
+
+    payload = payload[good]
+    motion = motion[good]
+    static = static[good]
+    detected = detected[good]
+    engineering = payload[:, 0] == REPORT_MODE_ENGINEERING
+
+    result = np.zeros(len(payload), dtype=FRAME_DTYPE)
+    result["offset"] = starts[good]
+    result["report_mode"] = payload[:, 0]
+    result["target_state"] = payload[:, 2]
+    result["motion_target_cm"] = np.where(motion, motion_cm[good], 0)
+    result["motion_energy"] = np.where(motion, payload[:, 5], 0)
+    result["static_target_cm"] = np.where(static, static_cm[good], 0)
+    result["static_energy"] = np.where(static, payload[:, 8], 0)
+    result["detection_cm"] = np.where(detected, detection_cm[good], 0)
+
+    last_motion_gate = np.where(engineering, payload[:, 11], 0)
+    last_static_gate = np.where(engineering, payload[:, 12], 0)
+    result["last_motion_gate"] = last_motion_gate
+    result["last_static_gate"] = last_static_gate
+
+    # gates past the configured last gate are None in read()
+    gates = np.arange(GATES)
+    motion_gates = engineering[:, None] & (gates <= last_motion_gate[:, None])
+    static_gates = engineering[:, None] & (gates <= last_static_gate[:, None])
+    result["gate_energy"][:, :, 0] = np.where(motion_gates, payload[:, 13:13 + GATES], 0)
+    result["gate_energy"][:, :, 1] = np.where(static_gates, payload[:, 22:22 + GATES], 0)
+    result["light_level"] = np.where(engineering, payload[:, 31], 0)
+
+    return result
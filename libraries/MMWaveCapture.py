@@ -0,0 +1,264 @@
+"""
+Record what a sensor sends, and play it back later.
+
+CaptureRecorder wraps the serial-port-like object you'd normally hand to
+MMWave or MR24, and writes down every byte read through it, along with
+when it arrived. ReplayPort is a serial-port-like object that plays such
+a recording back, either as fast as possible or at the original pace.
+Either way the drivers can't tell the difference, which makes for
+repeatable load tests and bug reports.
+
+A capture is two append-only files:
+
+    capture.bin      the raw bytes, exactly as they came off the wire
+    capture.bin.idx  an 8-byte magic, then one 16-byte entry per read:
+                     arrival time (time.monotonic_ns()) and the offset in
+                     capture.bin just past the bytes that read returned
+
+Keeping the bytes raw means the .bin file can go straight into anything
+that eats UART output (like MMWaveBatch.decode()). ReplayPort uses mmap,
+so it can replay multi-gigabyte captures without loading them into RAM.
+
+    port = CaptureRecorder(serial.Serial("/dev/ttyUSB0", 256000, timeout=1), "hallway.bin")
+    sensor = MMWave(port)
+    ...
+    port.close()
+
+    sensor = MMWave(ReplayPort("hallway.bin", realtime=True))
+"""
+
+import mmap
+import os
+import struct
+import time
+
+INDEX_MAGIC = b"MMWIDX1\n"
+INDEX_ENTRY = struct.Struct("<QQ")  # arrival time in ns, end offset in the data file
+
+
+def index_path(path):
+    """Where the index for the capture at `path` lives."""
+    return path + ".idx"
+
+
+class CaptureRecorder():
+
+    """Wraps a serial port and records everything read from it.
+
+    Anything other than reading is passed straight through to the real
+    port, so this can be used wherever the port would be. That goes for
+    setting attributes too: `recorder.timeout = 0.1` sets the port's.
+    """
+
+    _OWN = ("port", "_data", "_index", "_offset")
+    """The attributes that are the recorder's; everything else is the port's."""
+
+    def __init__(self, port, path):
+        """Arguments:
+
+        port -- serial port-like object implementing .read(bytes) and .write(buffer)
+        path -- file to record into. If it already exists, this appends to it.
+        """
+        self.port = port
+        self._data = open(path, "ab")
+        self._index = open(index_path(path), "ab")
+        if self._index.tell() == 0:
+            self._index.write(INDEX_MAGIC)
+        self._offset = self._data.tell()
+
+    def __getattr__(self, name):
+        # baudrate, timeout, in_waiting, reset_input_buffer() and so on
+        if name == "port":
+            raise AttributeError(name)
+        return getattr(self.port, name)
+
+    def __setattr__(self, name, value):
+        # otherwise a new timeout (like the one MMWave.read(deadline=...)
+        # sets) or baudrate would stick to this and never reach the port
+        if name in self._OWN:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.port, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _record(self, data):
+        if not data:
+            return
+        now = time.monotonic_ns()
+        self._data.write(data)
+        self._offset += len(data)
+        self._index.write(INDEX_ENTRY.pack(now, self._offset))
+
+    def read(self, nbytes):
+        data = self.port.read(nbytes)
+        self._record(data)
+        return data
+
+    def readinto(self, buffer):
+        if hasattr(self.port, "readinto"):
+            n = self.port.readinto(buffer) or 0
+        else:
+            data = self.port.read(len(buffer)) or b""
+            n = len(data)
+            buffer[:n] = data
+        self._record(memoryview(buffer)[:n])
+        return n
+
+    def write(self, buffer):
+        return self.port.write(buffer)
+
+    def flush(self):
+        """Push what's been recorded so far out to the files."""
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        """Close the capture files. The wrapped port is left alone."""
+        self._data.close()
+        self._index.close()
+
+
+class ReplayPort():
+
+    """A serial-port-like object which plays back a capture.
+
+    With realtime=False (the default), everything is available right
+    away and reads are as fast as memory allows. With realtime=True, bytes
+    show up when they originally arrived (relative to the first read),
+    optionally sped up or slowed down by `speed`.
+    """
+
+    def __init__(self, path, realtime=False, speed=1.0, timeout=1.0):
+        """Arguments:
+
+        path -- the capture's data file (the index is found next to it)
+        realtime -- replay at the recorded pace instead of as fast as possible
+        speed -- with realtime, 2.0 plays back twice as fast, and so on
+        timeout -- with realtime, how long read() waits for the bytes it
+                   asked for, like a serial port's timeout. None waits forever.
+        """
+        self.realtime = realtime
+        self.speed = speed
+        self.timeout = timeout
+
+        self._data_file = open(path, "rb")
+        self._index_file = open(index_path(path), "rb")
+        self._data = self._map(self._data_file)
+        self._index = self._map(self._index_file)
+        if self._index[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f"{index_path(path)} isn't a capture index")
+
+        self._view = memoryview(self._data)
+        self._size = len(self._data)
+        self._entries = (len(self._index) - len(INDEX_MAGIC)) // INDEX_ENTRY.size
+        self._pos = 0
+
+        # realtime bookkeeping: how much of the capture has "arrived" so far
+        self._entry = 0
+        self._arrived = 0 if realtime else self._size
+        self._first_ns = self._entry_time(0) if self._entries else 0
+        self._started = None
+
+    @staticmethod
+    def _map(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _entry_time(self, i):
+        return INDEX_ENTRY.unpack_from(self._index, len(INDEX_MAGIC) + i * INDEX_ENTRY.size)[0]
+
+    def _entry_end(self, i):
+        return INDEX_ENTRY.unpack_from(self._index, len(INDEX_MAGIC) + i * INDEX_ENTRY.size)[1]
+
+    def _catch_up(self):
+        """Work out how much has arrived by now. Returns seconds until
+        the next chunk shows up, or None if there are no more."""
+        if self._started is None:
+            self._started = time.monotonic()
+        elapsed = (time.monotonic() - self._started) * self.speed
+        while self._entry < self._entries:
+            due = (self._entry_time(self._entry) - self._first_ns) / 1e9
+            if due > elapsed:
+                return (due - elapsed) / self.speed
+            self._arrived = min(self._entry_end(self._entry), self._size)
+            self._entry += 1
+        self._arrived = self._size
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def in_waiting(self):
+        if self.realtime:
+            self._catch_up()
+        return self._arrived - self._pos
+
+    @property
+    def finished(self):
+        """True once everything in the capture has been read."""
+        return self._pos >= self._size
+
+    def _wait_for(self, nbytes):
+        """Block (in realtime mode) until `nbytes` are waiting, the
+        timeout runs out or the capture ends. Returns how many are waiting."""
+        if not self.realtime:
+            return min(nbytes, self._size - self._pos)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            wait = self._catch_up()
+            if self._arrived - self._pos >= nbytes or wait is None:
+                break
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                wait = min(wait, left)
+            time.sleep(wait)
+        return min(nbytes, self._arrived - self._pos)
+
+    def read(self, nbytes=1):
+        n = self._wait_for(nbytes)
+        data = bytes(self._view[self._pos:self._pos + n])
+        self._pos += n
+        return data
+
+    def readinto(self, buffer):
+        n = self._wait_for(len(buffer))
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def write(self, buffer):
+        # Nobody's listening. Commands will time out, just like with a
+        # sensor that ignores them.
+        return len(buffer)
+
+    def reset_input_buffer(self):
+        """Skip everything that has arrived so far."""
+        self.in_waiting
+        self._pos = self._arrived
+
+    def rewind(self):
+        """Start over from the beginning of the capture."""
+        self._pos = 0
+        self._entry = 0
+        self._arrived = 0 if self.realtime else self._size
+        self._started = None
+
+    def close(self):
+        self._view.release()
+        for m in (self._data, self._index):
+            if isinstance(m, mmap.mmap):
+                m.close()
+        self._data_file.close()
+        self._index_file.close()
@@ -0,0 +1,562 @@
+"""
+Pretend to be an LD2410 or an MR24HPC1 on the other end of a pty.
+
+Each emulator opens a pseudo-terminal pair and acts like the sensor on
+the master side. Point MMWave, AsyncMMWave, MR24 or SensorHub at the
+slave side (`emulator.path`, or `emulator.device_fd`) and they can't tell
+the difference: reports come at the sensor's frame rate, no faster than
+the baud rate allows, and commands get the answers the real thing gives.
+
+    emulator = LD2410Emulator(seed=1, noise=0.01)
+    emulator.start()          # runs in a background thread
+    sensor = MMWave(serial.Serial(emulator.path, 256000, timeout=1))
+    ...
+    emulator.stop()
+
+For a whole building of them, put them in one EmulatorPool, which runs
+any number of emulators from one thread:
+
+    pool = EmulatorPool()
+    emulators = [pool.add(LD2410Emulator(seed=i)) for i in range(200)]
+    pool.start()
+
+Faults are the ones of MMWaveSynth.FrameSource (noise, truncated,
+bad_footer, ack), plus ack_loss (chance a command is ignored) and
+ack_delay (seconds before answering).
+
+The line itself can be modelled too, for trying out baud rate changes.
+With check_baud=True the emulator looks at the speed the driver set on its
+end of the pty (pyserial does that, or termios) and when it's not the
+sensor's own, both directions turn into garbage. max_clean_baudrate and
+byte_error_rate make a link that's fine up to some speed and flips bits
+above it, like long wires or a cheap USB adapter:
+
+    emulator = LD2410Emulator(check_baud=True, max_clean_baudrate=256000, byte_error_rate=0.01)
+
+Linux (or anything else with ptys) only. This isn't for CircuitPython.
+"""
+
+import array
+import fcntl
+import heapq
+import os
+import pty
+import selectors
+import termios
+import threading
+import time
+import tty
+
+from MMWave import (BAUD_CODES, COMMAND_BASIC_CONFIG, COMMAND_BAUD, COMMAND_BLUETOOTH,
+                    COMMAND_CONFIG_DISABLE, COMMAND_CONFIG_ENABLE, COMMAND_ENG_MODE_DISABLE,
+                    COMMAND_ENG_MODE_ENABLE, COMMAND_FIRMWARE_VERSION, COMMAND_FOOTER,
+                    COMMAND_GATE_SENSITIVITY, COMMAND_GET_RESOLUTION, COMMAND_HEADER,
+                    COMMAND_MAC_ADDR, COMMAND_READ_CONFIG, COMMAND_RESET_CONFIG, COMMAND_RESTART,
+                    COMMAND_SET_RESOLUTION, LAST_GATE, REPORT_MODE_BASIC,
+                    REPORT_MODE_ENGINEERING, RESOLUTION_CODES, FrameParser)
+from MMWaveSynth import FrameSource, ld2410_ack
+from mmWaveStatic_MR24HPC1 import MR24FrameParser, buildFrame
+
+LD2410_BAUD = 256000
+MR24_BAUD = 115200
+
+READ_SIZE = 4096
+
+# termios2, for the exact speed of the other end of the pty (Linux, which
+# is also what pyserial uses to set speeds like 256000)
+TCGETS2 = getattr(termios, "TCGETS2", 0x802C542A)
+TERMIOS2_ISPEED = 9  # index in the struct, as ints
+
+# what a factory-fresh LD2410 says about itself
+LD2410_FIRMWARE = bytes([0x00, 0x01, 0x07, 0x01, 0x16, 0x15, 0x09, 0x22])  # V1.07.22091516
+LD2410_MAC = bytes.fromhex("8f27d2e85c1a")
+LD2410_DEFAULT_MOTION_SENSITIVITY = (50, 50, 40, 30, 20, 15, 15, 15, 15)
+LD2410_DEFAULT_STATIC_SENSITIVITY = (0, 0, 40, 40, 30, 30, 20, 20, 20)
+
+# and an MR24HPC1, for the product information queries (control word 0x02)
+MR24_PRODUCT_INFO = {0xA1: b"MR24HPC1", 0xA2: b"00000001", 0xA3: b"G24VD1SYV001", 0xA4: b"G24VD1SYV000009"}
+
+
+def _word(data, i):
+    # command data is 2-byte parameter words followed by 4-byte values
+    return int.from_bytes(data[i:i + 2], "little"), int.from_bytes(data[i + 2:i + 6], "little")
+
+
+class Emulator():
+
+    """What every emulated sensor has in common: the pty, pacing output
+    to the baud rate and frame rate, and fault injection. Subclasses
+    answer commands in _handle()."""
+
+    sensor = None
+    baudrate = None
+
+    def __init__(self, rate=None, baudrate=None, seed=None, ack_loss=0.0, ack_delay=0.0,
+                 check_baud=False, max_clean_baudrate=None, byte_error_rate=0.0, **faults):
+        """Arguments:
+
+        rate -- reports per second, defaults to the sensor's own
+        baudrate -- line speed to pace the output to, defaults to the sensor's own
+        seed -- for the random number generator, to get the same stream every time
+        ack_loss -- chance (0 to 1) that a command is ignored
+        ack_delay -- seconds to wait before answering a command
+        check_baud -- garble everything while the driver's end of the pty is
+                      set to another speed than the sensor's
+        max_clean_baudrate -- above this, the line flips bits: every byte,
+                              both ways, is hit with chance byte_error_rate
+        byte_error_rate -- see max_clean_baudrate
+        noise, truncated, bad_footer, ack -- see MMWaveSynth.FrameSource
+        """
+        self.source = FrameSource(self.sensor, rate=rate, seed=seed, **faults)
+        self.random = self.source.random
+        if baudrate is not None:
+            self.baudrate = baudrate
+        self.ack_loss = ack_loss
+        self.ack_delay = ack_delay
+        self.check_baud = check_baud
+        self.max_clean_baudrate = max_clean_baudrate
+        self.byte_error_rate = byte_error_rate
+
+        self.fd, self.device_fd = pty.openpty()
+        tty.setraw(self.fd)
+        tty.setraw(self.device_fd)
+        os.set_blocking(self.fd, False)
+        self.path = os.ttyname(self.device_fd)
+        """The device for the driver to open, like /dev/pts/7."""
+
+        self.quiet = False  # no reports (like an LD2410 in config mode)
+        self._frames = self.source.frames()
+        self._next_report = None
+        self._queue = []  # (due time, bytes) waiting to go out, in order
+        self._line_free = 0.0  # when the last write is done "on the wire"
+        self._pool = None
+        self._own_pool = None
+
+        self.reports = 0
+        self.commands = 0
+        self.overruns = 0
+        """Bytes thrown away because nobody was reading the other end."""
+        self.garbled = 0
+        """Bytes the line model (check_baud, byte_error_rate) messed up."""
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.remove(self)
+        os.close(self.fd)
+        os.close(self.device_fd)
+
+    def start(self):
+        """Run this emulator in its own background thread."""
+        self._own_pool = EmulatorPool()
+        self._own_pool.add(self)
+        self._own_pool.start()
+
+    def stop(self):
+        """Stop the thread started by start(), and close the pty."""
+        if self._own_pool is not None:
+            # closes us too
+            self._own_pool.close()
+            self._own_pool = None
+
+    def respond(self, data, now):
+        """Send `data` in answer to a command, after ack_delay."""
+        self._queue.append((now + self.ack_delay, self._line(data)))
+
+    def host_baudrate(self):
+        """The speed the driver set on its end of the pty."""
+        buf = array.array("i", [0] * 64)
+        fcntl.ioctl(self.device_fd, TCGETS2, buf)
+        return buf[TERMIOS2_ISPEED]
+
+    def _line(self, data):
+        """`data` as it arrives at the other end. The speeds are looked at
+        when something is queued, so an answer to a baud rate change
+        still goes out at the old speed."""
+        if self.check_baud and self.host_baudrate() != self.baudrate:
+            # wrong speed: the UART sees something, but not this
+            self.garbled += len(data)
+            return bytes(self.random.randrange(256) for _ in data)
+        if not self.byte_error_rate or self.max_clean_baudrate is None or self.baudrate <= self.max_clean_baudrate:
+            return data
+        random = self.random.random
+        data = bytearray(data)
+        for i in range(len(data)):
+            if random() < self.byte_error_rate:
+                data[i] ^= 1 << self.random.randrange(8)
+                self.garbled += 1
+        return bytes(data)
+
+    def receive(self, now):
+        """Read and answer whatever the driver wrote. Returns False if
+        the other end is gone."""
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        for command in self._commands(self._line(data)):
+            self.commands += 1
+            if self.ack_loss and self.random.random() < self.ack_loss:
+                continue
+            self._handle(command, now)
+        return True
+
+    def _report(self):
+        return next(self._frames)[1]
+
+    def tick(self, now):
+        """Queue any reports that are due, and write whatever the line
+        has time for. Returns when this wants to be called next."""
+        if self._next_report is None:
+            self._next_report = now
+        interval = 1.0 / self.source.rate
+        while now >= self._next_report:
+            if not self.quiet:
+                self._queue.append((self._next_report, self._line(self._report())))
+                self.reports += 1
+            self._next_report += interval
+            if now - self._next_report > 1.0:
+                # we fell way behind (the machine was busy); don't try to catch up
+                self._next_report = now
+
+        seconds_per_byte = 10.0 / self.baudrate  # 8N1 is 10 bits per byte
+        while self._queue and self._line_free <= now and self._queue[0][0] <= now:
+            data = self._queue.pop(0)[1]
+            try:
+                written = os.write(self.fd, data)
+            except BlockingIOError:
+                written = 0
+            self.overruns += len(data) - written
+            self._line_free = now + len(data) * seconds_per_byte
+
+        wake = self._next_report
+        if self._queue:
+            wake = min(wake, max(self._line_free, self._queue[0][0]))
+        return wake
+
+    def _commands(self, data):
+        raise NotImplementedError
+
+    def _handle(self, command, now):
+        raise NotImplementedError
+
+
+class LD2410Emulator(Emulator):
+
+    """An LD2410 on a pty. Streams engineering (or basic) frames and
+    answers every command MMWave knows, keeping its settings like the
+    real thing: some take effect right away, resolution, baud rate and
+    bluetooth only after a restart.
+    """
+
+    sensor = "ld2410"
+    baudrate = LD2410_BAUD
+
+    def __init__(self, engineering_mode=False, **kwargs):
+        """Arguments are those of Emulator, and:
+
+        engineering_mode -- start out sending engineering frames. A real
+                            LD2410 starts in basic mode.
+        """
+        super().__init__(**kwargs)
+        self._parser = FrameParser(COMMAND_HEADER, COMMAND_FOOTER, max_length=64)
+        self.config_mode = False
+        self.factory_reset()
+        self.engineering_mode = engineering_mode
+        self.resolution = self._pending_resolution
+        self.bluetooth = self._pending_bluetooth
+
+    def factory_reset(self):
+        self.last_motion_gate = LAST_GATE
+        self.last_static_gate = LAST_GATE
+        self.presence_timeout = 5
+        self.gate_motion_sensitivity = list(LD2410_DEFAULT_MOTION_SENSITIVITY)
+        self.gate_static_sensitivity = list(LD2410_DEFAULT_STATIC_SENSITIVITY)
+        self._pending_resolution = 75
+        self._pending_baudrate = LD2410_BAUD
+        self._pending_bluetooth = True
+
+    @property
+    def engineering_mode(self):
+        return self.source.report_mode == REPORT_MODE_ENGINEERING
+
+    @engineering_mode.setter
+    def engineering_mode(self, on):
+        self.source.report_mode = REPORT_MODE_ENGINEERING if on else REPORT_MODE_BASIC
+
+    def restart(self):
+        """What happens when the sensor reboots."""
+        self.config_mode = False
+        self.quiet = False
+        self.engineering_mode = False
+        self.resolution = self._pending_resolution
+        self.baudrate = self._pending_baudrate
+        self.bluetooth = self._pending_bluetooth
+
+    def _commands(self, data):
+        return self._parser.feed(data)
+
+    def _handle(self, command, now):
+        code = command[:2]
+        data = command[2:]
+
+        if code == COMMAND_CONFIG_ENABLE:
+            self.config_mode = True
+            self.quiet = True
+            # protocol version and buffer size
+            self.respond(ld2410_ack(code, bytes([0x01, 0x00, 0x40, 0x00])), now)
+            return
+        if not self.config_mode:
+            # the real thing ignores commands outside config mode
+            return
+
+        result = b""
+        status = 0
+        if code == COMMAND_CONFIG_DISABLE:
+            self.config_mode = False
+            self.quiet = False
+        elif code == COMMAND_READ_CONFIG:
+            result = (bytes([0xaa, LAST_GATE, self.last_motion_gate, self.last_static_gate])
+                      + bytes(self.gate_motion_sensitivity) + bytes(self.gate_static_sensitivity)
+                      + self.presence_timeout.to_bytes(2, "little"))
+        elif code == COMMAND_BASIC_CONFIG:
+            status = self._basic_config(data)
+        elif code == COMMAND_GATE_SENSITIVITY:
+            status = self._gate_sensitivity(data)
+        elif code == COMMAND_ENG_MODE_ENABLE:
+            self.engineering_mode = True
+        elif code == COMMAND_ENG_MODE_DISABLE:
+            self.engineering_mode = False
+        elif code == COMMAND_FIRMWARE_VERSION:
+            result = LD2410_FIRMWARE
+        elif code == COMMAND_BAUD:
+            status = self._set_code(data, BAUD_CODES, "_pending_baudrate")
+        elif code == COMMAND_SET_RESOLUTION:
+            status = self._set_code(data, RESOLUTION_CODES, "_pending_resolution")
+        elif code == COMMAND_GET_RESOLUTION:
+            result = RESOLUTION_CODES[self.resolution].to_bytes(2, "little")
+        elif code == COMMAND_RESET_CONFIG:
+            self.factory_reset()
+        elif code == COMMAND_BLUETOOTH:
+            self._pending_bluetooth = data[:1] == b"\x01"
+        elif code == COMMAND_MAC_ADDR:
+            result = LD2410_MAC
+        elif code == COMMAND_RESTART:
+            self.respond(ld2410_ack(code), now)
+            self.restart()
+            return
+        else:
+            status = 1
+        self.respond(ld2410_ack(code, result, status), now)
+
+    def _basic_config(self, data):
+        values = dict(_word(data, i) for i in range(0, len(data) - 5, 6))
+        motion, static, timeout = values.get(0), values.get(1), values.get(2)
+        if None in (motion, static, timeout) or not 2 <= motion <= LAST_GATE or not 2 <= static <= LAST_GATE:
+            return 1
+        self.last_motion_gate = motion
+        self.last_static_gate = static
+        self.presence_timeout = timeout
+        return 0
+
+    def _gate_sensitivity(self, data):
+        values = dict(_word(data, i) for i in range(0, len(data) - 5, 6))
+        gate, motion, static = values.get(0), values.get(1), values.get(2)
+        if None in (gate, motion, static) or motion > 100 or static > 100:
+            return 1
+        if gate == 0xFFFF:
+            gates = range(LAST_GATE + 1)
+        elif gate <= LAST_GATE:
+            gates = (gate,)
+        else:
+            return 1
+        for g in gates:
+            self.gate_motion_sensitivity[g] = motion
+            self.gate_static_sensitivity[g] = static
+        return 0
+
+    def _set_code(self, data, codes, attribute):
+        code = int.from_bytes(data[:2], "little")
+        for value, value_code in codes.items():
+            if value_code == code:
+                setattr(self, attribute, value)
+                return 0
+        return 1
+
+
+class MR24Emulator(Emulator):
+
+    """An MR24HPC1 on a pty. Sends presence, motion and body movement
+    reports (and heartbeats, with the `ack` fault), and answers queries:
+    heartbeat, product information, initialization, reset, and for
+    anything else, it echoes the data back like the sensor does for
+    settings.
+    """
+
+    sensor = "mr24"
+    baudrate = MR24_BAUD
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # the driver's own parser, so this checks the checksum and end of frame
+        self._parser = MR24FrameParser()
+
+    @property
+    def bad_commands(self):
+        """Frames from the driver with a bad checksum or end of frame."""
+        return self._parser.bad_checksums + self._parser.bad_ends
+
+    def _commands(self, data):
+        return self._parser.feed(data)
+
+    def _handle(self, command, now):
+        control, cmd, data = command
+        if control == 0x02 and cmd in MR24_PRODUCT_INFO:
+            data = MR24_PRODUCT_INFO[cmd]
+        elif control == 0x80 and cmd in (0x81, 0x82, 0x83):
+            # presence, motion and body movement queries get what the person is up to
+            moving = self.source.moving
+            data = bytes([(0x01, 0x02 if moving else 0x01, 0x30 if moving else 0x03)[cmd - 0x81]])
+        elif (control, cmd) == (0x05, 0x81):
+            # initialization: long done
+            data = b"\x01"
+        elif (control, cmd) == (0x01, 0x02):
+            # reset: answer, then go quiet for a moment like a rebooting sensor
+            self._next_report = now + 1.0
+        self.respond(buildFrame(control, cmd, data), now)
+
+
+class EmulatorPool():
+
+    """Runs any number of emulators from one thread, with `selectors`
+    for the commands coming in and a heap of who's due next."""
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._emulators = {}
+        self._heap = []
+        self._wake = {}  # fd -> time we last scheduled it for
+        self._lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._thread = None
+        self._running = False
+
+    def __len__(self):
+        return len(self._emulators)
+
+    def add(self, emulator):
+        """Start running `emulator`. Returns it, for convenience."""
+        with self._lock:
+            fd = emulator.fileno()
+            self._emulators[fd] = emulator
+            emulator._pool = self
+            self._selector.register(fd, selectors.EVENT_READ, emulator)
+            self._schedule(emulator, time.monotonic())
+        os.write(self._wakeup_w, b"\x00")
+        return emulator
+
+    def remove(self, emulator):
+        with self._lock:
+            fd = emulator.fileno()
+            if self._emulators.pop(fd, None) is not None:
+                self._selector.unregister(fd)
+                self._wake.pop(fd, None)
+            emulator._pool = None
+
+    def _schedule(self, emulator, when):
+        fd = emulator.fileno()
+        self._wake[fd] = when
+        heapq.heappush(self._heap, (when, fd))
+
+    def poll(self, timeout=None):
+        """Handle commands and send whatever is due, waiting at most `timeout`."""
+        now = time.monotonic()
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                when, fd = heapq.heappop(heap)
+                if self._wake.get(fd) != when:
+                    continue  # rescheduled or removed since
+                self._schedule(self._emulators[fd], self._emulators[fd].tick(now))
+            wait = max(heap[0][0] - now, 0) if heap else None
+        if timeout is not None:
+            wait = timeout if wait is None else min(wait, timeout)
+
+        for key, _events in self._selector.select(wait):
+            emulator = key.data
+            now = time.monotonic()
+            if emulator is None:
+                os.read(self._wakeup_r, READ_SIZE)
+                continue
+            if not emulator.receive(now):
+                self.remove(emulator)
+                continue
+            with self._lock:
+                if emulator.fileno() in self._emulators:
+                    self._schedule(emulator, emulator.tick(now))
+
+    def run(self, duration=None):
+        """Keep the emulators going, forever or for `duration` seconds,
+        or until stop() is called from another thread."""
+        self._running = True
+        end = None if duration is None else time.monotonic() + duration
+        while self._running:
+            if end is None:
+                self.poll()
+            else:
+                left = end - time.monotonic()
+                if left <= 0:
+                    return
+                self.poll(left)
+
+    def start(self):
+        """run() in a background thread."""
+        self._thread = threading.Thread(target=self.run, name="EmulatorPool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        os.write(self._wakeup_w, b"\x00")
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Stop, and close the emulators and their ptys."""
+        self.stop()
+        for emulator in list(self._emulators.values()):
+            emulator.close()
+        self._selector.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+
+def main():
+    """python MMWaveEmulator.py [LD2410 count] [MR24 count]
+
+    Starts that many emulators (one LD2410 by default), prints their
+    devices and runs until interrupted."""
+    import sys
+    ld2410s = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    mr24s = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    pool = EmulatorPool()
+    for i in range(ld2410s):
+        print("LD2410", pool.add(LD2410Emulator(seed=i)).path)
+    for i in range(mr24s):
+        print("MR24HPC1", pool.add(MR24Emulator(seed=i)).path)
+    try:
+        pool.run()
+    except KeyboardInterrupt:
+        pass
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
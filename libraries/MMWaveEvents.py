@@ -0,0 +1,148 @@
+"""
+Callbacks for when something actually changes, instead of polling.
+
+Most of the time you don't care about every frame, only about presence
+starting or stopping, or the target moving by more than a bit. So rather
+than reading the sensor and comparing a dozen attributes yourself:
+
+    sensor = MMWave(port)
+    sensor.on_change("detected", lambda field, old, new: print("presence", new))
+    sensor.on_change("detection_cm", moved, hysteresis=30, debounce=0.5)
+    sensor.on_change(("motion_target_cm", "motion_energy"), moved,
+                     hysteresis={"motion_target_cm": 30, "motion_energy": 10})
+    while True:
+        sensor.read()
+
+and for the MR24HPC1, with the names of the MR24State fields:
+
+    sensor.on_change(("occupied", "motion"), changed)
+
+Callbacks are called as callback(field, old, new), from inside read() (or
+whatever decoded the frame), so keep them short. `old` is the value last
+reported to that callback, not the one from the frame before.
+
+hysteresis -- for numbers: only report once the value is at least this far
+              from the last reported one. Either one threshold for all the
+              fields, or a dict of field -> threshold (fields not in it get
+              0). Changes from or to None always count, and so does any
+              change of something that isn't an int or a float, like
+              `detected` (a bool) or an MR24 text field.
+debounce -- seconds a change has to stick around (for every frame in
+            between) before it's reported. Frames only come in when the
+            sensor sends them, so a change is reported on the first frame
+            after the debounce time, not exactly at it.
+
+When nobody has subscribed, the only cost per frame is an `is not None`
+check in the driver, and this module doesn't even get imported.
+"""
+
+import time
+
+NUMBERS = (int, float)
+"""The types hysteresis applies to. Anything else changes when it's !=."""
+
+
+class Subscription():
+
+    """One field watched for one callback. What on_change() returns
+    (one per field); call cancel() to stop it."""
+
+    def __init__(self, watcher, field, callback, hysteresis, debounce, value):
+        self.watcher = watcher
+        self.field = field
+        self.callback = callback
+        self.hysteresis = hysteresis
+        self.debounce = debounce
+
+        self.value = value
+        """The value last reported (or the one we started with)."""
+
+        self.since = None  # when a not yet reported change showed up
+
+    def changed(self, value):
+        """Whether `value` is different enough from the last reported one."""
+        old = self.value
+        if value == old:
+            return False
+        # type() rather than isinstance(), so that bools don't count
+        if self.hysteresis and type(value) in NUMBERS and type(old) in NUMBERS:
+            return abs(value - old) >= self.hysteresis
+        return True
+
+    def cancel(self):
+        self.watcher.remove(self)
+
+
+class ChangeWatcher():
+
+    """The subscriptions of one sensor. The drivers call update() with
+    the object holding the fields after every frame they decode."""
+
+    def __init__(self, fields):
+        """Arguments:
+
+        fields -- names which can be watched, to catch typos early
+        """
+        self.fields = fields
+        self.subscriptions = []
+
+    def subscribe(self, source, fields, callback, hysteresis=0, debounce=0):
+        """Watch `fields` (a name or a tuple of them) of `source`. Returns
+        a list of Subscriptions, one per field.
+
+        `hysteresis` is a number for all of them, or a dict of field ->
+        threshold for some of them."""
+        if isinstance(fields, str):
+            fields = (fields,)
+        for field in fields:
+            if field not in self.fields:
+                raise ValueError(f"Can't watch {field!r}, only {', '.join(self.fields)}")
+        if isinstance(hysteresis, dict):
+            thresholds = hysteresis
+            for field in thresholds:
+                if field not in fields:
+                    raise ValueError(f"Hysteresis for {field!r}, which isn't one of the fields watched")
+        else:
+            thresholds = {field: hysteresis for field in fields}
+        if debounce < 0 or any(threshold < 0 for threshold in thresholds.values()):
+            raise ValueError("hysteresis and debounce can't be negative")
+        added = [Subscription(self, field, callback, thresholds.get(field, 0), debounce, getattr(source, field))
+                 for field in fields]
+        self.subscriptions = self.subscriptions + added
+        return added
+
+    def remove(self, subscription):
+        # a new list, so that a callback can cancel while update() goes through the old one
+        self.subscriptions = [sub for sub in self.subscriptions if sub is not subscription]
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def update(self, source, now=None):
+        """Compare the fields of `source` against what was last reported
+        and call back for the ones which really changed. Returns how many
+        callbacks that was."""
+        fired = 0
+        for sub in self.subscriptions:
+            value = getattr(source, sub.field)
+            if value == sub.value:
+                # the cheap, common case
+                sub.since = None
+                continue
+            if not sub.changed(value):
+                sub.since = None
+                continue
+            if sub.debounce:
+                if now is None:
+                    now = time.monotonic()
+                if sub.since is None:
+                    sub.since = now
+                    continue
+                if now - sub.since < sub.debounce:
+                    continue
+                sub.since = None
+            old = sub.value
+            sub.value = value
+            sub.callback(sub.field, old, value)
+            fired += 1
+        return fired
@@ -0,0 +1,284 @@
+"""
+One frame scanner for every UART radar.
+
+The LD2410 and the MR24HPC1 (and their command answers, and most other
+serial radars out there) all frame their messages the same way: a fixed
+header, a length field somewhere near the start, the data, maybe a
+checksum, and a fixed footer. Only the details differ, so those go in a
+FrameSpec, and FrameScanner does the actual work for all of them:
+
+    LD2410_SPEC = FrameSpec(header=bytes.fromhex("f4f3f2f1"), footer=bytes.fromhex("f8f7f6f5"),
+                            length_offset=4, max_length=35)
+
+    scanner = FrameScanner(LD2410_SPEC)
+    for start, data, length in scanner.feed_offsets(chunk): ...
+
+The scanner works in one fixed bytearray and can read straight from a
+port into it with readinto(), so it doesn't allocate per frame. It finds
+headers with bytearray.find() and checks footers with startswith(), on
+CPython. Not every MicroPython or CircuitPython build has those on a
+bytearray, so where they're missing it falls back to plain index loops
+(slower, but the same results). Partial frames are kept until the rest
+shows up; anything that turns out not to be a frame (bad length, bad
+checksum, wrong footer) is skipped one byte at a time, so a real frame
+hiding inside garbage is still found.
+
+A new sensor only needs a FrameSpec to get all of this for free.
+"""
+
+DEFAULT_BUFFER_SIZE = 256
+
+
+def sum8(buffer, start, end):
+    """Low 8 bits of the sum of buffer[start:end], which is the
+    checksum the MR24HPC1 (and plenty of others) use."""
+    return sum(memoryview(buffer)[start:end]) & 0xFF
+
+
+class FrameSpec():
+
+    """How one kind of frame looks. Frames are:
+
+        header | ... | length | data | checksum | footer
+
+    where the length field counts only the data.
+    """
+
+    def __init__(self, header, footer, length_offset, max_length, length_size=2,
+                 byteorder="little", checksum=None, checksum_size=0, data_offset=None):
+        """Arguments:
+
+        header, footer -- bytes at the start and the end of every frame
+        length_offset -- where the length field is, counting from the start of the header
+        max_length -- longest data we accept. Anything longer is a misread.
+        length_size -- bytes in the length field
+        byteorder -- of the length field, "little" or "big"
+        checksum -- function(buffer, start, end) giving the checksum of the frame
+                    which starts at buffer[start] and has its checksum at buffer[end],
+                    like sum8(). None for frames without one.
+        checksum_size -- bytes in the checksum (big endian if more than one)
+        data_offset -- where the data starts, if it isn't right after the length
+        """
+        if checksum is not None and not checksum_size:
+            raise ValueError("A checksum needs a checksum_size")
+        self.header = bytes(header)
+        self.footer = bytes(footer)
+        self.length_offset = length_offset
+        self.length_size = length_size
+        self.little_endian = byteorder == "little"
+        self.max_length = max_length
+        self.checksum = checksum
+        self.checksum_size = checksum_size if checksum is not None else 0
+        self.data_offset = length_offset + length_size if data_offset is None else data_offset
+
+        self.overhead = self.data_offset + self.checksum_size + len(self.footer)
+        """Bytes in a frame besides the data."""
+
+
+class FrameScanner():
+
+    """Incremental ("sans-IO") frame finder for anything a FrameSpec can
+    describe. Feed it bytes, in whatever chunks they arrive, and it gives
+    back every complete, good frame it can find.
+    """
+
+    def __init__(self, spec, size=DEFAULT_BUFFER_SIZE):
+        """Arguments:
+
+        spec -- the FrameSpec of the frames to look for
+        size -- capacity of the internal buffer
+        """
+        if size < spec.overhead + spec.max_length:
+            raise ValueError(f"Buffer size {size} can't hold a {spec.max_length} byte frame")
+
+        self.spec = spec
+
+        self.buffer = bytearray(size)
+        """Reusable buffer. Offsets returned by next_frame() point in here."""
+
+        self._view = memoryview(self.buffer)
+        if hasattr(self.buffer, "find") and hasattr(self.buffer, "startswith"):
+            self._find = self.buffer.find
+            self._startswith = self.buffer.startswith
+        else:
+            self._find = self._find_loop
+            self._startswith = self._startswith_loop
+        self._fill = 0  # bytes in the buffer
+        self._pos = 0   # where scanning continues
+
+        self.start = 0
+        """Where the frame last returned by next_frame() starts (its header)."""
+
+        self.length = 0
+        """Data length of the frame last returned by next_frame()."""
+
+        self.discarded = 0
+        """Count of bytes thrown away while looking for a frame."""
+
+        self.bad_checksums = 0
+        self.bad_footers = 0
+
+    def reset(self):
+        """Forget everything buffered."""
+        self._fill = 0
+        self._pos = 0
+
+    def free(self):
+        """How many bytes can be added right now without losing anything."""
+        return len(self.buffer) - self._fill + self._pos
+
+    def _compact(self):
+        # move whatever we haven't consumed yet to the front of the buffer
+        if self._pos:
+            remaining = self._fill - self._pos
+            if remaining:
+                self._view[:remaining] = self._view[self._pos:self._fill]
+            self._fill = remaining
+            self._pos = 0
+
+    def _append(self, data):
+        self._compact()
+        n = min(len(data), len(self.buffer) - self._fill)
+        self._view[self._fill:self._fill + n] = data[:n]
+        self._fill += n
+        return n
+
+    def readfrom(self, port, nbytes):
+        """Read up to `nbytes` from `port` straight into the buffer, using
+        port.readinto() if it has one, so no new bytes objects are made.
+        Returns how many bytes were read. Use next_frame() afterwards.
+        """
+        self._compact()
+        nbytes = min(nbytes, len(self.buffer) - self._fill)
+        if not hasattr(port, "readinto"):
+            return self._append(port.read(nbytes) or b"")
+        n = port.readinto(self._view[self._fill:self._fill + nbytes]) or 0
+        self._fill += n
+        return n
+
+    def _find_loop(self, sub, start, end):
+        # bytearray.find(sub, start, end), for where there's none
+        buffer = self.buffer
+        first = sub[0]
+        n = len(sub)
+        for i in range(start, end - n + 1):
+            if buffer[i] == first and self._startswith_loop(sub, i):
+                return i
+        return -1
+
+    def _startswith_loop(self, sub, at):
+        # bytearray.startswith(sub, at), ditto
+        buffer = self.buffer
+        if at + len(sub) > len(buffer):
+            return False
+        for i in range(len(sub)):
+            if buffer[at + i] != sub[i]:
+                return False
+        return True
+
+    def _skip(self, start):
+        # what looked like a header at `start` wasn't; look again one byte on
+        self._pos = start + 1
+        self.discarded += 1
+
+    def next_frame(self):
+        """Find the next complete frame in what has been buffered so far.
+
+        Returns the offset of its data in `buffer` (with the length in
+        `length` and the start of the frame in `start`), or -1 if there's
+        no complete frame yet. It stays valid until the next call to any
+        method of this object.
+        """
+        spec = self.spec
+        buffer = self.buffer
+        header = spec.header
+        footer = spec.footer
+        length_offset = spec.length_offset
+        length_size = spec.length_size
+        checksum = spec.checksum
+        fill = self._fill
+        find = self._find
+
+        while True:
+            start = find(header, self._pos, fill)
+            if start < 0:
+                # keep a possible partial header around for next time
+                keep = max(self._pos, fill - len(header) + 1)
+                self.discarded += keep - self._pos
+                self._pos = keep
+                return -1
+
+            self.discarded += start - self._pos
+            self._pos = start
+
+            if fill < start + spec.data_offset:
+                return -1
+            at = start + length_offset
+            if length_size == 2:
+                if spec.little_endian:
+                    length = buffer[at] | (buffer[at + 1] << 8)
+                else:
+                    length = (buffer[at] << 8) | buffer[at + 1]
+            else:
+                length = 0
+                for i in range(length_size):
+                    length = (length << 8) | buffer[at + (length_size - 1 - i if spec.little_endian else i)]
+            if length > spec.max_length:
+                self._skip(start)
+                continue
+
+            data = start + spec.data_offset
+            end = data + length
+            if fill < end + spec.checksum_size + len(footer):
+                return -1
+            if checksum is not None:
+                if spec.checksum_size == 1:
+                    expected = buffer[end]
+                else:
+                    expected = 0
+                    for i in range(spec.checksum_size):
+                        expected = (expected << 8) | buffer[end + i]
+                if checksum(buffer, start, end) != expected:
+                    self.bad_checksums += 1
+                    self._skip(start)
+                    continue
+                end += spec.checksum_size
+            if not self._startswith(footer, end):
+                self.bad_footers += 1
+                self._skip(start)
+                continue
+
+            self._pos = end + len(footer)
+            self.start = start
+            self.length = length
+            return data
+
+    def data(self, offset):
+        """A bytes copy of the data at `offset` (from next_frame())."""
+        return bytes(self._view[offset:offset + self.length])
+
+    def copy_data(self, offset, into, length=None):
+        """Copy the data at `offset` (from next_frame()) into the start of
+        `into` (a bytearray or memoryview big enough for it), so it
+        survives further reading. `length` defaults to that of the frame
+        next_frame() returned last. Returns the length."""
+        if length is None:
+            length = self.length
+        into[:length] = self._view[offset:offset + length]
+        return length
+
+    def feed_offsets(self, data):
+        """Add `data` (bytes, bytearray or memoryview), calling next_frame()
+        as the buffer fills up. Generator of (start, data offset, length)
+        for every frame completed by it, each only valid until the next one."""
+        data = memoryview(data)
+        while True:
+            n = self._append(data)
+            data = data[n:]
+            while True:
+                offset = self.next_frame()
+                if offset < 0:
+                    break
+                yield self.start, offset, self.length
+            if not data:
+                return
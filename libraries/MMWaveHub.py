@@ -0,0 +1,166 @@
+"""
+Look after lots of sensors from one thread.
+
+A gateway with dozens of LD2410 and MR24HPC1 sensors doesn't need a
+thread (or an MMWave object blocking on a port) per sensor. SensorHub
+registers all the serial ports with `selectors` (epoll on Linux), reads
+whatever is ready, runs it through that sensor's incremental decoder and
+hands every decoded report to one callback or queue, tagged with the
+sensor ID you registered it under.
+
+    hub = SensorHub(callback=lambda sensor_id, report: print(sensor_id, report.detected))
+    hub.add_mmwave("hallway", serial.Serial("/dev/ttyUSB0", 256000))
+    hub.add_mr24("kitchen", serial.Serial("/dev/ttyUSB1", 115200))
+    hub.run()
+
+The ports only need a fileno(), so pyserial ports, plain file descriptors
+and ptys all work. Reports from LD2410s are LD2410Report objects; from
+MR24s, what MR24.handleFrame() returns for every human presence frame.
+
+This is for a computer (Linux, mostly), not for CircuitPython.
+"""
+
+import os
+import selectors
+import time
+
+from MMWave import FrameParser, LD2410Report, check_packet
+from mmWaveStatic_MR24HPC1 import MR24, MR24FrameParser
+
+READ_SIZE = 4096
+"""Most we read from one port per wakeup."""
+
+
+class LD2410Decoder():
+
+    """Turns LD2410 bytes into LD2410Reports. Bad frames are counted
+    in `serial_failures`, like on MMWave."""
+
+    def __init__(self):
+        self._parser = FrameParser()
+        self.serial_failures = 0
+
+    def feed(self, data):
+        reports = []
+        now = time.time()
+        for payload in self._parser.feed(data):
+            if check_packet(payload, 0, len(payload)) > 0:
+                reports.append(LD2410Report(payload, now))
+            else:
+                self.serial_failures += 1
+        return reports
+
+
+class MR24Decoder():
+
+    """Turns MR24HPC1 bytes into MR24.handleFrame() results."""
+
+    def __init__(self):
+        self._parser = MR24FrameParser()
+        self.sensor = MR24(None, verbose=False)
+
+    def feed(self, data):
+        reports = []
+        for control_word, command_word, frame_data in self._parser.feed(data):
+            result = self.sensor.handleFrame(control_word, command_word, frame_data)
+            if result is not None:
+                reports.append(result)
+        return reports
+
+
+def _fileno(port):
+    return port if isinstance(port, int) else port.fileno()
+
+
+class SensorHub():
+
+    """Reads many sensors from one thread. See the module docstring."""
+
+    def __init__(self, callback=None, queue=None):
+        """Arguments (give one of these):
+
+        callback -- called as callback(sensor_id, report) for every report
+        queue -- anything with .put(); gets (sensor_id, report) tuples
+        """
+        if callback is None and queue is None:
+            raise ValueError("Need a callback or a queue to deliver reports to")
+        self.callback = callback
+        self.queue = queue
+        self._selector = selectors.DefaultSelector()
+        self._sensors = {}
+
+        self.bytes_read = 0
+        self.reports = 0
+
+    def add(self, sensor_id, port, decoder):
+        """Watch `port` and run what comes in through `decoder`, which is
+        anything with a feed(bytes) method returning a list of reports."""
+        if sensor_id in self._sensors:
+            raise ValueError(f"Sensor {sensor_id!r} is already registered")
+        fd = _fileno(port)
+        os.set_blocking(fd, False)
+        self._selector.register(fd, selectors.EVENT_READ, (sensor_id, decoder))
+        self._sensors[sensor_id] = fd
+        return decoder
+
+    def add_mmwave(self, sensor_id, port):
+        """Watch an LD2410 on `port`. Returns its decoder."""
+        return self.add(sensor_id, port, LD2410Decoder())
+
+    def add_mr24(self, sensor_id, port):
+        """Watch an MR24HPC1 on `port`. Returns its decoder."""
+        return self.add(sensor_id, port, MR24Decoder())
+
+    def remove(self, sensor_id):
+        """Stop watching a sensor. Its port is left open."""
+        self._selector.unregister(self._sensors.pop(sensor_id))
+
+    def __len__(self):
+        return len(self._sensors)
+
+    def poll(self, timeout=None):
+        """Wait up to `timeout` seconds (None is forever) for any port to
+        have data, and deliver whatever reports it completes.
+
+        Returns how many reports were delivered.
+        """
+        delivered = 0
+        callback = self.callback
+        for key, _events in self._selector.select(timeout):
+            sensor_id, decoder = key.data
+            try:
+                data = os.read(key.fd, READ_SIZE)
+            except BlockingIOError:
+                continue
+            except OSError:
+                # the device went away (e.g. USB unplugged)
+                self.remove(sensor_id)
+                continue
+            if not data:
+                self.remove(sensor_id)
+                continue
+            self.bytes_read += len(data)
+            for report in decoder.feed(data):
+                if callback is not None:
+                    callback(sensor_id, report)
+                else:
+                    self.queue.put((sensor_id, report))
+                delivered += 1
+        self.reports += delivered
+        return delivered
+
+    def run(self, duration=None):
+        """Keep polling, forever or for `duration` seconds, or until
+        every sensor has been removed."""
+        end = None if duration is None else time.monotonic() + duration
+        while self._sensors:
+            if end is None:
+                self.poll()
+            else:
+                left = end - time.monotonic()
+                if left <= 0:
+                    return
+                self.poll(left)
+
+    def close(self):
+        self._selector.close()
@@ -0,0 +1,106 @@
+"""
+Keep reading a sensor in a background thread.
+
+If the main loop doesn't read() often enough, the UART buffer fills up,
+bytes get lost, and whatever is left is old news. With
+
+    sensor.start()
+    ...
+    report = sensor.latest()   # newest report, or None if there wasn't one yet
+    ...
+    sensor.stop()
+
+a daemon thread drains the port the whole time and keeps only the most
+recent report. latest() just returns a reference, so it never waits for
+anything. Handing a report over is a single attribute assignment, which
+Python does in one go, so there's no lock either.
+
+Reports which got replaced before anybody looked at them (with latest())
+are counted in `dropped`. That count can be off by one when latest() and
+a new report happen at exactly the same time, which doesn't matter for
+what it's for: seeing whether you read often enough.
+
+This needs threads, so it's for a computer, not for CircuitPython.
+"""
+
+import threading
+
+IDLE_WAIT = 0.005
+"""Seconds to wait before trying again when the port had nothing for us."""
+
+JOIN_TIMEOUT = 2.0
+"""How long stop() waits for the thread to finish its current read."""
+
+
+class BackgroundReader():
+
+    """Calls `poll()` over and over in a daemon thread, and keeps the last
+    report it returned. What the drivers' start() methods make."""
+
+    def __init__(self, poll, callback=None, idle=IDLE_WAIT, name="mmwave-reader"):
+        """Arguments:
+
+        poll -- function returning a list of new reports (maybe empty). It
+                should block for a bit (like a port timeout) rather than spin.
+        callback -- called in the thread as callback(report) for every report
+        idle -- seconds to wait after a poll that came back empty
+        """
+        self._poll = poll
+        self.callback = callback
+        self.idle = idle
+
+        self._latest = None
+        self._taken = None  # what latest() handed out last
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+        self.reports = 0
+        """Reports read so far."""
+
+        self.dropped = 0
+        """Reports replaced by a newer one before latest() got them."""
+
+        self.error = None
+        """The exception which stopped the thread, if that's what happened."""
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        stopping = self._stopping
+        while not stopping.is_set():
+            try:
+                reports = self._poll()
+            except Exception as e:
+                # e.g. the port went away. Keep it for whoever is interested
+                self.error = e
+                return
+            if not reports:
+                stopping.wait(self.idle)
+                continue
+            for report in reports:
+                if self._latest is not None and self._latest is not self._taken:
+                    self.dropped += 1
+                self._latest = report
+                self.reports += 1
+                if self.callback is not None:
+                    self.callback(report)
+
+    def latest(self):
+        """The newest report, or None if there hasn't been one yet."""
+        report = self._latest
+        self._taken = report
+        return report
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def stop(self, timeout=JOIN_TIMEOUT):
+        """Ask the thread to finish and wait (up to `timeout`) for it.
+        Returns True if it did."""
+        self._stopping.set()
+        if self._thread.ident is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        return not self._thread.is_alive()
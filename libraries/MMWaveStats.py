@@ -0,0 +1,104 @@
+"""
+Counters and latency histograms for the sensor drivers.
+
+This is opt-in: the drivers only import it when you ask for stats, with
+MMWave(port, stats=True) or sensor.enable_stats(), and when it's off, the
+only cost on the hot path is an `is not None` check. So you don't need to
+copy this onto your board unless you want it.
+
+    sensor = MMWave(port, stats=True)
+    ...
+    print(sensor.stats())
+
+Debug messages which used to be print()ed by the drivers go to `log`
+instead, if you set it (`print` works fine).
+"""
+
+import time
+
+# Upper bounds of the histogram buckets. Anything bigger goes in the last one.
+LATENCY_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+"""For command round-trip times, in seconds."""
+
+COUNT_BOUNDS = (0, 1, 2, 5, 10, 20, 50, 100)
+"""For things like retries per read()."""
+
+
+class Histogram():
+
+    """Counts of values in fixed buckets, plus count, total and maximum."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = None
+
+    def observe(self, value):
+        i = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        return {"count": self.count,
+                "mean": self.total / self.count if self.count else None,
+                "max": self.max,
+                "buckets": list(zip(self.bounds + (None,), self.buckets)),
+                }
+
+
+class Stats():
+
+    """A bag of named counters and histograms, for one sensor."""
+
+    def __init__(self, log=None):
+        """Arguments:
+
+        log -- called with debug messages, like print(). None drops them.
+        """
+        self.log = log
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.monotonic()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        """Add a timing to the histogram called `name`."""
+        self._histogram(name, LATENCY_BOUNDS).observe(seconds)
+
+    def observe_count(self, name, value):
+        """Add a count (like retries) to the histogram called `name`."""
+        self._histogram(name, COUNT_BOUNDS).observe(value)
+
+    def _histogram(self, name, bounds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(bounds)
+        return histogram
+
+    def debug(self, *args):
+        if self.log is not None:
+            self.log(*args)
+
+    def reset(self):
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.monotonic()
+
+    def snapshot(self):
+        """A plain dict of everything, safe to keep or serialize."""
+        result = dict(self.counters)
+        for name, histogram in self.histograms.items():
+            result[name] = histogram.snapshot()
+        result["seconds"] = time.monotonic() - self.started
+        return result
@@ -0,0 +1,203 @@
+"""
+Make up sensor data: valid LD2410 and MR24HPC1 frames, command ACKs, and
+streams of them with faults mixed in.
+
+This is for benchmarks and testing on a computer, so nobody needs a
+sensor (or a hundred of them) on the desk. Nothing here talks to a port;
+it just builds bytes.
+
+    source = FrameSource("ld2410", seed=1, noise=0.01, truncated=0.01)
+    data, good = source.stream(10000)    # 10000 frames, `good` of them valid
+    for when, chunk in source.timed():   # or paced at the sensor's frame rate
+        ...
+
+The defaults of ld2410_frame() are a moving and static target at 120cm
+with the energies of a person standing in the room.
+"""
+
+import random
+
+import MMWave
+from mmWaveStatic_MR24HPC1 import buildFrame
+from MMWave import (COMMAND_FOOTER, COMMAND_HEADER, FRAME_FOOTER, FRAME_HEADER,
+                    LAST_GATE, MAX_LEGIT_DISTANCE, REPORT_MODE_BASIC,
+                    REPORT_MODE_ENGINEERING)
+
+# The LD2410 sends about 10 frames a second, the MR24HPC1 reports about once a second.
+LD2410_RATE = 10
+MR24_RATE = 1
+
+FAULTS = ("noise", "truncated", "bad_footer", "ack")
+"""What FrameSource can mix in, besides good frames."""
+
+
+def ld2410_frame(report_mode=REPORT_MODE_ENGINEERING, target_state=3,
+                 motion_cm=120, motion_energy=60, static_cm=120, static_energy=40,
+                 detection_cm=120, gate_motion_energy=None, gate_static_energy=None,
+                 light_level=80, output=None):
+    """A valid LD2410 data frame.
+
+    Arguments are the fields as read() decodes them. The gate energies
+    (engineering mode only) are 9 values each; by default they ramp up
+    10, 20, ... and 5, 15, .... `output` defaults to whether anybody's there.
+    """
+    if gate_motion_energy is None:
+        gate_motion_energy = range(10, 100, 10)
+    if gate_static_energy is None:
+        gate_static_energy = range(5, 95, 10)
+    if output is None:
+        output = 1 if target_state else 0
+
+    packet = (bytes([report_mode, 0xaa, target_state])
+              + motion_cm.to_bytes(2, "little") + bytes([motion_energy])
+              + static_cm.to_bytes(2, "little") + bytes([static_energy])
+              + detection_cm.to_bytes(2, "little"))
+    if report_mode == REPORT_MODE_ENGINEERING:
+        packet += (bytes([LAST_GATE, LAST_GATE])
+                   + bytes(gate_motion_energy) + bytes(gate_static_energy)
+                   + bytes([light_level, output]))
+    packet += bytes([0x55, 0x00])
+    return FRAME_HEADER + len(packet).to_bytes(2, "little") + packet + FRAME_FOOTER
+
+
+def ld2410_ack(command, data=b"", status=0):
+    """The LD2410's answer to `command` (the 2 command bytes, like
+    MMWave.COMMAND_FIRMWARE_VERSION): status 0 is success, 1 failure.
+    `data` follows the status, for commands which return something."""
+    packet = bytes([command[0], 0x01]) + status.to_bytes(2, "little") + data
+    return COMMAND_HEADER + len(packet).to_bytes(2, "little") + packet + COMMAND_FOOTER
+
+
+def mr24_frame(control_word, command_word, data=b"\x00"):
+    """A valid MR24HPC1 frame, built the same way the driver builds its own."""
+    return buildFrame(control_word, command_word, data)
+
+
+class FrameSource():
+
+    """Endless supply of frames from a made-up sensor, with a person
+    wandering around in front of it and optional faults mixed in.
+
+    The fault arguments are the chance (0 to 1) that any one frame is
+    replaced by (or, for acks, followed by) that fault:
+
+    noise -- a few random bytes
+    truncated -- a good frame cut off somewhere in the middle
+    bad_footer -- a good frame with a mangled footer
+    ack -- a command ACK (LD2410) or heartbeat (MR24) in between
+
+    Noise and truncated frames can also eat into the next good frame, the
+    way they would on a real line. That's what resync costs are about.
+    """
+
+    def __init__(self, sensor="ld2410", report_mode=REPORT_MODE_ENGINEERING, rate=None,
+                 seed=None, noise=0.0, truncated=0.0, bad_footer=0.0, ack=0.0):
+        """Arguments:
+
+        sensor -- "ld2410" or "mr24"
+        report_mode -- for LD2410s, REPORT_MODE_ENGINEERING or REPORT_MODE_BASIC
+        rate -- frames per second for timed(), defaults to the sensor's own
+        seed -- for the random number generator, to get the same stream every time
+        """
+        if sensor not in ("ld2410", "mr24"):
+            raise ValueError(f"Unknown sensor {sensor!r}")
+        self.sensor = sensor
+        self.report_mode = report_mode
+        if rate is None:
+            rate = LD2410_RATE if sensor == "ld2410" else MR24_RATE
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.noise = noise
+        self.truncated = truncated
+        self.bad_footer = bad_footer
+        self.ack = ack
+
+        # where our made-up person is, in cm, and whether they're moving
+        self.distance = self.random.randrange(30, MAX_LEGIT_DISTANCE)
+        self.moving = True
+
+        # how many of each kind of frame we've made
+        self.counts = dict.fromkeys(("good",) + FAULTS, 0)
+
+    def _wander(self):
+        rnd = self.random
+        if rnd.random() < 0.05:
+            self.moving = not self.moving
+        if self.moving:
+            self.distance = min(max(self.distance + rnd.randrange(-15, 16), 30), MAX_LEGIT_DISTANCE)
+
+    def good_frame(self):
+        """Next report from the sensor, with the person moved a bit."""
+        self._wander()
+        rnd = self.random
+        if self.sensor == "mr24":
+            # presence, then motion, then body movement, like the real thing
+            kind = rnd.randrange(3)
+            if kind == 0:
+                return mr24_frame(0x80, 0x01, b"\x01")
+            if kind == 1:
+                return mr24_frame(0x80, 0x02, b"\x02" if self.moving else b"\x01")
+            return mr24_frame(0x80, 0x03, bytes([rnd.randrange(6, 100) if self.moving else rnd.randrange(1, 6)]))
+
+        motion_energy = rnd.randrange(40, 100) if self.moving else 0
+        static_energy = rnd.randrange(20, 80)
+        if self.report_mode == REPORT_MODE_BASIC:
+            return ld2410_frame(REPORT_MODE_BASIC, 3 if self.moving else 2,
+                                self.distance, motion_energy, self.distance, static_energy, self.distance)
+        gate = min(self.distance // 75, LAST_GATE)
+        gate_motion = bytes(motion_energy if g == gate else rnd.randrange(0, 15) for g in range(LAST_GATE + 1))
+        gate_static = bytes(static_energy if g == gate else rnd.randrange(0, 15) for g in range(LAST_GATE + 1))
+        return ld2410_frame(REPORT_MODE_ENGINEERING, 3 if self.moving else 2,
+                            self.distance, motion_energy, self.distance, static_energy, self.distance,
+                            gate_motion, gate_static, rnd.randrange(256))
+
+    def ack_frame(self):
+        if self.sensor == "mr24":
+            return mr24_frame(0x01, 0x01, b"\x0f")  # heartbeat
+        return ld2410_ack(MMWave.COMMAND_GATE_SENSITIVITY)
+
+    def frames(self):
+        """Generator of (kind, frame bytes), where kind is "good" or one of FAULTS."""
+        rnd = self.random
+        counts = self.counts
+        while True:
+            frame = self.good_frame()
+            roll = rnd.random()
+            if roll < self.noise:
+                kind, frame = "noise", bytes(rnd.randrange(256) for _ in range(rnd.randrange(1, 12)))
+            elif roll < self.noise + self.truncated:
+                kind, frame = "truncated", frame[:rnd.randrange(3, len(frame) - 1)]
+            elif roll < self.noise + self.truncated + self.bad_footer:
+                kind, frame = "bad_footer", frame[:-1] + bytes([frame[-1] ^ 0xFF])
+            else:
+                kind = "good"
+            counts[kind] += 1
+            yield kind, frame
+            if self.ack and rnd.random() < self.ack:
+                counts["ack"] += 1
+                yield "ack", self.ack_frame()
+
+    def stream(self, n):
+        """`n` frames (faults included, ACKs on top) in one bytes object.
+        Returns (data, number of good frames in it)."""
+        parts = []
+        good = 0
+        made = 0
+        for kind, frame in self.frames():
+            if kind != "ack":
+                if made == n:
+                    break
+                made += 1
+                good += kind == "good"
+            parts.append(frame)
+        return b"".join(parts), good
+
+    def timed(self):
+        """Generator of (seconds since start, bytes) at `rate` frames a
+        second. It doesn't sleep; it just says when each chunk is due."""
+        interval = 1.0 / self.rate
+        when = 0.0
+        for kind, frame in self.frames():
+            yield when, frame
+            if kind != "ack":
+                when += interval
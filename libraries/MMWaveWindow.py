@@ -0,0 +1,210 @@
+"""
+Rolling-window statistics over LD2410 frames: min, max, mean and
+variance of every gate energy, the target distances and the energies,
+over the last few hundred frames.
+
+Working that out from a list every frame gets expensive fast. This keeps
+each channel in a fixed ring buffer (an array('B') for energies, an
+array('H') for distances) and updates running sums as values come and go,
+so adding a frame costs the same no matter how long the window is:
+
+    window = sensor.aggregate(window=300, every=10, callback=show)
+    ...
+    def show(window):
+        print(window.summary("detection_cm"))   # (count, min, max, mean, variance)
+
+`every` is the decimation: the callback gets called on every 10th frame,
+not on all of them. Attach as many as you like (say, a short and a long
+one). Without an MMWave, feed it yourself with add(), which takes
+anything with the MMWave/LD2410Report attributes, like the reports from
+MMWaveHub:
+
+    window = RollingWindow(300)
+    hub = SensorHub(callback=lambda sensor_id, report: window.add(report))
+
+Min and max come from a count of how often each value is in the window
+(energies only go up to 100, distances to MAX_LEGIT_DISTANCE), so those
+don't need the window searched either. Memory per RollingWindow is about
+26 * window + 8 KB bytes; 300 frames is under 17 KB.
+
+Missing values (None: gates past the last gate, basic mode, distances
+without a target) aren't counted, so `count` can be less than the window.
+"""
+
+from array import array
+
+from MMWave import LAST_GATE, MAX_LEGIT_DISTANCE, MAX_LEGIT_ENERGY
+
+GATES = LAST_GATE + 1
+
+# The channels, in order: 9 motion gates, 9 static gates, then the targets.
+GATE_CHANNELS = tuple(f"motion_gate_{gate}" for gate in range(GATES)) + \
+                tuple(f"static_gate_{gate}" for gate in range(GATES))
+TARGET_CHANNELS = ("motion_target_cm", "static_target_cm", "detection_cm", "motion_energy", "static_energy")
+CHANNELS = GATE_CHANNELS + TARGET_CHANNELS
+
+
+class Channel():
+
+    """The last `length` values of one number, from 0 to `maximum`, with
+    running count, sum, sum of squares, min and max."""
+
+    def __init__(self, length, maximum):
+        if not 0 < length < 65536:
+            raise ValueError(f"Window length {length} isn't between 1 and 65535")
+        self.maximum = maximum
+
+        # one value above the range marks "nothing here"
+        typecode = "B" if maximum < 255 else "H"
+        self.missing = 255 if typecode == "B" else 65535
+        self.ring = array(typecode, [self.missing]) * length
+        self.histogram = array("H", [0]) * (maximum + 1)  # how often each value is in the ring
+        self.pos = 0
+
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self.min = None
+        self.max = None
+
+    def push(self, value):
+        """Add `value` (None if there isn't one), dropping the oldest."""
+        ring = self.ring
+        pos = self.pos
+        histogram = self.histogram
+        old = ring[pos]
+
+        if value is None or value > self.maximum:
+            ring[pos] = self.missing
+        else:
+            ring[pos] = value
+            self.count += 1
+            self.total += value
+            self.squares += value * value
+            histogram[value] += 1
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+        pos += 1
+        self.pos = pos if pos < len(ring) else 0
+
+        if old == self.missing:
+            return
+        self.count -= 1
+        self.total -= old
+        self.squares -= old * old
+        histogram[old] -= 1
+        if histogram[old]:
+            return
+        # that was the last one of these; if it was the min or max, the
+        # next one is never more than the value range away
+        if not self.count:
+            self.min = self.max = None
+            return
+        if old == self.min:
+            value = old + 1
+            while not histogram[value]:
+                value += 1
+            self.min = value
+        if old == self.max:
+            value = old - 1
+            while not histogram[value]:
+                value -= 1
+            self.max = value
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def variance(self):
+        """Population variance of what's in the window."""
+        count = self.count
+        if not count:
+            return None
+        # all integers up to here, so no rounding trouble
+        return (count * self.squares - self.total * self.total) / (count * count)
+
+    def summary(self):
+        """(count, min, max, mean, variance)"""
+        return (self.count, self.min, self.max, self.mean(), self.variance())
+
+    def clear(self):
+        ring = self.ring
+        for i in range(len(ring)):
+            ring[i] = self.missing
+        histogram = self.histogram
+        for i in range(len(histogram)):
+            histogram[i] = 0
+        self.pos = 0
+        self.count = self.total = self.squares = 0
+        self.min = self.max = None
+
+
+class RollingWindow():
+
+    """Rolling statistics of all CHANNELS over the last `window` frames."""
+
+    def __init__(self, window=300, every=1, callback=None):
+        """Arguments:
+
+        window -- how many frames to keep statistics over
+        every -- call `callback` on every this many frames
+        callback -- called as callback(this RollingWindow), if given
+        """
+        if every < 1:
+            raise ValueError("every has to be at least 1")
+        self.window = window
+        self.every = every
+        self.callback = callback
+
+        self.channels = {}
+        """Channel objects by name."""
+        for name in GATE_CHANNELS:
+            self.channels[name] = Channel(window, MAX_LEGIT_ENERGY)
+        for name in TARGET_CHANNELS:
+            self.channels[name] = Channel(window, MAX_LEGIT_DISTANCE if name.endswith("_cm") else MAX_LEGIT_ENERGY)
+
+        # the same, in order, for add()
+        self._motion_gates = [self.channels[name] for name in GATE_CHANNELS[:GATES]]
+        self._static_gates = [self.channels[name] for name in GATE_CHANNELS[GATES:]]
+        self._targets = [(name, self.channels[name]) for name in TARGET_CHANNELS]
+
+        self.frames = 0
+        """Frames added so far, in total."""
+
+    def add(self, source):
+        """Add one frame, from `source` (an MMWave or an LD2410Report)."""
+        self._add_gates(self._motion_gates, source.gate_motion_energy)
+        self._add_gates(self._static_gates, source.gate_static_energy)
+        for name, channel in self._targets:
+            channel.push(getattr(source, name))
+
+        self.frames += 1
+        if self.callback is not None and not self.frames % self.every:
+            self.callback(self)
+
+    @staticmethod
+    def _add_gates(channels, values):
+        # basic mode has no gates, and past the last gate there's nothing either
+        known = 0 if values is None else min(len(values), GATES)
+        for i in range(known):
+            channels[i].push(values[i])
+        for i in range(known, GATES):
+            channels[i].push(None)
+
+    def summary(self, name):
+        """(count, min, max, mean, variance) of one channel."""
+        return self.channels[name].summary()
+
+    def snapshot(self):
+        """Summaries of every channel, as a dict of dicts."""
+        result = {}
+        for name, channel in self.channels.items():
+            count, low, high, mean, variance = channel.summary()
+            result[name] = {"count": count, "min": low, "max": high, "mean": mean, "variance": variance}
+        return result
+
+    def clear(self):
+        for channel in self.channels.values():
+            channel.clear()
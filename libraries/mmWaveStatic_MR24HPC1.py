@@ -7,9 +7,8 @@ Version Info:
             0.1 basic functionality - reading raw Sensor data. (09.10.2024 - 23:23:00)
             0.1.1 added: data protocol constants (12.10.24 - 02:22:00)
             
-TODO:
-            Build memory optimized version without unnecessary vars and constants for specific models
-            (and without comments)
+Memory optimized version (without comments, docstrings and debug output, constants as const()):
+            python tools/build_lite.py, see there
 
 these library should be able to read (TODO: and write) the raw Sensor-Data of the MR24HPC
 and will be the supporting base for more libraries, working with other mmWave Radars
@@ -56,6 +55,10 @@ for pin-trigger information you can use the 2 extra-pins
             
 """\
 
+import time
+
+from MMWaveFraming import FrameScanner, FrameSpec, sum8
+
 #  ====== GLOBAL VARS AND CONSTANTS ====== #  copied from the seeed library for Arduino
 POSITION_HEAD1 = 0
 POSITION_HEAD2 = 1
@@ -87,6 +90,7 @@ NOBODY = 0x00  #  No one here
 NONE = 0x00  #  Empty Data
 SOMEBODY_STOP = 0x01  #  Somebody stop
 SOMEBODY_MOVE = 0x02  #  Somebody move
+MOTION_NAMES = {NONE: "Noone", SOMEBODY_STOP: "Motionless", SOMEBODY_MOVE: "Active"}
 
 CA_CLOSE = 0x01  #  Someone approaches
 CA_AWAY = 0x02  #  Some people stay away
@@ -138,21 +142,327 @@ you can output information about the presence of the human body
 by customising the judgement of the Human Movement Parameters.
 """
 
-from DataFrame import DataFrame
+MESSAGE_HEAD = bytes([MESSAGE_HEAD1, MESSAGE_HEAD2])
+MESSAGE_END = bytes([MESSAGE_END1, MESSAGE_END2])
+
+MAX_DATA_LENGTH = 64  #  longest data we believe in, the documented frames are all way shorter
+PARSER_BUFFER_SIZE = 256  #  needs to hold at least one whole frame, the rest is slack
+
+
+#  ====== WRITING FRAMES ====== #
+
+### checksum of the frame starting at start in buffer (bytearray/memoryview), with its checksum at end:
+    ### the lower 8 bits of the sum of everything before
+def frameChecksum(buffer, end, start=0):
+    return sum8(buffer, start, end)
+
+### builds a complete frame to send to the sensor, returns it as (immutable) bytes
+def buildFrame(controlWord, commandWord, data=b"\x0f"):
+    length = len(data)
+    if length > MAX_DATA_LENGTH:
+        raise ValueError(f"Frame data of {length} bytes is too long")
+    end = POSITION_DATA + length
+    frame = bytearray(end + LEN_CHECKSUM + LEN_FRAME_END)
+    frame[POSITION_HEAD1] = MESSAGE_HEAD1
+    frame[POSITION_HEAD2] = MESSAGE_HEAD2
+    frame[POSITION_CONTROL_WORD] = controlWord
+    frame[POSITION_COMMAND_WORD] = commandWord
+    frame[POSITION_LENGTH1] = length >> 8
+    frame[POSITION_LENGTH2] = length & 0xFF
+    frame[POSITION_DATA:end] = data
+    frame[end] = frameChecksum(frame, end)
+    frame[POSITION_FRAMEEND1] = MESSAGE_END1
+    frame[POSITION_FRAMEEND2] = MESSAGE_END2
+    return bytes(frame)
+
+#  queries (and the reset) never change, so they're built once here and sending one is just a uart.write().
+#  queries are the command word | 0x80 with 0x0F as data, the answer comes back as a normal frame
+#  (see HANDLERS), with the same control and command word
+QUERY_FRAMES = {
+    "heartbeat": buildFrame(0x01, 0x01),
+    "reset": buildFrame(0x01, 0x02),
+    "product_model": buildFrame(0x02, 0xA1),
+    "product_id": buildFrame(0x02, 0xA2),
+    "hardware_model": buildFrame(0x02, 0xA3),
+    "firmware_version": buildFrame(0x02, 0xA4),
+    "initialized": buildFrame(0x05, 0x81),
+    "scene": buildFrame(0x05, 0x87),
+    "sensitivity": buildFrame(0x05, 0x88),
+    "occupied": buildFrame(HUMANSTATUS, 0x81),
+    "motion": buildFrame(HUMANSTATUS, 0x82),
+    "body_movement": buildFrame(HUMANSTATUS, 0x83),
+    "unoccupied_time": buildFrame(HUMANSTATUS, 0x8A),
+    "movement_trend": buildFrame(HUMANSTATUS, 0x8B),
+    "open_function": buildFrame(DETAILSTATUS, 0x80),
+    "existence_energy": buildFrame(DETAILSTATUS, 0x81),
+    "motion_energy": buildFrame(DETAILSTATUS, 0x82),
+    "static_distance": buildFrame(DETAILSTATUS, 0x83),
+    "motion_distance": buildFrame(DETAILSTATUS, 0x84),
+    "motion_speed": buildFrame(DETAILSTATUS, 0x85),
+}
+
+
+class MR24FrameParser(FrameScanner):
+    
+    """Incremental parser for MR24HPC1 frames, on the same scanner as MMWave.FrameParser
+    (MMWaveFraming, so that file needs to be on the board too).
+    
+    Feed it bytes in whatever chunks they come and it gives back every
+    complete frame with a good checksum and end of frame, keeping partial
+    frames around until the rest shows up. Frames with a bad checksum or
+    end are counted in `bad_checksums` / `bad_ends` and skipped.
+    """
+    
+    def __init__(self, max_length=MAX_DATA_LENGTH, size=PARSER_BUFFER_SIZE):
+        super().__init__(FrameSpec(MESSAGE_HEAD, MESSAGE_END, POSITION_LENGTH1, max_length, byteorder="big",
+                                   checksum=sum8, checksum_size=LEN_CHECKSUM), size)
+    
+    @property
+    def bad_ends(self):
+        return self.bad_footers
+    
+    def frame(self, offset):
+        ### (control word, command word, data as bytes) of the frame with its data at offset (from next_frame())
+        start = offset - POSITION_DATA
+        return (self.buffer[start + POSITION_CONTROL_WORD], self.buffer[start + POSITION_COMMAND_WORD], self.data(offset))
+    
+    def feed(self, data):
+        ### adds data, returns a list of (control word, command word, data) for every frame it completes
+        return [self.frame(offset) for _start, offset, _length in self.feed_offsets(data)]
+
+
+class MR24State():
+    
+    """Everything the sensor has told us so far. There's one of these per
+    MR24, made once, and the frame handlers (see HANDLERS) update it in
+    place. None means the sensor hasn't said yet.
+    """
+    
+    __slots__ = ("heartbeat", "initialized", "product_model", "product_id", "hardware_model", "firmware_version",
+                 "scene", "sensitivity", "occupied", "motion", "body_movement", "unoccupied_time", "movement_trend",
+                 "open_function", "existence_energy", "static_distance", "motion_energy", "motion_distance",
+                 "motion_speed", "body_sign", "updated")
+    
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+    
+    ### the old humanPresenceInformation() result: (occupied, "Motionless"/"Moving"/None, body movement parameter)
+    def presence(self):
+        body_movement = self.body_movement or 0
+        if body_movement > 5:
+            moving = "Moving"
+        elif body_movement > 0:
+            moving = "Motionless"
+        else:
+            moving = None
+        occupied = body_movement > 0 if self.occupied is None else self.occupied
+        return (occupied, moving, body_movement)
+
+
+#  what on_change() can watch: everything in MR24State except the timestamp
+WATCHABLE_FIELDS = tuple(name for name in MR24State.__slots__ if name != "updated")
+
+
+#  ====== FRAME HANDLERS ====== #
+#  each one gets the MR24State and the frame data, updates the state and returns something
+#  for readDataFromBuffer() to hand back (only the human presence ones do, the rest return None).
+#  if the data is too short for what it reads, it returns MALFORMED instead and leaves the state alone
+
+MALFORMED = object()
+
+def _text(data):
+    try:
+        return bytes(data).decode()
+    except UnicodeError:
+        return bytes(data)
+
+def _heartbeat(state, data):
+    state.heartbeat = time.monotonic()
+
+def _initialized(state, data):
+    state.initialized = True
+
+def _initializedAnswer(state, data):
+    #  the answer to the query says 0x01 done or 0x00 not yet, the report only comes when it's done
+    if len(data) < 1:
+        return MALFORMED
+    state.initialized = data[0] == 0x01
+
+def _productModel(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.product_model = _text(data)
+
+def _productId(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.product_id = _text(data)
+
+def _hardwareModel(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.hardware_model = _text(data)
+
+def _firmwareVersion(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.firmware_version = _text(data)
+
+def _scene(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.scene = data[0]
+
+def _sensitivity(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.sensitivity = data[0]
+
+def _occupied(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.occupied = data[0] == SOMEBODY
+    return state.presence()
+
+def _motion(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    #  NONE, SOMEBODY_STOP or SOMEBODY_MOVE
+    state.motion = data[0]
+    return state.presence()
+
+def _bodyMovement(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    #  0 nobody, 1-5 somebody stationary, above that moving (see text on top)
+    state.body_movement = data[0]
+    return state.presence()
+
+def _unoccupiedTime(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.unoccupied_time = data[0]
+
+def _movementTrend(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    #  NONE, CA_CLOSE or CA_AWAY
+    state.movement_trend = data[0]
+    return state.presence()
+
+def _openFunction(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.open_function = data[0] == 0x01
+
+def _openFunctionReport(state, data):
+    if len(data) < 5:
+        return MALFORMED
+    #  the underlying open function sends all of these at once. distances are in 0.5m steps,
+    #  speed is 0x0A for standing still, less for approaching, more for moving away (0.5m/s steps)
+    state.existence_energy = data[0]
+    state.static_distance = data[1]
+    state.motion_energy = data[2]
+    state.motion_distance = data[3]
+    state.motion_speed = data[4]
+
+def _existenceEnergy(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.existence_energy = data[0]
+
+def _motionEnergy(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.motion_energy = data[0]
+
+def _staticDistance(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.static_distance = data[0]
+
+def _motionDistance(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.motion_distance = data[0]
+
+def _motionSpeed(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.motion_speed = data[0]
+
+def _bodySign(state, data):
+    if len(data) < 1:
+        return MALFORMED
+    state.body_sign = data[0]
+
+
+#  (control word, command word) -> (name for debug output, handler). reports and the answers to
+#  queries (command word | 0x80) end up in the same place. to handle more, add to this (or to
+#  MR24.handlers for one sensor), the parser doesn't need to know
+HANDLERS = {
+    (0x01, 0x01): ("heartbeat", _heartbeat),
+    (0x02, 0xA1): ("product model", _productModel),
+    (0x02, 0xA2): ("product id", _productId),
+    (0x02, 0xA3): ("hardware model", _hardwareModel),
+    (0x02, 0xA4): ("firmware version", _firmwareVersion),
+    (0x05, 0x01): ("initialization complete", _initialized),
+    (0x05, 0x81): ("initialization complete", _initializedAnswer),
+    (0x05, 0x07): ("scene", _scene),
+    (0x05, 0x87): ("scene", _scene),
+    (0x05, 0x08): ("sensitivity", _sensitivity),
+    (0x05, 0x88): ("sensitivity", _sensitivity),
+    (HUMANSTATUS, HUMANEXIST): ("presence information", _occupied),
+    (HUMANSTATUS, 0x81): ("presence information", _occupied),
+    (HUMANSTATUS, MANMOVE): ("motion information", _motion),
+    (HUMANSTATUS, 0x82): ("motion information", _motion),
+    (HUMANSTATUS, HUMANSIGN): ("body movement information", _bodyMovement),
+    (HUMANSTATUS, 0x83): ("body movement information", _bodyMovement),
+    (HUMANSTATUS, 0x0A): ("time for entering no person state", _unoccupiedTime),
+    (HUMANSTATUS, 0x8A): ("time for entering no person state", _unoccupiedTime),
+    (HUMANSTATUS, HUMANDIRECT): ("movement trend", _movementTrend),
+    (HUMANSTATUS, 0x8B): ("movement trend", _movementTrend),
+    (DETAILSTATUS, 0x00): ("underlying open function switch", _openFunction),
+    (DETAILSTATUS, 0x80): ("underlying open function switch", _openFunction),
+    (DETAILSTATUS, DETAILINFO): ("underlying open function report", _openFunctionReport),
+    (DETAILSTATUS, 0x81): ("existence energy", _existenceEnergy),
+    (DETAILSTATUS, 0x82): ("motion energy", _motionEnergy),
+    (DETAILSTATUS, 0x83): ("static distance", _staticDistance),
+    (DETAILSTATUS, 0x84): ("motion distance", _motionDistance),
+    (DETAILSTATUS, 0x85): ("motion speed", _motionSpeed),
+    (DETAILSTATUS, DETAILDIRECT): ("movement trend", _movementTrend),
+    (DETAILSTATUS, DETAILSIGN): ("body signs", _bodySign),
+}
+
 
 class MR24():
     
     ###  Reset data frame
-    reset_frame = bytes([0x53, 0x59, 0x01, 0x02, 0x00, 0x01, 0x0F, 0xBF, 0x54, 0x43])
+    reset_frame = QUERY_FRAMES["reset"]
 
-    def __init__(self, uart, maxBufferSize=None, verbose=True):
+    def __init__(self, uart, maxBufferSize=None, verbose=True, stats=False):
         #  DEBUG MODE
         self.debugMode = verbose
         
+        #  counters (see stats()), only if asked for
+        self._stats = None
+        if stats:
+            self.enable_stats()
+        
         self.uart = uart
         self.maxbuffersize = maxBufferSize
+        self._parser = MR24FrameParser()  #  keeps partial frames between reads
+        self._pendingFrames = []  #  frames parsed but not handed out yet
         
-        ### Initialize Control-Word Dictionary (TODO: Necessary?)
+        self.state = MR24State()  #  what the sensor told us, see MR24State
+        self.handlers = dict(HANDLERS)  #  add (controlWord, commandWord): (name, handler) to handle more
+        self.unknownFrames = 0  #  frames we have no handler for
+        self.malformedFrames = 0  #  frames too short for their handler
+        self._events = None  #  see on_change()
+        self._reader = None  #  see start()
+        
+        ### Initialize Control-Word Dictionary (for debug output)
         self.control_words = {0x01:"Heartbeat",
                      0x02:"product information",
                      0x03:"UART upgrade",
@@ -165,28 +475,129 @@ class MR24():
                              0x03:"body movement information"}
         
     
+    ### start keeping counters, debug messages go to log (print works) if given. needs MMWaveStats
+    def enable_stats(self, log=None):
+        from MMWaveStats import Stats
+        self._stats = Stats(log)
+        return self._stats
+    
+    def disable_stats(self):
+        self._stats = None
+    
+    ### dict of the counters (bytes_read, frames, presence_reports, bytes_discarded, bad_checksums, bad_ends, unknown_frames,
+        ### malformed_frames), or None if they're off
+    def stats(self):
+        if self._stats is None:
+            return None
+        result = self._stats.snapshot()
+        result["bytes_discarded"] = self._parser.discarded
+        result["bad_checksums"] = self._parser.bad_checksums
+        result["bad_ends"] = self._parser.bad_ends
+        result["unknown_frames"] = self.unknownFrames
+        result["malformed_frames"] = self.malformedFrames
+        return result
+    
+    ### call callback(field, old, new) whenever one of the MR24State fields (a name, or a tuple of them) really changes
+        ### hysteresis: how far a number has to move from the last reported value to count, for all the fields
+        ### or as a dict of field -> threshold. fields that aren't numbers (occupied, the texts) ignore it
+        ### debounce: seconds a change has to last before it's reported
+        ### returns a list of Subscriptions, cancel() them to stop. needs MMWaveEvents (see there for details)
+    def on_change(self, fields, callback, hysteresis=0, debounce=0):
+        if self._events is None:
+            from MMWaveEvents import ChangeWatcher
+            self._events = ChangeWatcher(WATCHABLE_FIELDS)
+        return self._events.subscribe(self.state, fields, callback, hysteresis, debounce)
+    
+    ### start reading in a background thread, which keeps the uart drained and the newest presence result in latest()
+        ### callback(result), if given, is called (in that thread) for every one. the thread updates `state` as frames come in,
+        ### so don't call readDataFromBuffer()/readFrames() until stop(). sending is fine, the answers end up in state. needs threads and MMWaveReader
+    def start(self, callback=None):
+        if self._reader is not None and self._reader.running:
+            raise RuntimeError("Already started")
+        from MMWaveReader import BackgroundReader
+        self._reader = BackgroundReader(self._pollResults, callback, name="mr24-reader").start()
+        return self._reader
+    
+    ### presence results of every frame that's come in (often none)
+    def _pollResults(self):
+        results = []
+        if self.uart.in_waiting == 0 and not self._pendingFrames:
+            return results
+        for frame in self.readFrames(maxFrames=None):
+            result = self.handleFrame(*frame)
+            if result is not None:
+                results.append(result)
+        return results
+    
+    ### the newest presence result (see humanPresenceInformation) from the background reader, or None. never blocks
+    def latest(self):
+        if self._reader is None:
+            return None
+        return self._reader.latest()
+    
+    ### results the background reader replaced before latest() got them
+    @property
+    def dropped(self):
+        return 0 if self._reader is None else self._reader.dropped
+    
+    ### stop the background reader, False if it didn't finish in time
+    def stop(self):
+        if self._reader is None:
+            return True
+        return self._reader.stop()
+    
     ### reads sensor-data raw from current uart connection
         ### readAllData=False (if readAllData=True this will read the whole buffer if False it will
         ### read just the maxBufferSize
     def readRawData(self):
-        if maxBufferSize is None:
-            return self.uart.read(self.uart_in_waiting)
+        if self.maxbuffersize is None:
+            return self.uart.read(self.uart.in_waiting)
         else:
             return self.uart.read(self.maxbuffersize)
     
+    ### checksum of a frame from its parts (frame_header and length_identifier are 2 bytes each, as ints
+        ### or bytes), see buildFrame() for getting the whole frame
     def calculateChecksum(self, frame_header, control_word, command_word, length_identifier, data):
-        # TODO: Calculate that fucking checksum for fucks sake
-        
-        print(frame_header, control_word, command_word, length_identifier, data)
         # Summe aller Bytes
-        total_sum = frame_header + control_word + command_word + length_identifier + sum(data)
-    
+        total_sum = control_word + command_word + sum(data)
+        for part in (frame_header, length_identifier):
+            if isinstance(part, int):
+                total_sum += (part >> 8) + (part & 0xFF)
+            else:
+                total_sum += sum(part)
+        
         # Extrahieren der unteren 8 Bits (1 Byte) aus der Summe
-        checksum = total_sum & 0xFF  # 0xFF ist eine Maske, um die unteren 8 Bits zu erhalten
+        return total_sum & 0xFF  # 0xFF ist eine Maske, um die unteren 8 Bits zu erhalten
+    
+    ### writes a ready-made frame (like the ones in QUERY_FRAMES) to the sensor
+    def sendFrame(self, frame):
+        if self._stats is not None:
+            self._stats.count("frames_sent")
+        return self.uart.write(frame)
+    
+    ### asks the sensor for something, the answer ends up in self.state once it's read. what is a key of QUERY_FRAMES
+    def query(self, what):
+        return self.sendFrame(QUERY_FRAMES[what])
     
-        print(checksum)
+    ### sends a setting (or any other frame), building the frame first
+    def sendCommand(self, controlWord, commandWord, data):
+        return self.sendFrame(buildFrame(controlWord, commandWord, data))
     
-        return checksum
+    ### restarts the sensor
+    def reset(self):
+        return self.sendFrame(self.reset_frame)
+    
+    ### scene mode: 1 living room, 2 bedroom, 3 bathroom, 4 area detection
+    def setScene(self, scene):
+        return self.sendCommand(0x05, 0x07, bytes([scene]))
+    
+    ### sensitivity: 1-3
+    def setSensitivity(self, sensitivity):
+        return self.sendCommand(0x05, 0x08, bytes([sensitivity]))
+    
+    ### switches the underlying open function (the 0x08 reports with energies and distances) on or off
+    def setOpenFunction(self, on=True):
+        return self.sendCommand(DETAILSTATUS, 0x00, b"\x01" if on else b"\x00")
     
     ### prints sensor raw data to console
     def printRawData(self):
@@ -194,98 +605,125 @@ class MR24():
         print("sensor raw data: ")
         print(self.readRawData())
     
-    ### reads human presence data, is called if control_word is 0x80
+    ### reads human presence data (control_word 0x80), returns (IsOccupied, IsMoving, BodyMovementParam)
     def humanPresenceInformation(self, commandWord, commandData):
-        self.IsOccupied = False
-        self.IsMoving = None
-        self.BodyMovementParam = 0
-        
-        #  body movement information
-        if commandWord == 0x03:
-            self.BodyMovementParam = int.from_bytes(commandData, 'little')
-            if self.BodyMovementParam == 0:
-                pass
-            if 0 < self.BodyMovementParam <=5:
-                self.IsOccupied = True
-                self.IsMoving = "Motionless"
-            elif self.BodyMovementParam > 5:
-                self.IsOccupied = True
-                self.IsMoving = "Moving"
-        #  motion information
-        elif commandWord == 0x02:
-            if commandData == 0x00:
-                self.Moving = "Noone"
-            elif commandData == 0x01:
-                self.Moving = "Motionless"
-            elif commandData == 0x02:
-                self.Moving = "Active"
-        #  presence information
-        elif commandWord == 0x01:
-            self.IsOccupied = int.from_bytes(commandData,'little') > 0
-        
-        return (self.IsOccupied, self.IsMoving, self.BodyMovementParam)
+        return self.handleFrame(HUMANSTATUS, commandWord, commandData)
     
-    ### Read data frames from buffer
-    def readFrames(self, maxFrames=100):
-        
+    ### the old attributes, straight from the state
+    @property
+    def IsOccupied(self):
+        return self.state.presence()[0]
+    
+    @property
+    def IsMoving(self):
+        return self.state.presence()[1]
+    
+    @property
+    def BodyMovementParam(self):
+        return self.state.presence()[2]
+    
+    @property
+    def Moving(self):
+        return MOTION_NAMES.get(self.state.motion)
+    
+    ### reads everything waiting into the parser, returns how many bytes that was
+    def _readIntoParser(self):
+        waiting = self.uart.in_waiting
+        total = 0
+        while waiting > 0:
+            n = self._parser.readfrom(self.uart, waiting)
+            if not n:
+                break
+            total += n
+            waiting -= n
+            if waiting > 0:
+                #  more than fits in the buffer, so make room
+                self._pendingFrames.extend(self._bufferedFrames())
+        if self._stats is not None:
+            self._stats.count("bytes_read", total)
+        return total
+    
+    ### frames completed by what's in the parser so far
+    def _bufferedFrames(self):
         frames = []
-        frame = []
-        
-        if self.uart.in_waiting == 0:
-            return None
-        
-        data = readRawData()
-        
-        for pos in range(len(data)):
-            if data[pos] == 0x53 and data[pos + POSITION_HEAD2] == 0x59:
-                frame = [data[pos], data[pos+1]]
-                pos += 1
-                continue
-            
-                # found frame start
-                
+        parser = self._parser
+        while True:
+            offset = parser.next_frame()
+            if offset < 0:
+                return frames
+            frames.append(parser.frame(offset))
+    
+    ### Read data frames from buffer, returns a list of (controlWord, commandWord, data) tuples, oldest first
+        ### (every complete frame with a good checksum, partial frames are kept for the next call)
+        ### frames beyond maxFrames are kept for the next call too, maxFrames=None returns them all
+    def readFrames(self, maxFrames=100):
+        self._readIntoParser()
+        frames = self._pendingFrames
+        frames.extend(self._bufferedFrames())
+        if maxFrames is None or len(frames) <= maxFrames:
+            self._pendingFrames = []
+            return frames
+        self._pendingFrames = frames[maxFrames:]
+        return frames[:maxFrames]
     
-    ### reads data from buffer of serial device (mmWave Sensor), maxlen determined by buffer
+    ### reads data from buffer of serial device (mmWave Sensor) and handles every frame in it
+        ### returns the result of the latest human presence frame (see humanPresenceInformation), or None if there wasn't one
+        ### (maxFrames is ignored, it's there so old code keeps working)
     def readDataFromBuffer(self, maxFrames=1):
         
-        if self.uart.in_waiting == 0:
-            return None 
+        if self.uart.in_waiting == 0 and not self._pendingFrames:
+            return None
         
-        data = bytes(self.uart.read(self.uart.in_waiting))
+        result = None
+        for controlWord, commandWord, data in self.readFrames(maxFrames=None):
+            frameResult = self.handleFrame(controlWord, commandWord, data)
+            if frameResult is not None:
+                result = frameResult
+        return result
+    
+    ### parses data read from the sensor, no matter where it came from (used by the async driver)
+        ### frames split between calls are put back together. returns like readDataFromBuffer
+    def parseData(self, data):
         
         if self.debugMode:
             print("readDataFromBuffer: ", data)
         
-        # TODO: check if we need to limit buffersize
-        for pos in range(len(data)):
-            #  for information about the data frame structure, check text on top
-            if data[pos] == MESSAGE_HEAD1 and data[pos+1] == MESSAGE_HEAD2:
-                #  Frame starts here
-                self.frameHeader = (data[pos],data[pos+1])
-                pos += LEN_FRAME_HEADER #  setting current position beyond header
-                self.controlWord = data[pos] #  setting controlWord
-                pos += LEN_CONTROL_WORD  #  setting current position beyond control word
-                self.commandWord = data[pos] #  setting command word
-                pos += LEN_COMMAND_WORD  #  pos beyond command word
-                self.lengthIdentifier1 = data[pos] # setting length
-                pos += LEN_LENGTH_IDENTIFIER # move forward
-                self.lengthIdentifier2 = data[pos] #  setting length 2
-                pos += LEN_LENGTH_IDENTIFIER # move forward
-                # frame data is next, the length of the data is determined by
-                # lengthIdentifier2 (which is byte #6)
-                self.frameData = data[pos:pos+self.lengthIdentifier2]
-                pos += self.lengthIdentifier2 # setting currentPos beyond data
-                # we ignore checksum, end of frame 1 and 2... cause i'm too dumb to calculate first and too lazy to check the latter
-                pos += 3
-                
-                # todo: whats with the next frames?!
-                
-                #  check for control-word and react
-                #  TODO: Put in extra function
-                #  TODO: Check if class separation is better (classes for each controlWord/commandWord?)
-                if self.debugMode:
-                    print(f"\t...controlWord: {self.controlWord}({self.control_words[self.controlWord]})")
-                if self.controlWord == 0x80:
-                    if self.debugMode:
-                        print(f"\t...humanPresenceInformation: {self.commandWord}({self.command_words[self.commandWord]}) - data: {self.frameData}")
-                    return self.humanPresenceInformation(self.commandWord, self.frameData)
\ No newline at end of file
+        result = None
+        for controlWord, commandWord, frameData in self._parser.feed(data):
+            frameResult = self.handleFrame(controlWord, commandWord, frameData)
+            if frameResult is not None:
+                result = frameResult
+        return result
+    
+    ### handles one frame, returns the result of humanPresenceInformation for 0x80 frames, None for others
+    def handleFrame(self, controlWord, commandWord, data):
+        if self._stats is not None:
+            self._stats.count("frames")
+        self.frameHeader = (MESSAGE_HEAD1, MESSAGE_HEAD2)
+        self.controlWord = controlWord
+        self.commandWord = commandWord
+        self.lengthIdentifier1 = len(data) >> 8
+        self.lengthIdentifier2 = len(data) & 0xFF
+        self.frameData = data
+        
+        handler = self.handlers.get((controlWord, commandWord))
+        if handler is None:
+            self.unknownFrames += 1
+            if self.debugMode:
+                print(f"\t...unknown frame: {controlWord:#04x} {commandWord:#04x} - data: {data}")
+            return None
+        if self.debugMode:
+            print(f"\t...{self.control_words.get(controlWord)}: {handler[0]} - data: {data}")
+        result = handler[1](self.state, data)
+        if result is MALFORMED:
+            #  too short for what it says it is, so it's mangled
+            self.malformedFrames += 1
+            if self.debugMode:
+                print("\t...too short, skipped")
+            return None
+        now = self.state.updated = time.monotonic()
+        if self._events is not None:
+            self._events.update(self.state, now)
+        if result is not None and self._stats is not None:
+            self._stats.count("presence_reports")
+        return result
\ No newline at end of file
@@ -0,0 +1,95 @@
+import array
+import fcntl
+import os
+import select
+import struct
+import sys
+import termios
+import time
+
+import pytest
+
+# the libraries are flat modules meant to be copied onto a board, not a
+# package, so the tests import them the way the benchmarks do
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "libraries"))
+
+
+# termios2, to set any speed on a tty (Linux), like pyserial does
+TCGETS2 = getattr(termios, "TCGETS2", 0x802C542A)
+TCSETS2 = getattr(termios, "TCSETS2", 0x402C542B)
+BOTHER = getattr(termios, "BOTHER", 0o010000)
+CBAUD = getattr(termios, "CBAUD", 0o010017)
+TERMIOS2_CFLAG = 2
+TERMIOS2_ISPEED = 9
+TERMIOS2_OSPEED = 10
+
+
+class TtyPort():
+
+    """Just enough of pyserial's Serial for the drivers, on a tty (like
+    an emulator's pty), so the tests don't need pyserial."""
+
+    def __init__(self, path, timeout=0.5, baudrate=None):
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        self.timeout = timeout
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    @property
+    def baudrate(self):
+        attributes = array.array("i", [0] * 64)
+        fcntl.ioctl(self.fd, TCGETS2, attributes)
+        return attributes[TERMIOS2_ISPEED]
+
+    @baudrate.setter
+    def baudrate(self, baudrate):
+        attributes = array.array("i", [0] * 64)
+        fcntl.ioctl(self.fd, TCGETS2, attributes)
+        attributes[TERMIOS2_CFLAG] = (attributes[TERMIOS2_CFLAG] & ~CBAUD) | BOTHER
+        attributes[TERMIOS2_ISPEED] = attributes[TERMIOS2_OSPEED] = baudrate
+        fcntl.ioctl(self.fd, TCSETS2, attributes)
+
+    @property
+    def in_waiting(self):
+        return struct.unpack("i", fcntl.ioctl(self.fd, termios.FIONREAD, b"\0\0\0\0"))[0]
+
+    def read(self, nbytes=1):
+        data = b""
+        end = None if self.timeout is None else time.monotonic() + self.timeout
+        while len(data) < nbytes:
+            left = None if end is None else end - time.monotonic()
+            if left is not None and left <= 0 or not select.select([self.fd], [], [], left)[0]:
+                break
+            data += os.read(self.fd, nbytes - len(data))
+        return data
+
+    def write(self, buffer):
+        return os.write(self.fd, buffer)
+
+    def reset_input_buffer(self):
+        termios.tcflush(self.fd, termios.TCIFLUSH)
+
+    def close(self):
+        os.close(self.fd)
+
+
+@pytest.fixture
+def emulated():
+    """Start an emulator and open a TtyPort on it: emulated(emulator,
+    **port_kwargs) returns the port. Both are closed after the test."""
+    started = []
+
+    def start(emulator, **kwargs):
+        emulator.start()
+        started.append(emulator)
+        port = TtyPort(emulator.path, **kwargs)
+        started.append(port)
+        return port
+
+    yield start
+    for thing in reversed(started):
+        if isinstance(thing, TtyPort):
+            thing.close()
+        else:
+            thing.stop()
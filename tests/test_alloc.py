@@ -0,0 +1,102 @@
+"""
+MMWave.read() in steady state: once it's warmed up, a read must not make
+anything that stays, and must not make anything that goes away again
+either, other than the few objects CPython can't do without.
+
+Two checks, for every read after the warm-up:
+
+- the peak of tracemalloc's traced memory during the read, over what was
+  there before it. The port below allocates nothing, so all of that is
+  MMWave.py and MMWaveFraming.py. What's allowed is PEAK_LIMIT.
+- a snapshot comparison filtered to MMWave.py and MMWaveFraming.py: no
+  line in them may have more blocks or bytes than before the reads.
+"""
+
+import struct
+import tracemalloc
+
+import MMWave
+import MMWaveFraming
+from MMWaveSynth import FrameSource
+
+LOOP_FRAMES = 500
+"""Frames in the stream the port goes round and round. Reading a multiple
+of this leaves the sensor holding the same values as before."""
+
+WARMUP = LOOP_FRAMES
+"""Frames to read before measuring: the parser buffer, the gate lists
+and everything the first reads set up are there after that."""
+
+PEAK_LIMIT = 320
+"""Bytes a read may have allocated at once. On CPython, that's the
+memoryview slice the parser hands to readinto() (200 bytes) and the float
+from time.time() and the ints over 256 (distances), which never live
+longer than the read. Anything else, like a bytes(64) in _decode(), goes
+over it."""
+
+
+class LoopPort():
+
+    """A port with readinto() which hands out the same stream over and
+    over, in `chunk` sized pieces, without allocating anything itself."""
+
+    def __init__(self, data, chunk=64):
+        # struct.pack_into() copies into the buffer without a slice of it
+        self.chunks = []
+        for at in range(0, len(data), chunk):
+            piece = bytes(data[at:at + chunk])
+            self.chunks.append((struct.Struct(f"{len(piece)}s"), piece))
+        self.index = 0
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[self.index][1])
+
+    def readinto(self, buffer):
+        packer, piece = self.chunks[self.index]
+        packer.pack_into(buffer, 0, piece)
+        self.index += 1
+        if self.index == len(self.chunks):
+            self.index = 0
+        return packer.size
+
+    def read(self, nbytes=1):
+        raise AssertionError("read() shouldn't be used when there's readinto()")
+
+    def write(self, buffer):
+        return len(buffer)
+
+
+def library_filters():
+    return [tracemalloc.Filter(True, MMWave.__file__), tracemalloc.Filter(True, MMWaveFraming.__file__)]
+
+
+def test_read_allocates_nothing_after_warmup():
+    data, _ = FrameSource("ld2410", seed=1).stream(LOOP_FRAMES)
+    sensor = MMWave.MMWave(LoopPort(data), engineering_always=False, doNotRead=True)
+
+    peaks = []
+    reads = []
+    tracemalloc.start(1)
+    try:
+        # warm up while tracing too, so that the values the sensor holds on
+        # to were made under tracemalloc both times
+        for _ in range(WARMUP):
+            assert sensor.read()
+        before = tracemalloc.take_snapshot().filter_traces(library_filters())
+        for _ in range(2 * LOOP_FRAMES):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            # not an assert: pytest's rewritten ones allocate
+            read = sensor.read()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            reads.append(read)
+        after = tracemalloc.take_snapshot().filter_traces(library_filters())
+    finally:
+        tracemalloc.stop()
+
+    assert all(reads)
+    grown = [str(stat) for stat in after.compare_to(before, "lineno") if stat.size_diff > 0 or stat.count_diff > 0]
+    assert not grown, "read() left things behind:\n" + "\n".join(grown)
+    assert max(peaks) <= PEAK_LIMIT, \
+        f"a read() allocated up to {max(peaks)} bytes at once, more than {PEAK_LIMIT}"
@@ -0,0 +1,26 @@
+import pytest
+
+from MMWaveAsync import AsyncMMWave, AsyncMR24
+
+
+@pytest.mark.parametrize("call", [
+    lambda sensor: sensor.frames(),
+    lambda sensor: sensor.start(),
+    lambda sensor: sensor.negotiate_baud(),
+    lambda sensor: sensor.probe_baud(),
+    lambda sensor: sensor.readRawData(4),
+])
+def test_mmwave_blocking_methods_raise(call):
+    with pytest.raises(TypeError):
+        call(AsyncMMWave(None, None))
+
+
+@pytest.mark.parametrize("call", [
+    lambda sensor: sensor.start(),
+    lambda sensor: sensor.readFrames(),
+    lambda sensor: sensor.readRawData(),
+    lambda sensor: sensor.printRawData(),
+])
+def test_mr24_blocking_methods_raise(call):
+    with pytest.raises(TypeError):
+        call(AsyncMR24(None, None))
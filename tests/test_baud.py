@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+import MMWave
+from MMWaveEmulator import LD2410_BAUD, LD2410Emulator
+
+# short enough to keep this quick, at the emulator's 50 frames a second
+FAST = dict(frames=10, timeout=1.0, probe_timeout=0.3)
+
+
+def negotiate(emulated, port_baudrate=LD2410_BAUD, **faults):
+    emulator = LD2410Emulator(seed=3, rate=50, check_baud=True, **faults)
+    port = emulated(emulator, timeout=0.2, baudrate=port_baudrate)
+    sensor = MMWave.MMWave(port, doNotRead=True, stats=True)
+    started = time.monotonic()
+    baud = sensor.negotiate_baud(**FAST)
+    return sensor, emulator, port, baud, time.monotonic() - started
+
+
+def reads(sensor):
+    return sum(sensor.read() for _ in range(10))
+
+
+def test_switches_up_on_a_clean_line(emulated):
+    sensor, emulator, port, baud, _ = negotiate(emulated)
+    assert baud == 460800
+    assert emulator.baudrate == port.baudrate == 460800
+    assert not sensor.stats().get("baud_fallbacks")
+    assert reads(sensor) == 10
+
+
+def test_finds_the_sensor_first(emulated):
+    sensor, emulator, port, baud, _ = negotiate(emulated, port_baudrate=9600)
+    assert baud == emulator.baudrate == port.baudrate == 460800
+
+
+def test_falls_back_on_a_lossy_line(emulated):
+    sensor, emulator, port, baud, seconds = negotiate(
+        emulated, max_clean_baudrate=LD2410_BAUD, byte_error_rate=0.01)
+    assert baud == LD2410_BAUD
+    assert emulator.baudrate == port.baudrate == LD2410_BAUD
+    assert sensor.stats()["baud_fallbacks"] == 1
+    assert emulator.garbled
+    assert reads(sensor) == 10
+    assert seconds < 10
+
+
+def test_no_baudrate_on_the_port():
+    class Port():
+        def write(self, buffer):
+            return len(buffer)
+
+    with pytest.raises(ValueError):
+        MMWave.MMWave(Port(), doNotRead=True).negotiate_baud()
@@ -0,0 +1,56 @@
+import MMWave
+from MMWaveCapture import CaptureRecorder, ReplayPort
+from MMWaveSynth import FrameSource
+
+
+class StreamPort():
+
+    """A pyserial-like port handing out `data`, which remembers the
+    timeout every read was made with."""
+
+    def __init__(self, data, chunk=64):
+        self.data = bytes(data)
+        self.pos = 0
+        self.chunk = chunk
+        self.timeout = 1.0
+        self.baudrate = MMWave.DEFAULT_BAUD
+        self.timeouts = []
+
+    @property
+    def in_waiting(self):
+        return min(self.chunk, len(self.data) - self.pos)
+
+    def read(self, nbytes=1):
+        self.timeouts.append(self.timeout)
+        data = self.data[self.pos:self.pos + min(nbytes, self.chunk)]
+        self.pos += len(data)
+        return data
+
+    def write(self, buffer):
+        return len(buffer)
+
+
+def test_recorder_passes_settings_through(tmp_path):
+    data, _ = FrameSource("ld2410", seed=1).stream(20)
+    port = StreamPort(data)
+    path = str(tmp_path / "capture.bin")
+
+    with CaptureRecorder(port, path) as recorder:
+        sensor = MMWave.MMWave(recorder, engineering_always=False, doNotRead=True)
+        for _ in range(10):
+            assert sensor.read(deadline=0.5)
+        # the deadline cut the port's own timeout, and put it back after
+        assert port.timeouts and max(port.timeouts) <= 0.5
+        assert port.timeout == 1.0
+
+        recorder.baudrate = 115200
+        assert port.baudrate == 115200
+        assert recorder.baudrate == 115200
+        assert "timeout" not in vars(recorder)
+        assert "baudrate" not in vars(recorder)
+
+    replay = ReplayPort(path)
+    try:
+        assert replay.read(port.pos) == data[:port.pos]
+    finally:
+        replay.close()
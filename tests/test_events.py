@@ -0,0 +1,56 @@
+import pytest
+
+from MMWaveEvents import ChangeWatcher
+
+FIELDS = ("detected", "detection_cm", "motion_energy", "name")
+
+
+class Source():
+
+    def __init__(self):
+        self.detected = False
+        self.detection_cm = 100
+        self.motion_energy = 50
+        self.name = None
+
+
+def watch(hysteresis):
+    source = Source()
+    watcher = ChangeWatcher(FIELDS)
+    seen = []
+    watcher.subscribe(source, FIELDS, lambda field, old, new: seen.append((field, new)), hysteresis)
+    return source, watcher, seen
+
+
+def test_hysteresis_skips_bools_and_text():
+    source, watcher, seen = watch(30)
+    source.detected = True
+    source.name = "MR24HPC1"
+    source.detection_cm = 110
+    watcher.update(source)
+    assert seen == [("detected", True), ("name", "MR24HPC1")]
+
+    source.detection_cm = 130
+    watcher.update(source)
+    assert seen[-1] == ("detection_cm", 130)
+
+
+def test_hysteresis_per_field():
+    source, watcher, seen = watch({"detection_cm": 30, "motion_energy": 5})
+    source.detection_cm = 120
+    source.motion_energy = 56
+    watcher.update(source)
+    assert seen == [("motion_energy", 56)]
+
+    source.detection_cm = 131
+    source.motion_energy = 52
+    watcher.update(source)
+    assert seen[-1] == ("detection_cm", 131)
+    assert len(seen) == 2
+
+
+def test_hysteresis_for_a_field_not_watched():
+    with pytest.raises(ValueError):
+        ChangeWatcher(FIELDS).subscribe(Source(), "detected", print, {"detection_cm": 30})
+    with pytest.raises(ValueError):
+        ChangeWatcher(FIELDS).subscribe(Source(), "detection_cm", print, {"detection_cm": -1})
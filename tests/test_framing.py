@@ -0,0 +1,29 @@
+import pytest
+
+from MMWave import FrameParser
+from MMWaveSynth import FrameSource
+from mmWaveStatic_MR24HPC1 import MR24FrameParser
+
+FAULTS = dict(noise=0.05, truncated=0.05, bad_footer=0.05, ack=0.1)
+
+
+def without_find(parser):
+    # what a bytearray without find() and startswith() gets
+    parser._find = parser._find_loop
+    parser._startswith = parser._startswith_loop
+    return parser
+
+
+def scan(parser, data, chunk=37):
+    frames = []
+    for at in range(0, len(data), chunk):
+        frames.extend(parser.feed(data[at:at + chunk]))
+    return frames, parser.discarded, parser.bad_checksums, parser.bad_footers
+
+
+@pytest.mark.parametrize("sensor, parser", [("ld2410", FrameParser), ("mr24", MR24FrameParser)])
+def test_loops_find_the_same_frames(sensor, parser):
+    data, good = FrameSource(sensor, seed=3, **FAULTS).stream(500)
+    found = scan(parser(), data)
+    assert len(found[0]) >= good
+    assert scan(without_find(parser()), data) == found
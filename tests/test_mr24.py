@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from MMWaveEmulator import MR24_PRODUCT_INFO, MR24Emulator
+from mmWaveStatic_MR24HPC1 import HANDLERS, MR24, QUERY_FRAMES, SOMEBODY_MOVE, SOMEBODY_STOP, buildFrame
+
+ANSWER_TIME = 2.0  # seconds the emulator gets to answer a query
+
+
+@pytest.mark.parametrize("control, command", sorted(HANDLERS))
+def test_short_frames_are_skipped(control, command):
+    sensor = MR24(None, verbose=False, stats=True)
+    # one byte less than anything reads (so nothing, for most)
+    data = b"\x01\x02\x03\x04" if (control, command) == (0x08, 0x01) else b""
+    sensor.state.updated = "before"
+
+    assert sensor.parseData(buildFrame(control, command, data)) is None
+    _, handler = HANDLERS[(control, command)]
+    if handler.__name__ in ("_heartbeat", "_initialized"):
+        # these don't read anything
+        assert sensor.malformedFrames == 0
+    else:
+        assert sensor.malformedFrames == 1
+        assert sensor.stats()["malformed_frames"] == 1
+        assert sensor.state.updated == "before"
+
+
+def test_open_function_report():
+    sensor = MR24(None, verbose=False)
+    sensor.parseData(buildFrame(0x08, 0x01, b"\x01"))
+    assert sensor.malformedFrames == 1
+    assert sensor.state.existence_energy is None
+
+    sensor.parseData(buildFrame(0x08, 0x01, bytes([40, 3, 50, 4, 0x0A])))
+    assert sensor.malformedFrames == 1
+    state = sensor.state
+    assert (state.existence_energy, state.static_distance, state.motion_energy,
+            state.motion_distance, state.motion_speed) == (40, 3, 50, 4, 0x0A)
+
+
+def expected_answers(emulator):
+    """What each query should leave in its MR24State field. The emulator
+    answers settings and the underlying open function by echoing the
+    query's 0x0F, so that's what those are."""
+    moving = emulator.source.moving
+    expected = {name: 0x0F for name in QUERY_FRAMES}
+    expected.update(
+        product_model=MR24_PRODUCT_INFO[0xA1].decode(),
+        product_id=MR24_PRODUCT_INFO[0xA2].decode(),
+        hardware_model=MR24_PRODUCT_INFO[0xA3].decode(),
+        firmware_version=MR24_PRODUCT_INFO[0xA4].decode(),
+        initialized=True,
+        open_function=False,
+        occupied=True,
+        motion=SOMEBODY_MOVE if moving else SOMEBODY_STOP,
+        body_movement=0x30 if moving else 0x03,
+    )
+    del expected["heartbeat"], expected["reset"]
+    return expected
+
+
+@pytest.mark.parametrize("what", sorted(set(QUERY_FRAMES) - {"reset"}))
+def test_query_round_trip(emulated, what):
+    emulator = MR24Emulator(seed=1)
+    emulator.quiet = True  # no reports, so whatever comes is the answer
+    sensor = MR24(emulated(emulator), verbose=False)
+
+    sensor.query(what)
+    end = time.monotonic() + ANSWER_TIME
+    while getattr(sensor.state, what) is None and time.monotonic() < end:
+        sensor.readDataFromBuffer()
+        time.sleep(0.01)
+
+    assert sensor.unknownFrames == 0
+    assert sensor.malformedFrames == 0
+    if what == "heartbeat":
+        assert sensor.state.heartbeat is not None
+    else:
+        assert getattr(sensor.state, what) == expected_answers(emulator)[what]
+
+
+def test_reset_is_answered(emulated):
+    emulator = MR24Emulator(seed=1)
+    emulator.quiet = True
+    sensor = MR24(emulated(emulator), verbose=False)
+
+    sensor.reset()
+    frames = []
+    end = time.monotonic() + ANSWER_TIME
+    while not frames and time.monotonic() < end:
+        frames = sensor.readFrames()
+        time.sleep(0.01)
+    assert [(control, command) for control, command, _ in frames] == [(0x01, 0x02)]
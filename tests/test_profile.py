@@ -0,0 +1,18 @@
+import MMWave
+from MMWaveEmulator import LD2410Emulator
+
+
+def test_apply_sends_resolution_once(emulated):
+    emulator = LD2410Emulator(seed=1)
+    sensor = MMWave.MMWave(emulated(emulator))
+    profile = MMWave.LD2410Profile(resolution=20)
+
+    assert sensor.apply(profile) == ["resolution"]
+    assert emulator._pending_resolution == 20
+    assert sensor.resolution == 20
+
+    # it doesn't take effect until a restart, which hasn't happened, so the
+    # sensor would still say 75 if it was asked again
+    commands = emulator.commands
+    assert sensor.apply(profile) == []
+    assert emulator.commands == commands
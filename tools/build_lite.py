@@ -0,0 +1,289 @@
+"""
+Build the "lite" versions of the drivers for small CircuitPython boards.
+
+The libraries are written to be read: long docstrings, comments, every
+protocol constant named, debug output. All of that costs RAM on a
+microcontroller, where the source gets compiled on the board. This makes
+stripped copies of MMWave, the MR24HPC1 driver and the framing module
+they share, which work the same, apart from the features left out below:
+
+- docstrings (module, class, function and attribute ones) and comments are gone
+- integer constants are wrapped in micropython.const(), so the compiler can
+  inline them. Those that aren't meant for users (PUBLIC_CONSTS) or used by
+  another lite module get a leading underscore too: only then does
+  MicroPython leave them out of the module's globals altogether. A shim
+  makes const() a no-op on CPython.
+- debug output is gone: print() calls, Stats.debug() calls, the `if
+  debugMode:` blocks left empty by that, MR24.printRawData(), the
+  per-instance control_words/command_words name tables that were only
+  there to be printed, and the names in the MR24 HANDLERS table (None
+  instead, so handlers added at runtime still fit in).
+- MMWave loses the parts a board rarely needs: negotiate_baud() and
+  probe_baud() (set the speed once, from a computer), and apply() with
+  LD2410Profile (use the set_*() methods). Everything else, state files
+  included, is still there and works the same.
+
+What that saves is code and constants. The source the board compiles
+is about half the size, MMWave's compiled code shrinks by about a third,
+and the MR24 driver's by much less, since that's mostly tables. Private
+const()s don't take any RAM on the board at all, which bench_lite.py
+can't show, since CPython keeps them like any other global. An MMWave
+object itself is the same size in both versions. An MR24 object only
+loses the debug tables. benchmarks/bench_lite.py has the numbers.
+
+Run it with CPython 3.9 or newer (it needs ast.unparse):
+
+    python tools/build_lite.py [output directory, default build/lite]
+
+and copy what's in there to the board's lib folder instead of the full
+versions. The computer-side modules (MMWaveAsync, MMWaveSynth and so on)
+import constants the lite versions made private, so they need the full
+ones. benchmarks/bench_lite.py compares the two. The same input always
+gives the same output, so the result can be diffed or checked in
+somewhere.
+"""
+
+import ast
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIBRARIES = os.path.join(HERE, "..", "libraries")
+DEFAULT_OUTPUT = os.path.join(HERE, "..", "build", "lite")
+
+MODULES = ("MMWaveFraming", "MMWave", "mmWaveStatic_MR24HPC1")
+"""What gets a lite version (the drivers, and what they import)."""
+
+DROP_METHODS = {"MR24": {"printRawData"},
+                "MMWave": {"negotiate_baud", "probe_baud", "_switch_baud", "_fall_back", "_flush_input",
+                           "_link_errors", "_link_ok",
+                           "apply", "_profile_needs_reading", "_profile_steps", "_set_engineering_mode",
+                           "_config_known"}}
+"""Methods which are only there for debugging, or for features the lite
+build leaves out, by class."""
+
+DROP_CLASSES = {"LD2410Profile"}
+"""Classes the lite build leaves out (only used by dropped methods)."""
+
+DROP_NAME_STRINGS = {"HANDLERS"}
+"""Module level {key: ("name", value)} tables whose names are only
+printed; the lite build has None instead."""
+
+PUBLIC_CONSTS = {"MMWave": {"DEFAULT_BAUD", "LAST_GATE", "MAX_LEGIT_DISTANCE", "MAX_LEGIT_ENERGY",
+                            "REPORT_MODE_BASIC", "REPORT_MODE_ENGINEERING"},
+                 "mmWaveStatic_MR24HPC1": {"HUMANSTATUS", "DETAILSTATUS"}}
+"""Integer constants users are likely to import, which keep their names.
+The rest become _private (see the module docstring)."""
+
+DROP_ATTRIBUTES = {"control_words", "command_words"}
+"""self.<name> = ... assignments to leave out (debug output tables)."""
+
+DEBUG_CALLS = {"print", "debug"}
+"""Calls (as functions, or as methods of anything) which are debug output."""
+
+CONST_SHIM = """\
+try:
+    from micropython import const
+except ImportError:
+    def const(value):
+        return value
+"""
+
+
+def _is_docstring(node):
+    return (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str))
+
+
+def _is_debug_call(node):
+    if not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)):
+        return False
+    func = node.value.func
+    if isinstance(func, ast.Name):
+        return func.id in DEBUG_CALLS
+    return isinstance(func, ast.Attribute) and func.attr in DEBUG_CALLS
+
+
+def _is_dropped_attribute(node):
+    return (isinstance(node, ast.Assign) and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Attribute)
+            and isinstance(node.targets[0].value, ast.Name) and node.targets[0].value.id == "self"
+            and node.targets[0].attr in DROP_ATTRIBUTES)
+
+
+class Stripper(ast.NodeTransformer):
+
+    """Takes out docstrings, debug output and debug-only tables."""
+
+    def __init__(self):
+        self._class = None
+
+    def _strip_body(self, body):
+        kept = []
+        for node in body:
+            if _is_docstring(node) or _is_debug_call(node) or _is_dropped_attribute(node):
+                continue
+            node = self.visit(node)
+            if node is None:
+                continue
+            kept.append(node)
+        return kept
+
+    def _strip_block(self, node, field, can_be_empty=False):
+        body = self._strip_body(getattr(node, field))
+        if not body and not can_be_empty:
+            body = [ast.Pass()]
+        setattr(node, field, body)
+
+    def visit_Module(self, node):
+        node.body = [n for n in node.body if not (isinstance(n, ast.ClassDef) and n.name in DROP_CLASSES)]
+        self._strip_block(node, "body", can_be_empty=True)
+        return node
+
+    def visit_Assign(self, node):
+        if (len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id in DROP_NAME_STRINGS and isinstance(node.value, ast.Dict)):
+            for value in node.value.values:
+                if (isinstance(value, ast.Tuple) and value.elts and isinstance(value.elts[0], ast.Constant)
+                        and isinstance(value.elts[0].value, str)):
+                    value.elts[0] = ast.Constant(None)
+        return node
+
+    def visit_ClassDef(self, node):
+        outer, self._class = self._class, node.name
+        drop = DROP_METHODS.get(node.name, ())
+        node.body = [n for n in node.body if not (isinstance(n, ast.FunctionDef) and n.name in drop)]
+        self._strip_block(node, "body")
+        self._class = outer
+        return node
+
+    def visit_FunctionDef(self, node):
+        self._strip_block(node, "body")
+        return node
+
+    def visit_If(self, node):
+        self._strip_block(node, "body", can_be_empty=True)
+        self._strip_block(node, "orelse", can_be_empty=True)
+        if not node.body and not node.orelse:
+            # only debug output in there, so the whole `if` can go
+            return None
+        if not node.body:
+            node.body = [ast.Pass()]
+        return node
+
+    def _visit_loop(self, node):
+        self._strip_block(node, "body")
+        self._strip_block(node, "orelse", can_be_empty=True)
+        return node
+
+    visit_For = visit_While = _visit_loop
+
+    def visit_With(self, node):
+        self._strip_block(node, "body")
+        return node
+
+    def visit_Try(self, node):
+        self._strip_block(node, "body")
+        for handler in node.handlers:
+            self._strip_block(handler, "body")
+        self._strip_block(node, "orelse", can_be_empty=True)
+        self._strip_block(node, "finalbody", can_be_empty=True)
+        return node
+
+
+def _is_int_expression(node, consts):
+    """Whether `node` is built only from integers and earlier consts,
+    which is what micropython.const() accepts."""
+    if isinstance(node, ast.Constant):
+        return type(node.value) is int
+    if isinstance(node, ast.Name):
+        return node.id in consts
+    if isinstance(node, ast.UnaryOp):
+        return _is_int_expression(node.operand, consts)
+    if isinstance(node, ast.BinOp):
+        return _is_int_expression(node.left, consts) and _is_int_expression(node.right, consts)
+    return False
+
+
+def wrap_consts(tree):
+    """Wrap module level `NAME = <integer expression>` in const().
+    Returns the names that got wrapped."""
+    consts = set()
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id.isupper()
+                and _is_int_expression(node.value, consts)):
+            node.value = ast.Call(func=ast.Name(id="const", ctx=ast.Load()), args=[node.value], keywords=[])
+            consts.add(node.targets[0].id)
+    return consts
+
+
+def imported_names(modules=MODULES):
+    """Names each of `modules` gets imported from it by the others."""
+    used = {module: set() for module in modules}
+    for module in modules:
+        with open(os.path.join(LIBRARIES, module + ".py"), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module in used:
+                used[node.module].update(alias.name for alias in node.names)
+    return used
+
+
+def make_private(tree, names):
+    """Rename every use of `names` in `tree` to _name."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in names:
+            node.id = "_" + node.id
+
+
+def _first_code_line(tree):
+    # after `from __future__` imports, if there ever are any
+    for i, node in enumerate(tree.body):
+        if not (isinstance(node, ast.ImportFrom) and node.module == "__future__"):
+            return i
+    return len(tree.body)
+
+
+def strip_source(source, name="<source>", public=()):
+    """The lite version of one module's source. Integer constants not in
+    `public` become _private."""
+    tree = ast.parse(source, name)
+    tree = Stripper().visit(tree)
+    consts = wrap_consts(tree)
+    make_private(tree, consts - set(public))
+    if consts:
+        shim = ast.parse(CONST_SHIM).body
+        at = _first_code_line(tree)
+        tree.body[at:at] = shim
+    ast.fix_missing_locations(tree)
+    return f"# Generated by tools/build_lite.py from {os.path.basename(name)}. Don't edit.\n" + ast.unparse(tree) + "\n"
+
+
+def build(output=DEFAULT_OUTPUT, modules=MODULES):
+    """Write the lite modules into `output`. Returns their paths."""
+    os.makedirs(output, exist_ok=True)
+    imported = imported_names(modules)
+    written = []
+    for module in modules:
+        source_path = os.path.join(LIBRARIES, module + ".py")
+        public = PUBLIC_CONSTS.get(module, set()) | imported[module]
+        with open(source_path, encoding="utf-8") as f:
+            lite = strip_source(f.read(), source_path, public)
+        # make sure what we made still compiles
+        compile(lite, module, "exec")
+        path = os.path.join(output, module + ".py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(lite)
+        written.append(path)
+    return written
+
+
+def main():
+    output = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT
+    for path in build(output):
+        print(f"{os.path.getsize(path):7d}  {os.path.relpath(path)}")
+
+
+if __name__ == "__main__":
+    main()